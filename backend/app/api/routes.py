@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, Body, UploadFile, File, Request, Form, HTTPException
+from fastapi.responses import StreamingResponse, JSONResponse
 from app.core.db import get_db
 from typing import Any, Dict, Optional
 import os
@@ -9,16 +10,32 @@ import time
 import uuid
 from datetime import datetime, timedelta
 from app.core.config import settings
+from app.core.indexes import index_state
 from app.services.interactivechat import (
     TextClassifierInference,
     SlotFiller,
-    scrape_agmarknet,
     format_date_for_agmarknet,
-    summarize_prices_per_market,
-    TOP_K_PER_MARKET
+    scrape_date_range
 )
 from app.services.image_classifier import CropDiseaseClassifier
-from app.services.database_service import PriceDataService, AnalyticsService, SessionService
+from app.services.driver_pool import get_driver_pool
+from app.services.market_catalogue import market_catalogue
+from app.services.page_readiness import readiness_recorder
+from app.services.freshness_policy import freshness_policy
+from app.services.price_memory_cache import price_memory_cache, price_summary_memory_cache
+from app.services.scrape_coordination import scrape_flight, scrape_executor, agmarknet_breaker
+from app.services.database_service import PriceDataService, AnalyticsService, SessionService, ScrapeLeaseService, ScrapeJobQueueService, PriceQueryJobService
+from app.services.price_fetcher import read_cached_prices
+from app.services.price_jobs import (
+    fetch_price_summary,
+    format_price_response,
+    should_defer_price_query,
+    start_price_job,
+    start_range_job,
+    public_job,
+    price_job_events,
+    stream_price_events
+)
 from app.models.price_data import QueryAnalyticsModel, UserSessionModel
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
@@ -45,6 +62,20 @@ def get_auth_service(db: AsyncIOMotorDatabase = Depends(get_db)):
         print(f"Auth service error: {e}")
         return None
 
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    auth_service: AuthService = Depends(get_auth_service),
+):
+    """The user of a valid bearer token, else 401"""
+    try:
+        username = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+    except JWTError:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    user = await auth_service.get_user_by_username(username) if username and auth_service else None
+    if user is None:
+        raise HTTPException(status_code=401, detail="User not found")
+    return user
+
 router = APIRouter()
 
 # Gemini API Configuration
@@ -93,6 +124,12 @@ def get_enhanced_mappings():
         'firozabad': '16'
     }
     
+    # Every other UP district the market catalogue has an AgMarkNet code for,
+    # unless that code already stands for one of the districts above or one
+    # the scraper resolves by name (district_codes always skips DISTRICT_NAMES)
+    for name, code in market_catalogue.district_codes(reserved=district_map_up.values()).items():
+        district_map_up.setdefault(name, code)
+    
     return commodity_map, district_map_up
 
 class GeminiChat:
@@ -270,12 +307,47 @@ def get_session_service(db: AsyncIOMotorDatabase = Depends(get_db)):
         print(f"Session service error: {e}")
         return None
 
+def get_lease_service(db: AsyncIOMotorDatabase = Depends(get_db)):
+    try:
+        service = ScrapeLeaseService()
+        service.set_db(db)
+        return service
+    except Exception as e:
+        print(f"Lease service error: {e}")
+        return None
+
+def get_job_queue_service(db: AsyncIOMotorDatabase = Depends(get_db)):
+    try:
+        service = ScrapeJobQueueService()
+        service.set_db(db)
+        return service
+    except Exception as e:
+        print(f"Job queue service error: {e}")
+        return None
+
+def get_price_job_service(db: AsyncIOMotorDatabase = Depends(get_db)):
+    try:
+        service = PriceQueryJobService()
+        service.set_db(db)
+        return service
+    except Exception as e:
+        print(f"Price job service error: {e}")
+        return None
+
 # ========== CORE ENDPOINTS ==========
 
 @router.get("/health")
 async def health():
     return {"status": "ok", "message": "DigiKisan Backend API is running"}
 
+@router.get("/ready")
+async def ready():
+    """Readiness probe; with index_require_ready it fails until every declared Mongo index exists"""
+    indexes = index_state.stats()
+    if settings.index_require_ready and not index_state.ready:
+        return JSONResponse(status_code=503, content={"status": "not_ready", "indexes": indexes})
+    return {"status": "ready", "indexes": indexes}
+
 @router.post("/classify")
 async def classify_text(
     payload: Dict[str, Any] = Body(...),
@@ -410,8 +482,18 @@ async def chat_message(
     gemini_chat: GeminiChat = Depends(get_gemini_chat),
     price_service: Optional[PriceDataService] = Depends(get_price_service),
     analytics_service: Optional[AnalyticsService] = Depends(get_analytics_service),
+    lease_service: Optional[ScrapeLeaseService] = Depends(get_lease_service),
+    job_queue: Optional[ScrapeJobQueueService] = Depends(get_job_queue_service),
+    price_jobs_service: Optional[PriceQueryJobService] = Depends(get_price_job_service),
 ):
-    """Session-based chat with proper slot filling logic"""
+    """
+    Session-based chat with proper slot filling logic.
+    A completed price query that would have to wait for a scrape comes back
+    with pending=True and a job_id to poll (/prices/jobs/{id}) or stream
+    (/prices/jobs/{id}/events); send "async": true to always get a job.
+    With "stream": true a completed price query is answered as server-sent
+    events, one "market" event per market as soon as it is scraped.
+    """
     message = payload.get("message", "").strip()
     session_id = payload.get("session_id")
     session_state = payload.get("session_state", {})
@@ -516,171 +598,71 @@ async def chat_message(
                 district_code = district_map.get((district or "").lower())
 
                 if commodity_code and district_code and formatted_date:
-                    # Try cached data first if available
-                    cached_df = None
-                    if price_service:
-                        try:
-                            cached_df = await price_service.get_cached_prices(
-                                commodity_code, district_code, formatted_date, max_age_hours=2
+                    # Streaming mode: send each market line as soon as it is scraped
+                    if payload.get("stream"):
+                        return StreamingResponse(
+                            stream_price_events(
+                                commodity, district, date_str, price_service, lease_service, job_queue,
+                                formatted_date, district_code, commodity_code,
+                                session_service=session_service, session_id=session_id
+                            ),
+                            media_type="text/event-stream",
+                            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+                        )
+
+                    # Nothing cached and the scrape would have to wait (or the client asked for it):
+                    # answer with a job id now instead of holding the request open
+                    if price_jobs_service and await should_defer_price_query(bool(payload.get("async")), job_queue):
+                        cached_df = await read_cached_prices(price_service, formatted_date,
+                                                             district_code, commodity_code)
+                        if cached_df is None or cached_df.empty:
+                            job_id = await start_price_job(
+                                price_jobs_service, price_service, lease_service, job_queue,
+                                session_service, session_id, slots, formatted_date,
+                                district_code, commodity_code
                             )
-                        except Exception as e:
-                            print(f"Cache check error: {e}")
-
-                    data_source = "cached"
-                    if cached_df is not None and not cached_df.empty:
-                        price_df = cached_df
-                    else:
-                        # SCRAPE RAW DATA
-                        price_df = scrape_agmarknet(formatted_date, "UP", district_code, commodity_code)
-                        data_source = "scraped"
-                        
-                        # Cache if available
-                        if price_service and price_df is not None and not price_df.empty:
-                            try:
-                                await price_service.cache_price_data(
-                                    price_df, commodity_code, district_code, formatted_date
-                                )
-                            except Exception as e:
-                                print(f"Cache save error: {e}")
-
-                    if price_df is not None and not price_df.empty:
-                        # 🔧 FIXED: NORMALIZE COLUMN NAMES for cached vs fresh data compatibility
-                        column_mapping = {
-                            'market_name': 'Market',
-                            'modal_price': 'Modal', 
-                            'max_price': 'Max',
-                            'min_price': 'Min',
-                            'commodity_name': 'Commodity',
-                            'district_name': 'District'
-                        }
-                        price_df = price_df.rename(columns=column_mapping)
-                        
-                        # USE SUMMARIZATION (now with normalized columns)
-                        summary_df = summarize_prices_per_market(price_df, TOP_K_PER_MARKET)
-                        
-                        if summary_df is not None and not summary_df.empty:
-                            # 🔥 FIXED: Clean response formatting like original working version
-                            response_text = f"""COLLECTED!
-
-Commodity: {commodity.title()}
-Location: {district.title()}
-Date: {date_str}
-
-Current Market Prices:
-
-"""
-                            
-                            # FIXED: Safe column access to handle different data structures
-                            for _, row in summary_df.iterrows():
-                                # Handle different possible column names (cached vs fresh data)
-                                market = (row.get('Market') or 
-                                         row.get('market_name') or 
-                                         row.get('market') or 
-                                         'Unknown Market')
-                                
-                                avg_modal = (row.get('Avg Modal') or 
-                                            row.get('modal_price') or 
-                                            row.get('Modal') or 
-                                            'N/A')
-                                
-                                avg_max = (row.get('Avg Max') or 
-                                          row.get('max_price') or 
-                                          row.get('Max') or 
-                                          'N/A')
-                                
-                                avg_min = (row.get('Avg Min') or 
-                                          row.get('min_price') or 
-                                          row.get('Min') or 
-                                          'N/A')
-                                
-                                response_text += f"""{market}
-Modal: Rs.{avg_modal}/quintal | Max: Rs.{avg_max} | Min: Rs.{avg_min}
-
-"""
-                            
-                            # Calculate overall average
-                            try:
-                                # Try different column names for modal prices
-                                modal_prices = None
-                                if 'Avg Modal' in summary_df.columns:
-                                    modal_prices = summary_df['Avg Modal'].dropna()
-                                elif 'modal_price' in summary_df.columns:
-                                    modal_prices = summary_df['modal_price'].dropna()
-                                elif 'Modal' in summary_df.columns:
-                                    modal_prices = summary_df['Modal'].dropna()
-                                
-                                if modal_prices is not None and len(modal_prices) > 0:
-                                    overall_avg = modal_prices.mean()
-                                    response_text += f"""Average Across All Markets: Rs.{overall_avg:.0f}/quintal
-
-Price Summary:
-- Prices averaged from latest {TOP_K_PER_MARKET} entries per market
-- Compare different markets to find best rates
-- Data directly from AgMarkNet
-
-Anything else?"""
-                                else:
-                                    response_text += "Anything else?"
-                            except Exception as e:
-                                print(f"Average calculation error: {e}")
-                                response_text += "Anything else?"
-
-                            # Optional analytics logging
-                            if analytics_service:
-                                try:
-                                    query_id = str(uuid.uuid4())
-                                    analytics_data = QueryAnalyticsModel(
-                                        query_id=query_id,
-                                        commodity=commodity,
-                                        district=district,
-                                        date_requested=date_str,
-                                        response_time_ms=1000,
-                                        data_source_used=data_source,
-                                        success=True,
-                                        time_of_day="unknown"
-                                    )
-                                    await analytics_service.log_query(analytics_data)
-                                except Exception as e:
-                                    print(f"Analytics logging error: {e}")
-                                
-                        else:
-                            response_text = f"""COLLECTED!
-
-Commodity: {commodity.title()}
-Location: {district.title()}
-Date: {date_str}
-
-No summarized price data available.
-
-This could be due to:
-- Market holiday on selected date
-- No trading activity
-- Data not yet updated
-
-Try asking for:
-- A different date
-- Another commodity
-- Different location"""
-                            
-                    else:
-                        response_text = f"""COLLECTED!
-
-Commodity: {commodity.title()}
-Location: {district.title()}
-Date: {date_str}
+                            if job_id:
+                                return {
+                                    "ok": True,
+                                    "session_id": session_id,
+                                    "message": f"Fetching live {commodity} prices for {district.title()}. They will be ready shortly.",
+                                    "session_state": {},
+                                    "completed": False,
+                                    "pending": True,
+                                    "job_id": job_id,
+                                    "status_url": f"/api/prices/jobs/{job_id}",
+                                    "events_url": f"/api/prices/jobs/{job_id}/events",
+                                    "slots": slots,
+                                    "timestamp": datetime.now().isoformat()
+                                }
 
-No price data available for these parameters.
+                    # Precomputed summary or cached data if fresh, otherwise one scrape across all workers
+                    price_df, summary_df, data_source = await fetch_price_summary(
+                        price_service, lease_service, formatted_date, district_code, commodity_code,
+                        job_queue=job_queue
+                    )
+                    response_text, summary_df = format_price_response(
+                        commodity, district, date_str, price_df, data_source, summary_df=summary_df
+                    )
 
-This could be due to:
-- Market holiday on selected date
-- No trading activity  
-- Data not yet updated
+                    # Optional analytics logging
+                    if analytics_service and summary_df is not None and not summary_df.empty:
+                        try:
+                            query_id = str(uuid.uuid4())
+                            analytics_data = QueryAnalyticsModel(
+                                query_id=query_id,
+                                commodity=commodity,
+                                district=district,
+                                date_requested=date_str,
+                                response_time_ms=1000,
+                                data_source_used=data_source,
+                                success=True,
+                                time_of_day="unknown"
+                            )
+                            await analytics_service.log_query(analytics_data)
+                        except Exception as e:
+                            print(f"Analytics logging error: {e}")
 
-Try asking for:
-- A different date
-- Another commodity
-- Different location"""
-                        
                 else:
                     missing_parts = []
                     if not commodity_code:
@@ -814,6 +796,94 @@ async def check_data_storage(db: AsyncIOMotorDatabase = Depends(get_db)):
     except Exception as e:
         return {"ok": False, "error": str(e)}
 
+@router.get("/prices/jobs/{job_id}")
+async def get_price_job(
+    job_id: str,
+    price_jobs_service: Optional[PriceQueryJobService] = Depends(get_price_job_service),
+):
+    """Poll a background price query; message and markets are filled in once status is done"""
+    job = await price_jobs_service.get_job(job_id) if price_jobs_service else None
+    if job is None:
+        raise HTTPException(status_code=404, detail="Price job not found")
+    return {"ok": True, "job": public_job(job)}
+
+@router.get("/prices/jobs/{job_id}/events")
+async def stream_price_job(
+    job_id: str,
+    price_jobs_service: Optional[PriceQueryJobService] = Depends(get_price_job_service),
+):
+    """Server-sent events that push the formatted price reply as soon as the job finishes"""
+    if price_jobs_service is None or await price_jobs_service.get_job(job_id) is None:
+        raise HTTPException(status_code=404, detail="Price job not found")
+    return StreamingResponse(
+        price_job_events(price_jobs_service, job_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.post("/prices/range")
+async def scrape_price_range(
+    payload: Dict[str, Any] = Body(...),
+    user=Depends(get_current_user),
+    price_service: Optional[PriceDataService] = Depends(get_price_service),
+    price_jobs_service: Optional[PriceQueryJobService] = Depends(get_price_job_service),
+):
+    """
+    Backfill history: scrape start_date..end_date (YYYY-MM-DD) for lists of
+    commodity and district names in one browser session per commodity, and
+    bulk-cache the results. Needs a bearer token; the scrape runs as a
+    background job whose id is returned at once.
+    """
+    commodity_map, district_map = get_enhanced_mappings()
+    commodities = payload.get("commodities") or []
+    districts = payload.get("districts") or []
+    commodity_codes = [commodity_map[c.lower()] for c in commodities if c.lower() in commodity_map]
+    district_codes = [district_map[d.lower()] for d in districts if d.lower() in district_map]
+    unknown = [c for c in commodities if c.lower() not in commodity_map] + \
+              [d for d in districts if d.lower() not in district_map]
+    if unknown or not commodity_codes or not district_codes:
+        raise HTTPException(status_code=400, detail=f"Unknown or missing commodities/districts: {unknown}")
+
+    try:
+        days = scrape_date_range(payload.get("start_date"), payload.get("end_date"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if len(days) > settings.range_scrape_max_days:
+        raise HTTPException(status_code=400,
+                            detail=f"Range is {len(days)} days, at most {settings.range_scrape_max_days} allowed")
+
+    job_id = None
+    if price_jobs_service is not None:
+        job_id = await start_range_job(price_jobs_service, price_service, payload["start_date"], payload["end_date"],
+                                       commodities, districts, commodity_codes, district_codes)
+    if job_id is None:
+        raise HTTPException(status_code=503, detail="Could not start the range scrape, try again later")
+    print(f"📆 {user.username} started range backfill job {job_id}")
+    return {
+        "ok": True,
+        "days": len(days),
+        "pending": True,
+        "job_id": job_id,
+        "status_url": f"/api/prices/jobs/{job_id}",
+        "events_url": f"/api/prices/jobs/{job_id}/events",
+    }
+
+@router.get("/scraper/stats")
+async def scraper_stats():
+    """Driver pool usage, scrape executor load, coalescing and observed page-readiness waits per scraper step"""
+    return {
+        "ok": True,
+        "driver_pool": get_driver_pool().stats(),
+        "executor": scrape_executor.stats(),
+        "coalescing": scrape_flight.stats(),
+        "circuit_breaker": agmarknet_breaker.stats(),
+        "freshness_policy": freshness_policy.stats(),
+        "memory_cache": price_memory_cache.stats(),
+        "summary_memory_cache": price_summary_memory_cache.stats(),
+        "market_catalogue": market_catalogue.stats(),
+        "readiness_waits": readiness_recorder.stats(),
+    }
+
 # ========== AUTHENTICATION ENDPOINTS ==========
 
 # Login API endpoint for Flutter
@@ -907,7 +977,9 @@ async def send_chat_message(
     clf: TextClassifierInference = Depends(get_text_clf),
     slot_filler: SlotFiller = Depends(get_slot_filler),
     gemini_chat: GeminiChat = Depends(get_gemini_chat),
-    price_service: Optional[PriceDataService] = Depends(get_price_service)
+    price_service: Optional[PriceDataService] = Depends(get_price_service),
+    lease_service: Optional[ScrapeLeaseService] = Depends(get_lease_service),
+    job_queue: Optional[ScrapeJobQueueService] = Depends(get_job_queue_service)
 ):
     try:
         # Verify the JWT token and get user info
@@ -966,48 +1038,16 @@ async def send_chat_message(
                         district_code = district_map.get((district or "").lower())
                         
                         if commodity_code and district_code and formatted_date:
-                            # Get price data
-                            price_df = scrape_agmarknet(formatted_date, "UP", district_code, commodity_code)
+                            # Get price data (the precomputed summary when the key is cached)
+                            price_df, summary_df, data_source = await fetch_price_summary(
+                                price_service, lease_service, formatted_date, district_code, commodity_code,
+                                job_queue=job_queue
+                            )
                             
-                            if price_df is not None and not price_df.empty:
-                                # Normalize columns 
-                                column_mapping = {
-                                    'market_name': 'Market',
-                                    'modal_price': 'Modal', 
-                                    'max_price': 'Max',
-                                    'min_price': 'Min'
-                                }
-                                price_df = price_df.rename(columns=column_mapping)
-                                
-                                # Summarize prices
-                                summary_df = summarize_prices_per_market(price_df, TOP_K_PER_MARKET)
-                                
-                                if summary_df is not None and not summary_df.empty:
-                                    response_text = f"✅ Price information for {commodity.title()} in {district.title()}:\n\n"
-                                    
-                                    for _, row in summary_df.iterrows():
-                                        market = row.get('Market', 'Unknown Market')
-                                        modal = row.get('Avg Modal', 'N/A')
-                                        max_price = row.get('Avg Max', 'N/A') 
-                                        min_price = row.get('Avg Min', 'N/A')
-                                        
-                                        response_text += f"📍 {market}\n"
-                                        response_text += f"   Modal: ₹{modal}/quintal\n"
-                                        response_text += f"   Range: ₹{min_price} - ₹{max_price}\n\n"
-                                    
-                                    # Calculate average
-                                    try:
-                                        if 'Avg Modal' in summary_df.columns:
-                                            avg_price = summary_df['Avg Modal'].mean()
-                                            response_text += f"🔍 Average Market Price: ₹{avg_price:.0f}/quintal\n\n"
-                                    except:
-                                        pass
-                                    
-                                    response_text += "Data from AgMarkNet. Anything else you'd like to know?"
-                                else:
-                                    response_text = f"No price data available for {commodity} in {district} on {date_str}. Try a different date or location."
-                            else:
-                                response_text = f"Unable to fetch price data for {commodity} in {district}. Please try again or check the spelling."
+                            # Same reply (and stale/no-data wording) as the /chat/message price path
+                            response_text, _ = format_price_response(
+                                commodity, district, date_str, price_df, data_source, summary_df
+                            )
                         else:
                             response_text = f"Sorry, I don't have mapping for {commodity} in {district}. Please try common crops like rice, wheat, potato, onion."
                     except Exception as e:
@@ -1091,6 +1131,7 @@ async def info():
         "version": "2.6",
         "endpoints": [
             "/health",
+            "/ready",
             "/classify",
             "/disease/predict",
             "/disease/chat",
@@ -1101,6 +1142,10 @@ async def info():
             "/chat/message",
             "/test-mongodb",
             "/check-data",
+            "/prices/jobs/{job_id}",
+            "/prices/jobs/{job_id}/events",
+            "/prices/range",
+            "/scraper/stats",
             "/auth/login",
             "/auth/register",
             "/chat/send",
@@ -1,3 +1,4 @@
+from typing import Dict
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -13,7 +14,97 @@ class Settings(BaseSettings):
     # Allow any extra fields from .env (optional)
     mongodb_db: str = "digikisan"  # If you have this in .env
     env: str = "dev"  # If you have this in .env
-    
+
+    # AgMarkNet scraper settings
+    scraper_pool_size: int = 2  # number of long-lived Chrome drivers
+    scraper_driver_max_uses: int = 25  # recycle a driver after this many scrapes
+    scraper_pool_acquire_timeout: int = 60  # seconds to wait for a free driver
+    scraper_warm_on_startup: bool = True  # launch drivers when the API starts
+    scraper_market_parallelism: int = 1  # markets of one district scraped concurrently
+    scraper_engine: str = "selenium"  # "http" tries form postbacks first, Selenium is the fallback
+    agmarknet_base_url: str = "https://agmarknet.gov.in"  # point at a stand-in server for testing
+    scraper_http_timeout: int = 30  # seconds per AgMarkNet HTTP request
+    scraper_http_pool_size: int = 10  # pooled keep-alive connections to AgMarkNet
+    scraper_block_resources: bool = True  # drop images, fonts, stylesheets and trackers in Chrome
+    scraper_driver_memory_mb: int = 256  # used JS heap at which a driver is recycled after its scrape
+    scraper_driver_js_heap_cap_mb: int = 1024  # V8 old-space cap per renderer; keep well above the recycle threshold
+
+    # Adaptive step timeouts and per-scrape budgets
+    scrape_deadline_seconds: int = 90  # a district scrape stops starting new markets after this long
+    scrape_retry_budget: int = 6  # retries shared by every market of one scrape
+    scraper_timeout_multiplier: float = 3.0  # step timeout = p95 of recent successful waits x this
+
+    # AgMarkNet circuit breaker and stale-while-revalidate
+    circuit_failure_threshold: int = 3  # consecutive failed scrapes that open the circuit
+    circuit_reset_seconds: int = 60  # open circuit lets one probe scrape through after this long
+    stale_refresh_window_seconds: int = 1800  # how long a stale key keeps trying to refresh
+
+    # Index bootstrap at API startup
+    index_bootstrap_mode: str = "build"  # "build" creates missing indexes, "verify" only reports them
+    index_require_ready: bool = False  # /ready answers 503 until every declared index exists
+
+    # Cache freshness policy (replaces the flat two-hour TTL)
+    freshness_report_times: str = "11:00,14:00,17:00,20:00"  # mandi upload times; today's cache expires at each
+    freshness_settle_days: int = 3  # complete scrapes this many days after the market date are final; matches negative_cache_recent_days
+    freshness_commodity_report_times: Dict[str, str] = {}  # per commodity code, e.g. {"78": "09:00,12:00"}
+    freshness_commodity_settle_days: Dict[str, int] = {}  # per commodity code, e.g. {"78": 2}
+
+    # Price summarization
+    summarize_engine: str = "numpy"  # "numpy" array engine or the "pandas" reference implementation
+    summary_pipeline_enabled: bool = True  # summarize cached rows in Mongo; needs MongoDB 7.0+ (%b in $dateFromString)
+
+    # In-process price cache in front of Mongo (per API/worker process)
+    price_memory_cache_entries: int = 512  # LRU size in (commodity, district, date) keys; 0 disables it
+    price_memory_cache_max_age_seconds: int = 300  # bounds how long another process's rescrape goes unseen
+
+    # Negative cache of price keys with no AgMarkNet rows (holidays, no arrivals)
+    negative_cache_today_minutes: int = 30  # today's rows may still be uploaded later in the day
+    negative_cache_recent_hours: int = 6  # dates up to negative_cache_recent_days old
+    negative_cache_recent_days: int = 3
+    negative_cache_old_days: int = 7  # older dates rarely change
+
+    # Bounded scrape executor (keeps blocking scrapes off the event loop)
+    scrape_executor_workers: int = 4  # scrapes running at once per process
+    scrape_executor_max_queue: int = 8  # scrapes allowed to wait for a slot
+    scrape_job_timeout_seconds: int = 120  # a scrape is cancelled after this long
+
+    # Date-range backfills
+    range_scrape_max_days: int = 92  # longest range one request may scrape
+    range_scrape_timeout_seconds: int = 3600  # a range scrape is cancelled after this long
+
+    # Resumable batch crawl
+    crawl_progress_every: int = 25  # print/persist throughput every N finished units
+
+    # Background price-query jobs (polling / server-sent events)
+    price_job_ttl_seconds: int = 86400  # finished jobs are kept this long
+    price_job_wait_seconds: int = 300  # how long a job keeps retrying for a scrape slot
+    price_job_retry_seconds: float = 5.0
+    price_job_poll_seconds: float = 1.0  # SSE stream re-check interval
+    price_job_stream_timeout_seconds: int = 300
+
+    # Market catalogue (district -> AgMarkNet markets)
+    market_catalogue_refresh_hours: int = 24  # re-crawl the district/market lists this often
+    market_catalogue_check_minutes: int = 30  # how often workers reload / check staleness
+
+    # Cross-worker scrape leases
+    scrape_lease_ttl_seconds: int = 90  # lease lapses if the owner stops heartbeating
+    scrape_lease_heartbeat_seconds: int = 20  # how often the owner extends its lease
+    scrape_lease_wait_seconds: int = 150  # how long other workers wait for the owner's result
+    scrape_lease_poll_seconds: float = 2.0  # cache poll interval while waiting
+
+    # Scrape job queue ("inline" scrapes in the API process, "queue" hands scrapes to workers)
+    scrape_mode: str = "inline"
+    scrape_job_lease_seconds: int = 120  # job returns to the queue if its worker goes quiet
+    scrape_job_max_attempts: int = 3  # attempts before a job is marked failed
+    scrape_job_wait_seconds: int = 150  # how long the API waits for a worker's result
+    scrape_queue_defer_depth: int = 4  # queued jobs at which chat price queries are answered with a job id
+    scrape_worker_concurrency: int = 2  # jobs one worker process runs at once
+    scrape_worker_poll_seconds: float = 2.0  # idle poll interval of a worker
+
+    @property
+    def agmarknet_search_url(self) -> str:
+        return f"{self.agmarknet_base_url.rstrip('/')}/SearchCmmMkt.aspx"
+
     class Config:
         env_file = ".env"
         extra = "allow"  # This allows extra fields
@@ -0,0 +1,122 @@
+"""
+Index manager.
+
+Every service declares the indexes its queries need as INDEXES, a
+{collection: [IndexModel]} mapping. sync_indexes() compares a declaration
+with what Mongo actually has, creates what is missing and reports drift
+(same key, different options) and undeclared extras; nothing is dropped
+automatically. bootstrap_indexes() runs it for every service at startup
+and records the outcome for the readiness probe.
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from pymongo import IndexModel
+from pymongo.errors import PyMongoError
+
+# Index options that change behaviour; anything else (v, ns, background) is ignored when comparing
+COMPARED_OPTIONS = ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression")
+
+def _key(spec) -> List[tuple]:
+    return [(field, direction) for field, direction in spec.items()] if hasattr(spec, "items") else list(spec)
+
+def _options(info: Dict[str, Any]) -> Dict[str, Any]:
+    return {opt: info[opt] for opt in COMPARED_OPTIONS if opt in info and info[opt] not in (False, None)}
+
+async def sync_indexes(db, declared: Dict[str, List[IndexModel]], create: bool = True) -> Dict[str, Dict[str, Any]]:
+    """
+    Make each collection's indexes match the declaration. Returns per
+    collection the index names that were present, created, missing (when
+    create is False), drifted or failed, plus undeclared extras.
+    """
+    report = {}
+    for collection_name, models in declared.items():
+        collection = db[collection_name]
+        result = {"present": [], "created": [], "missing": [], "drift": [], "failed": {}, "extra": []}
+        try:
+            existing = await collection.index_information()
+        except PyMongoError as e:
+            result["failed"]["*"] = str(e)
+            report[collection_name] = result
+            continue
+
+        by_key = {tuple(_key(info["key"])): (name, info) for name, info in existing.items()}
+        matched = {"_id_"}
+        for model in models:
+            wanted = model.document
+            name = wanted["name"]
+            found = by_key.get(tuple(_key(wanted["key"])))
+            if found:
+                existing_name, info = found
+                matched.add(existing_name)
+                if _options(info) != _options(wanted):
+                    result["drift"].append({"name": existing_name, "expected": _options(wanted),
+                                            "actual": _options(info)})
+                else:
+                    result["present"].append(existing_name)
+                continue
+            if not create:
+                result["missing"].append(name)
+                continue
+            try:
+                await collection.create_indexes([model])
+                result["created"].append(name)
+            except PyMongoError as e:
+                result["failed"][name] = str(e)
+
+        result["extra"] = sorted(set(existing) - matched)
+        report[collection_name] = result
+    return report
+
+def report_problems(report: Dict[str, Dict[str, Any]]) -> List[str]:
+    """Human-readable missing/drifted/failed indexes of a sync report"""
+    problems = []
+    for collection_name, result in report.items():
+        problems += [f"{collection_name}.{name} missing" for name in result["missing"]]
+        problems += [f"{collection_name}.{d['name']} drifted: expected {d['expected']}, found {d['actual']}"
+                     for d in result["drift"]]
+        problems += [f"{collection_name}.{name} failed: {error}" for name, error in result["failed"].items()]
+    return problems
+
+class IndexBootstrapState:
+    """Outcome of the startup index bootstrap, read by the readiness endpoint"""
+
+    def __init__(self):
+        self.ready = False
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.report: Dict[str, Dict[str, Any]] = {}
+        self.problems: List[str] = []
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "problems": self.problems,
+            "collections": self.report,
+        }
+
+# Global bootstrap state for this process
+index_state = IndexBootstrapState()
+
+async def bootstrap_indexes(services: List[Any], create: bool = True) -> IndexBootstrapState:
+    """Sync every service's declared indexes; services must already have set_db() called"""
+    index_state.ready = False
+    index_state.started_at = datetime.now()
+    report = {}
+    for service in services:
+        try:
+            report.update(await service.ensure_indexes(create=create))
+        except Exception as e:
+            report[type(service).__name__] = {"present": [], "created": [], "missing": [], "drift": [],
+                                              "failed": {"*": str(e)}, "extra": []}
+    index_state.report = report
+    index_state.problems = report_problems(report)
+    index_state.finished_at = datetime.now()
+    index_state.ready = not any(r["missing"] or r["failed"] for r in report.values())
+
+    created = sum(len(r["created"]) for r in report.values())
+    print(f"🗃️ Index bootstrap: {created} created, {len(index_state.problems)} problem(s)")
+    for problem in index_state.problems:
+        print(f"⚠️ Index {problem}")
+    return index_state
@@ -2,7 +2,15 @@ from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.responses import Response
 from .api.routes import router
-from .core.db import connect_to_mongo, close_mongo_connection
+from .core.db import connect_to_mongo, close_mongo_connection, get_database
+from .core.config import settings
+from .services.driver_pool import get_driver_pool, shutdown_driver_pool
+from .services.scrape_coordination import scrape_executor
+from .services.database_service import PriceDataService, ScrapeLeaseService, ScrapeJobQueueService, PriceQueryJobService, MarketCatalogueService, SessionService, AnalyticsService, CrawlCheckpointService
+from .services.auth_service import AuthService
+from .core.indexes import bootstrap_indexes
+from .services.market_catalogue import run_market_catalogue_refresher
+import asyncio
 import json
 import time
 
@@ -56,6 +64,12 @@ async def log_chat_requests(request: Request, call_next):
         # Process the request
         response = await call_next(request)
 
+        # Streamed replies (SSE) must reach the client chunk by chunk, never buffer them
+        if response.headers.get("content-type", "").startswith("text/event-stream"):
+            print(f"📡 STREAMING RESPONSE: {response.status_code}")
+            print(f"{'='*60}\n")
+            return response
+
         # Read response body
         resp_body = b""
         async for chunk in response.body_iterator:
@@ -93,6 +107,30 @@ async def startup_event():
     """Initialize services on application startup"""
     print("🚀 Starting DigiKisan Backend...")
     await connect_to_mongo()
+    # Create/verify every service's declared indexes in the background; /ready reports the outcome
+    indexed_services = []
+    for service_class in (PriceDataService, SessionService, AnalyticsService, AuthService, ScrapeLeaseService,
+                          ScrapeJobQueueService, PriceQueryJobService, CrawlCheckpointService,
+                          MarketCatalogueService):
+        service = service_class()
+        service.set_db(get_database())
+        indexed_services.append(service)
+    app.state.index_bootstrap = asyncio.create_task(
+        bootstrap_indexes(indexed_services, create=settings.index_bootstrap_mode != "verify")
+    )
+    lease_service = ScrapeLeaseService()
+    lease_service.set_db(get_database())
+    # Load the district -> market catalogue and keep it fresh in the background
+    catalogue_service = MarketCatalogueService()
+    catalogue_service.set_db(get_database())
+    app.state.catalogue_refresher = asyncio.create_task(
+        run_market_catalogue_refresher(catalogue_service, lease_service)
+    )
+    # In queue mode scraping happens on worker nodes, so the API never starts Chrome
+    if settings.scraper_warm_on_startup and settings.scrape_mode != "queue":
+        # Launch Chrome in the background so startup is not held up by the browsers
+        asyncio.get_running_loop().run_in_executor(None, get_driver_pool().warm)
+        print("🔥 Warming scraper driver pool in background")
     print("✅ All services initialized successfully!")
     print("🔍 Request/Response logging enabled for /chat/ endpoints")
 
@@ -100,7 +138,13 @@ async def startup_event():
 async def shutdown_event():
     """Cleanup services on application shutdown"""
     print("🔌 Shutting down DigiKisan Backend...")
+    if getattr(app.state, "catalogue_refresher", None):
+        app.state.catalogue_refresher.cancel()
+    if getattr(app.state, "index_bootstrap", None):
+        app.state.index_bootstrap.cancel()
     await close_mongo_connection()
+    scrape_executor.cancel_all()
+    shutdown_driver_pool()
     print("✅ All services closed successfully!")
 
 # Health check endpoint
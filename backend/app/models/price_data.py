@@ -13,6 +13,7 @@ class PriceDataModel(BaseModel):
     district_name: str = Field(..., description="Human readable district name")
     market_name: str = Field(..., description="Market name")
     date: str = Field(..., description="Market date in YYYY-MM-DD format")
+    market_date: Optional[datetime] = Field(None, description="The market date as a datetime, for sorting")
     
     # Price information
     modal_price: Optional[float] = Field(None, description="Modal price per quintal")
@@ -23,6 +24,7 @@ class PriceDataModel(BaseModel):
     data_source: str = Field(default="agmarknet", description="Source of the data")
     scraped_at: datetime = Field(default_factory=datetime.now, description="When data was scraped")
     quality_score: float = Field(default=1.0, description="Data quality indicator (0-1)")
+    complete: bool = Field(default=True, description="False if the scrape missed some markets; such rows never become final")
     
     class Config:
         # Allow ObjectId to be used
@@ -82,3 +84,161 @@ class QueryAnalyticsModel(BaseModel):
             ObjectId: str,
             datetime: lambda v: v.isoformat()
         }
+
+class ScrapeLeaseModel(BaseModel):
+    """Cross-worker lease giving one worker the right to scrape a price key"""
+    
+    lease_key: str = Field(..., description="commodity_code|district_code|date")
+    commodity_code: str = Field(..., description="AgMarkNet commodity code")
+    district_code: str = Field(..., description="AgMarkNet district code")
+    date: str = Field(..., description="Market date in DD-Mon-YYYY format")
+    
+    # Ownership
+    owner_id: str = Field(..., description="host:pid of the worker holding the lease")
+    acquired_at: datetime = Field(default_factory=datetime.now, description="When the lease was taken")
+    heartbeat_at: datetime = Field(default_factory=datetime.now, description="Last heartbeat from the owner")
+    expires_at: datetime = Field(..., description="Lease is free for takeover after this time")
+    
+    class Config:
+        arbitrary_types_allowed = True
+        json_encoders = {
+            ObjectId: str,
+            datetime: lambda v: v.isoformat()
+        }
+
+class ScrapeJobModel(BaseModel):
+    """Queued scrape of one commodity x district x date, run by a scraper worker"""
+    
+    job_id: str = Field(..., description="commodity_code|district_code|date")
+    commodity_code: str = Field(..., description="AgMarkNet commodity code")
+    district_code: str = Field(..., description="AgMarkNet district code")
+    date: str = Field(..., description="Market date in DD-Mon-YYYY format")
+    
+    # Queue state
+    status: str = Field(default="queued", description="queued/leased/done/failed")
+    attempts: int = Field(default=0, description="Number of times a worker leased the job")
+    owner_id: Optional[str] = Field(None, description="Worker currently holding the job")
+    lease_expires_at: Optional[datetime] = Field(None, description="Job returns to the queue after this time")
+    last_error: Optional[str] = Field(None, description="Error from the last failed attempt")
+    records_cached: int = Field(default=0, description="Price rows written by the worker")
+    
+    # Timestamps
+    enqueued_at: datetime = Field(default_factory=datetime.now, description="When the job was queued")
+    updated_at: datetime = Field(default_factory=datetime.now, description="Last state change")
+    
+    class Config:
+        arbitrary_types_allowed = True
+        json_encoders = {
+            ObjectId: str,
+            datetime: lambda v: v.isoformat()
+        }
+
+class PriceQueryJobModel(BaseModel):
+    """Chat price query (or range backfill) answered in the background, polled or streamed by the client"""
+    
+    job_id: str = Field(..., description="Random job identifier handed to the client")
+    session_id: Optional[str] = Field(None, description="Chat session the query came from")
+    commodity: Optional[str] = Field(None, description="Queried commodity")
+    district: Optional[str] = Field(None, description="Queried district")
+    date_requested: Optional[str] = Field(None, description="Requested date")
+    
+    # Result
+    status: str = Field(default="pending", description="pending/running/done/failed")
+    data_source: Optional[str] = Field(None, description="cached/scraped/queued/busy/timeout")
+    message: Optional[str] = Field(None, description="Formatted chat reply once finished")
+    markets: List[dict] = Field(default_factory=list, description="summarize_prices_per_market rows")
+    error: Optional[str] = Field(None, description="Error if the job failed")
+    result: Optional[dict] = Field(None, description="Range backfill outcome: status, scraped_days, records_cached")
+    
+    # Timestamps
+    created_at: datetime = Field(default_factory=datetime.now, description="When the job was created")
+    finished_at: Optional[datetime] = Field(None, description="When the result was stored")
+    
+    class Config:
+        arbitrary_types_allowed = True
+        json_encoders = {
+            ObjectId: str,
+            datetime: lambda v: v.isoformat()
+        }
+
+class MarketCatalogueModel(BaseModel):
+    """AgMarkNet markets of one UP district, as offered in the ddlMarket dropdown"""
+    
+    district_name: str = Field(..., description="District name")
+    district_code: Optional[str] = Field(None, description="AgMarkNet ddlDistrict value, when known")
+    markets: List[dict] = Field(default_factory=list, description="[{name}] per market; scrapes match ddlMarket options by name")
+    source: str = Field(default="district_dropdown", description="district_dropdown or keywords")
+    refreshed_at: datetime = Field(default_factory=datetime.now, description="When AgMarkNet was last crawled")
+    
+    class Config:
+        arbitrary_types_allowed = True
+        json_encoders = {
+            ObjectId: str,
+            datetime: lambda v: v.isoformat()
+        }
+
+class CrawlRunModel(BaseModel):
+    """Progress of one resumable batch crawl over commodities x districts x dates"""
+    
+    crawl_id: str = Field(..., description="Crawl name, e.g. nightly-2025-08-25")
+    start_date: str = Field(..., description="First market date in DD-Mon-YYYY format")
+    end_date: str = Field(..., description="Last market date in DD-Mon-YYYY format")
+    
+    # Progress
+    status: str = Field(default="running", description="running/done/interrupted")
+    total_units: int = Field(default=0, description="commodity x district x date units in the crawl")
+    completed_units: int = Field(default=0, description="Units checkpointed as done")
+    records_cached: int = Field(default=0, description="Price rows written so far")
+    unresolved_units: int = Field(default=0, description="Units skipped this run because their district's markets were not identified")
+    unresolved_districts: List[str] = Field(default_factory=list, description="Districts with unidentified markets this run")
+    units_per_minute: float = Field(default=0.0, description="Throughput of the current run")
+    
+    # Timestamps
+    started_at: datetime = Field(default_factory=datetime.now, description="When the crawl was first started")
+    updated_at: datetime = Field(default_factory=datetime.now, description="Last checkpoint")
+    
+    class Config:
+        arbitrary_types_allowed = True
+        json_encoders = {
+            ObjectId: str,
+            datetime: lambda v: v.isoformat()
+        }
+
+class PriceMissModel(BaseModel):
+    """Negative-cache entry: a price key AgMarkNet is known to have no rows for"""
+    
+    miss_key: str = Field(..., description="commodity_code|district_code|date")
+    commodity_code: str = Field(..., description="AgMarkNet commodity code")
+    district_code: str = Field(..., description="AgMarkNet district code")
+    date: str = Field(..., description="Market date in DD-Mon-YYYY format")
+    reason: str = Field(..., description="future_date/no_data")
+    recorded_at: datetime = Field(default_factory=datetime.now, description="When the miss was observed")
+    expires_at: datetime = Field(..., description="The key is scraped again after this time")
+    
+    class Config:
+        arbitrary_types_allowed = True
+        json_encoders = {
+            ObjectId: str,
+            datetime: lambda v: v.isoformat()
+        }
+
+class PriceSummaryModel(BaseModel):
+    """Per-market summary of one price key, computed when its rows are cached"""
+    
+    summary_key: str = Field(..., description="commodity_code|district_code|date")
+    commodity_code: str = Field(..., description="AgMarkNet commodity code")
+    district_code: str = Field(..., description="AgMarkNet district code")
+    date: str = Field(..., description="Market date in DD-Mon-YYYY format")
+    top_k: int = Field(..., description="Latest rows per market the averages cover")
+    markets: List[dict] = Field(default_factory=list, description="summarize_prices_per_market rows")
+    market_count: int = Field(default=0, description="Number of markets summarized")
+    overall_avg: Optional[float] = Field(None, description="Average modal price across all markets")
+    scraped_at: datetime = Field(..., description="When the summarized rows were scraped")
+    complete: bool = Field(default=True, description="False if the scrape missed some markets")
+    
+    class Config:
+        arbitrary_types_allowed = True
+        json_encoders = {
+            ObjectId: str,
+            datetime: lambda v: v.isoformat()
+        }
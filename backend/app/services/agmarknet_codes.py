@@ -0,0 +1,14 @@
+# AgMarkNet district / commodity codes the scraper knows by name.
+# Kept free of the scraper's heavy imports so the catalogue, the crawl and
+# the API can share them.
+DISTRICT_NAMES = {
+    '7': 'agra', '33': 'lucknow', '26': 'kanpur', '38': 'meerut',
+    '18': 'ghaziabad', '3': 'aligarh', '40': 'moradabad', '58': 'saharanpur',
+    '19': 'gorakhpur', '9': 'bareilly', '37': 'mathura', '24': 'jhansi',
+    '1': 'allahabad', '68': 'varanasi', '16': 'firozabad', '15': 'faizabad'
+}
+
+COMMODITY_NAMES = {
+    '23': 'Wheat', '1': 'Rice', '25': 'Maize', '46': 'Potato',
+    '47': 'Onion', '48': 'Tomato', '29': 'Gram', '30': 'Arhar'
+}
@@ -0,0 +1,141 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from bs4 import BeautifulSoup
+from typing import Optional, Dict, List, Tuple
+from app.core.config import settings
+
+# ---- CONFIG ----
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+
+# One adapter shared by every client so keep-alive connections to AgMarkNet
+# are pooled across scrapes, while each client keeps its own cookie jar.
+_shared_adapter = HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=settings.scraper_http_pool_size,
+    max_retries=Retry(total=2, backoff_factor=0.5, status_forcelist=[502, 503, 504], allowed_methods=None),
+)
+
+class AgmarknetForm:
+    """Snapshot of the SearchCmmMkt.aspx form as returned by the server"""
+
+    def __init__(self, html: str):
+        self.soup = BeautifulSoup(html, 'html.parser')
+        self.form = self.soup.find('form') or self.soup
+
+    def fields(self) -> Dict[str, str]:
+        """Every value a browser would post back, including __VIEWSTATE/__EVENTVALIDATION"""
+        values = {}
+        for inp in self.form.find_all('input'):
+            name = inp.get('name')
+            input_type = (inp.get('type') or 'text').lower()
+            if not name or input_type in ('submit', 'button', 'image', 'reset'):
+                continue
+            if input_type in ('checkbox', 'radio') and not inp.has_attr('checked'):
+                continue
+            values[name] = inp.get('value', '')
+        for select in self.form.find_all('select'):
+            name = select.get('name')
+            if not name:
+                continue
+            selected = select.find('option', selected=True) or select.find('option')
+            if selected is not None:
+                values[name] = selected.get('value', selected.get_text().strip())
+        return values
+
+    def _select(self, name: str):
+        return self.form.find('select', {'name': name}) or self.form.find('select', {'id': name})
+
+    def options(self, name: str) -> List[Tuple[str, str]]:
+        """(value, text) pairs of a dropdown, skipping the --Select-- placeholder"""
+        select = self._select(name)
+        if select is None:
+            return []
+        options = []
+        for opt in select.find_all('option'):
+            text = opt.get_text().strip()
+            if text and text != '--Select--':
+                options.append((opt.get('value', text), text))
+        return options
+
+    def indexed_options(self, name: str) -> List[Tuple[int, str, str]]:
+        """(index, value, text) of every option, indexed like Select(...).options in the browser"""
+        select = self._select(name)
+        if select is None:
+            return []
+        return [(i, opt.get('value', opt.get_text().strip()), opt.get_text().strip())
+                for i, opt in enumerate(select.find_all('option'))]
+
+    def option_value(self, name: str, text: str) -> Optional[str]:
+        for value, option_text in self.options(name):
+            if option_text.lower() == text.lower():
+                return value
+        return None
+
+    def autopostback(self, name: str) -> bool:
+        """Whether changing this control triggers a __doPostBack in the browser"""
+        control = self._select(name) or self.form.find('input', {'name': name})
+        return control is not None and '__doPostBack' in (control.get('onchange') or '')
+
+class AgmarknetHttpClient:
+    """
+    Browserless driver for SearchCmmMkt.aspx.
+
+    Replays the ASP.NET postbacks a browser would send, carrying the
+    __VIEWSTATE/__EVENTVALIDATION of the previous response forward.
+    """
+
+    def __init__(self, search_url: Optional[str] = None, timeout: Optional[int] = None):
+        self.search_url = search_url or settings.agmarknet_search_url
+        self.timeout = timeout or settings.scraper_http_timeout
+        self.session = requests.Session()
+        self.session.mount("http://", _shared_adapter)
+        self.session.mount("https://", _shared_adapter)
+        self.session.headers["User-Agent"] = USER_AGENT
+
+    def open(self) -> AgmarknetForm:
+        resp = self.session.get(self.search_url, timeout=self.timeout)
+        resp.raise_for_status()
+        return AgmarknetForm(resp.text)
+
+    def post(self, form: AgmarknetForm, changes: Dict[str, str],
+             event_target: str = "", submit: Optional[str] = None) -> AgmarknetForm:
+        """Post the form back with some values changed, as a control event or a button click"""
+        data = form.fields()
+        data.update(changes)
+        data["__EVENTTARGET"] = event_target
+        data["__EVENTARGUMENT"] = ""
+        if submit:
+            button = form.form.find('input', {'name': submit})
+            data[submit] = button.get('value', 'Go') if button is not None else 'Go'
+        resp = self.session.post(self.search_url, data=data, timeout=self.timeout)
+        resp.raise_for_status()
+        return AgmarknetForm(resp.text)
+
+    def select(self, form: AgmarknetForm, name: str, text: str) -> AgmarknetForm:
+        """Pick a dropdown option by its visible text, posting back if the page would"""
+        value = form.option_value(name, text)
+        if value is None:
+            raise ValueError(f"Option '{text}' not found in {name}")
+        if form.autopostback(name):
+            return self.post(form, {name: value}, event_target=name)
+        self._mark_selected(form, name, value)
+        return form
+
+    def _mark_selected(self, form: AgmarknetForm, name: str, value: str):
+        for opt in form._select(name).find_all('option'):
+            if opt.get('value') == value:
+                opt['selected'] = 'selected'
+            elif opt.has_attr('selected'):
+                del opt['selected']
+
+    def set_text(self, form: AgmarknetForm, name: str, value: str) -> AgmarknetForm:
+        inp = form.form.find('input', {'name': name})
+        if inp is None:
+            raise ValueError(f"Input {name} not found")
+        inp['value'] = value
+        return form
+
+    def close(self):
+        # Only drop this client's cookies; the shared adapter keeps its connections
+        self.session.cookies.clear()
@@ -2,10 +2,12 @@ from jose import jwt
 from datetime import datetime, timedelta
 from passlib.context import CryptContext
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from typing import Optional
+from typing import Any, Dict, Optional
 import uuid
+from pymongo import ASCENDING, IndexModel
 from app.models.user import UserCreate, UserInDB, UserResponse, TokenData
 from app.core.config import settings
+from app.core.indexes import sync_indexes
 
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -16,6 +18,10 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
 class AuthService:
+    INDEXES = {
+        "users": [IndexModel([("username", ASCENDING)], unique=True)],
+    }
+
     def __init__(self):
         self.db = None
         self.users_collection = None
@@ -24,6 +30,9 @@ class AuthService:
         self.db = db
         self.users_collection = db.users
 
+    async def ensure_indexes(self, create: bool = True) -> Dict[str, Any]:
+        return await sync_indexes(self.db, self.INDEXES, create)
+
     def verify_password(self, plain_password: str, hashed_password: str) -> bool:
         return pwd_context.verify(plain_password, hashed_password)
 
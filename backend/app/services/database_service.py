@@ -1,10 +1,25 @@
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from app.models.price_data import PriceDataModel, UserSessionModel, QueryAnalyticsModel
-from typing import Optional, List, Dict, Any
+from app.models.price_data import PriceDataModel, UserSessionModel, QueryAnalyticsModel, ScrapeLeaseModel, ScrapeJobModel, PriceQueryJobModel, MarketCatalogueModel, CrawlRunModel, PriceMissModel
+from pymongo import ASCENDING, DESCENDING, IndexModel, ReturnDocument, ReplaceOne, UpdateOne
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from typing import Optional, List, Dict, Any, Tuple
 import pandas as pd
 from datetime import datetime, timedelta
+from app.core.config import settings
+from app.core.indexes import sync_indexes
+from app.services.freshness_policy import freshness_policy
+from app.services.price_memory_cache import price_memory_cache, price_summary_memory_cache
+from app.services.price_summary import price_summary_doc, summary_frame
+from app.services.price_records import price_records, AGMARKNET_DATE_FORMAT
+
+# One cached row per market and day; cache writes upsert on this key
+PRICE_KEY_FIELDS = ("commodity_code", "district_code", "market_name", "date")
 
 class SessionService:
+    INDEXES = {
+        "user_sessions": [IndexModel([("session_id", ASCENDING)], unique=True)],
+    }
+
     def __init__(self):
         self.db = None
         self.collection = None
@@ -21,6 +36,9 @@ class SessionService:
         self.db = db
         self.collection = db.user_sessions
 
+    async def ensure_indexes(self, create: bool = True) -> Dict[str, Any]:
+        return await sync_indexes(self.db, self.INDEXES, create)
+
     async def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
         """Get session by session_id"""
         try:
@@ -88,74 +106,639 @@ class SessionService:
             return False
 
 class PriceDataService:
+    INDEXES = {
+        "price_data": [
+            # One document per market and day; cache writes upsert on it
+            IndexModel([(field, ASCENDING) for field in PRICE_KEY_FIELDS], unique=True, name="price_key_unique"),
+            # get_cached_prices: key equality plus a scraped_at freshness range
+            IndexModel([("commodity_code", ASCENDING), ("district_code", ASCENDING),
+                        ("date", ASCENDING), ("scraped_at", ASCENDING)]),
+            # Stale fallback: newest scrape of a commodity/district on any date
+            IndexModel([("commodity_code", ASCENDING), ("district_code", ASCENDING), ("scraped_at", DESCENDING)]),
+        ],
+        "price_misses": [IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0)],
+    }
+
     def __init__(self):
         self.db = None
         self.collection = None
+        self.misses = None
+        self.summaries = None
 
     def set_db(self, db: AsyncIOMotorDatabase):
         """Set database instance from dependency injection"""
         self.db = db
         self.collection = db.price_data
+        self.misses = db.price_misses
+        self.summaries = db.price_summaries
+
+    async def ensure_indexes(self, create: bool = True) -> Dict[str, Any]:
+        """
+        Declared indexes; duplicates left by the old insert-per-row cache are
+        removed if they block the unique price key. Negative-cache expiry is
+        enforced in get_known_miss(), the TTL index only cleans up.
+        """
+        report = await sync_indexes(self.db, self.INDEXES, create)
+        if create and self._is_duplicate_key_error(report["price_data"]["failed"].get("price_key_unique")):
+            print("🧹 Unique price index blocked by duplicates, deduplicating price_data")
+            await self._drop_duplicate_prices()
+            report = await sync_indexes(self.db, self.INDEXES, create)
+        return report
+
+    @staticmethod
+    def _is_duplicate_key_error(error: Optional[str]) -> bool:
+        """True if an index build failed on duplicate keys (server error 11000), not for any other reason"""
+        return bool(error) and ("E11000" in error or "DuplicateKey" in error)
+
+    async def _drop_duplicate_prices(self) -> int:
+        """
+        Merge the documents of every duplicated price key into its newest one,
+        averaging their prices and keeping the latest market date, the way
+        _price_docs merges repeated market rows.
+        """
+        pipeline = [
+            {"$sort": {"scraped_at": -1}},
+            {"$group": {"_id": {field: f"${field}" for field in PRICE_KEY_FIELDS},
+                        "keep": {"$first": "$_id"}, "ids": {"$push": "$_id"}, "count": {"$sum": 1},
+                        "modal_price": {"$avg": "$modal_price"},
+                        "min_price": {"$avg": "$min_price"},
+                        "max_price": {"$avg": "$max_price"},
+                        "market_date": {"$max": "$market_date"},
+                        "complete": {"$min": {"$ifNull": ["$complete", True]}}}},
+            {"$match": {"count": {"$gt": 1}}},
+        ]
+        removed = 0
+        async for group in self.collection.aggregate(pipeline, allowDiskUse=True):
+            merged = {field: group[field] for field in ("modal_price", "min_price", "max_price", "complete")}
+            if group["market_date"] is not None:
+                merged["market_date"] = group["market_date"]
+            await self.collection.update_one({"_id": group["keep"]}, {"$set": merged})
+            stale_ids = [doc_id for doc_id in group["ids"] if doc_id != group["keep"]]
+            result = await self.collection.delete_many({"_id": {"$in": stale_ids}})
+            removed += result.deleted_count
+        print(f"🧹 Merged away {removed} duplicate price records")
+        return removed
+
+    async def get_known_miss(self, commodity_code: str, district_code: str, date: str) -> Optional[Dict[str, Any]]:
+        """The unexpired negative-cache entry for the key, if AgMarkNet is known to have no rows"""
+        try:
+            if self.misses is None:
+                return None
+            return await self.misses.find_one({
+                "_id": f"{commodity_code}|{district_code}|{date}",
+                "expires_at": {"$gt": datetime.now()}
+            })
+        except Exception as e:
+            print(f"❌ Error reading negative cache: {e}")
+            return None
+
+    async def remember_miss(self, commodity_code: str, district_code: str, date: str,
+                            reason: str, ttl_seconds: int) -> bool:
+        """Record that the key has no rows so repeat queries skip the scrape until it expires"""
+        try:
+            if self.misses is None:
+                return False
+            miss = PriceMissModel(
+                miss_key=f"{commodity_code}|{district_code}|{date}",
+                commodity_code=commodity_code,
+                district_code=district_code,
+                date=date,
+                reason=reason,
+                expires_at=datetime.now() + timedelta(seconds=ttl_seconds)
+            )
+            doc = miss.dict()
+            doc["_id"] = doc.pop("miss_key")
+            await self.misses.replace_one({"_id": doc["_id"]}, doc, upsert=True)
+            print(f"🚫 No data for {doc['_id']} ({reason}), remembered for {ttl_seconds}s")
+            return True
+        except Exception as e:
+            print(f"❌ Error writing negative cache: {e}")
+            return False
 
     async def get_cached_prices(self, commodity_code: str, district_code: str, 
-                              date: str, max_age_hours: int = 2) -> Optional[pd.DataFrame]:
-        """Get cached price data"""
+                              date: str, max_age_hours: Optional[int] = None,
+                              allow_stale: bool = False) -> Optional[pd.DataFrame]:
+        """
+        Get cached price data. Freshness follows freshness_policy (final past
+        dates never expire, recent ones expire at each mandi reporting time)
+        unless a flat max_age_hours is given. allow_stale ignores freshness
+        and, if the date was never cached, falls back to the latest cached
+        date for the commodity/district; callers must flag such rows as stale.
+        Policy reads go through the in-process price_memory_cache first.
+        """
         try:
             # 🔥 CRITICAL FIX: Use 'is None' instead of 'not self.collection'
             if self.collection is None:
                 return None
-                
-            cutoff_time = datetime.now() - timedelta(hours=max_age_hours)
-            cursor = self.collection.find({
+
+            use_memory = max_age_hours is None and not allow_stale
+            if use_memory:
+                df = price_memory_cache.get(commodity_code, district_code, date)
+                if df is not None:
+                    return df
+
+            query = {
                 "commodity_code": commodity_code,
                 "district_code": district_code, 
                 "date": date,
-                "scraped_at": {"$gte": cutoff_time}
-            })
-            documents = await cursor.to_list(length=None)
+            }
+            if not allow_stale:
+                query.update(self._fresh_filter(commodity_code, date, max_age_hours))
+            documents = await self.collection.find(query).to_list(length=None)
+            if not documents and allow_stale:
+                latest = await self.collection.find_one(
+                    {"commodity_code": commodity_code, "district_code": district_code},
+                    sort=[("scraped_at", -1)]
+                )
+                if latest:
+                    query["date"] = latest["date"]
+                    documents = await self.collection.find(query).to_list(length=None)
             if documents:
-                df = pd.DataFrame(documents)
+                df = price_records(documents)
                 print(f"📦 Retrieved {len(df)} cached price records")
+                if use_memory:
+                    price_memory_cache.put(commodity_code, district_code, date, df)
                 return df
             return None
         except Exception as e:
             print(f"❌ Error getting cached prices: {e}")
             return None
 
+    @staticmethod
+    def _fresh_filter(commodity_code: str, date: str, max_age_hours: Optional[int] = None) -> Dict[str, Any]:
+        if max_age_hours is None:
+            return freshness_policy.fresh_filter(commodity_code, date)
+        return {"scraped_at": {"$gte": datetime.now() - timedelta(hours=max_age_hours)}}
+
+    @staticmethod
+    def _summary_pipeline(query: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        summarize_prices_per_market as an aggregation over one price key:
+        prices averaged per market and rounded half to even, one row per
+        market sorted by name. The unique price key leaves a single document
+        per market and date, so no top_k window is needed; the $group only
+        folds leftovers from before that index. Each row also carries its
+        documents' oldest scraped_at and whether all were complete.
+        """
+        return [
+            {"$match": query},
+            {"$project": {
+                "market_name": 1, "modal_price": 1, "min_price": 1, "max_price": 1, "scraped_at": 1,
+                "complete": {"$ifNull": ["$complete", True]},
+                # Documents cached before market_date existed only have the DD-Mon-YYYY string
+                "market_date": {"$ifNull": ["$market_date", {"$dateFromString": {
+                    "dateString": "$date", "format": AGMARKNET_DATE_FORMAT, "onError": None, "onNull": None
+                }}]},
+            }},
+            {"$group": {
+                "_id": "$market_name",
+                "modal": {"$avg": "$modal_price"},
+                "min": {"$avg": "$min_price"},
+                "max": {"$avg": "$max_price"},
+                "latest": {"$max": "$market_date"},
+                "scraped_at": {"$min": "$scraped_at"},
+                "complete": {"$min": "$complete"},
+            }},
+            {"$sort": {"_id": 1}},
+            {"$project": {
+                "_id": 0,
+                "Market": "$_id",
+                "Avg Modal": {"$round": ["$modal", 0]},
+                "Avg Min": {"$round": ["$min", 0]},
+                "Avg Max": {"$round": ["$max", 0]},
+                "Latest Date": "$latest",
+                "scraped_at": 1,
+                "complete": 1,
+            }},
+        ]
+
+    async def get_cached_summary(self, commodity_code: str, district_code: str, date: str,
+                                 max_age_hours: Optional[int] = None) -> Optional[pd.DataFrame]:
+        """
+        Fresh cached rows summarized server-side, one row per market in the
+        summarize_prices_per_market schema; None when nothing is cached or the
+        server lacks %b dates in $dateFromString (MongoDB < 7.0).
+        Policy reads fill price_summary_memory_cache.
+        """
+        try:
+            if self.collection is None or not settings.summary_pipeline_enabled:
+                return None
+            query = {
+                "commodity_code": commodity_code,
+                "district_code": district_code,
+                "date": date,
+                **self._fresh_filter(commodity_code, date, max_age_hours),
+            }
+            markets = await self.collection.aggregate(self._summary_pipeline(query)).to_list(length=None)
+            if markets:
+                print(f"📦 Summarized {len(markets)} cached markets in Mongo")
+                summary_df = summary_frame(markets)
+                if max_age_hours is None:
+                    price_summary_memory_cache.put(
+                        commodity_code, district_code, date, summary_df,
+                        scraped_at=min(market["scraped_at"] for market in markets),
+                        complete=all(market["complete"] for market in markets)
+                    )
+                return summary_df
+            return None
+        except Exception as e:
+            print(f"❌ Error summarizing cached prices: {e}")
+            return None
+
+    async def get_price_summary(self, commodity_code: str, district_code: str,
+                                date: str) -> Optional[pd.DataFrame]:
+        """
+        The per-market summary stored when the key was last cached, as a
+        summarize_prices_per_market frame; None if missing or no longer fresh.
+        Goes through the in-process price_summary_memory_cache first.
+        """
+        try:
+            summary_df = price_summary_memory_cache.get(commodity_code, district_code, date)
+            if summary_df is not None:
+                return summary_df
+            if self.summaries is None:
+                return None
+            doc = await self.summaries.find_one({
+                "_id": f"{commodity_code}|{district_code}|{date}",
+                **freshness_policy.fresh_filter(commodity_code, date)
+            })
+            if doc and doc.get("markets"):
+                print(f"📦 Retrieved precomputed summary of {doc['market_count']} markets")
+                summary_df = summary_frame(doc["markets"])
+                price_summary_memory_cache.put(commodity_code, district_code, date, summary_df,
+                                               scraped_at=doc["scraped_at"], complete=doc.get("complete", True))
+                return summary_df
+            return None
+        except Exception as e:
+            print(f"❌ Error getting price summary: {e}")
+            return None
+
+    async def _save_summaries(self, summaries: List[Optional[Dict[str, Any]]]) -> int:
+        """Replace the stored summaries of the keys just cached; failures never fail the cache write"""
+        try:
+            requests = [ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in summaries if doc]
+            if self.summaries is None or not requests:
+                return 0
+            result = await self.summaries.bulk_write(requests, ordered=False)
+            return result.upserted_count + result.matched_count
+        except Exception as e:
+            print(f"❌ Error saving price summaries: {e}")
+            return 0
+
+    @staticmethod
+    def _price_docs(price_df: pd.DataFrame, commodity_code: str, district_code: str, date: str,
+                    scraped_at: datetime) -> List[Dict[str, Any]]:
+        """
+        Vectorized documents for one scrape, one per market; repeated market
+        rows are averaged. Rows of a partial scrape are stored complete=False
+        so they never become final.
+        """
+        if price_df is None or price_df.empty:
+            return []
+        records = price_records(price_df, date)
+        frame = records.groupby("Market", as_index=False, sort=False).agg({
+            "Commodity": "first",
+            "District": "first",
+            "Modal Price": "mean",
+            "Min Price": "mean",
+            "Max Price": "mean",
+            "Date": "max",
+        }).rename(columns={
+            "Market": "market_name",
+            "Commodity": "commodity_name",
+            "District": "district_name",
+            "Modal Price": "modal_price",
+            "Min Price": "min_price",
+            "Max Price": "max_price",
+            "Date": "market_date",
+        })
+        frame = frame.assign(commodity_code=commodity_code, district_code=district_code, date=date,
+                             data_source="agmarknet", quality_score=1.0,
+                             complete=not price_df.attrs.get("partial", False))
+        # NaN is not valid BSON for "no price", store null instead
+        docs = frame.astype(object).where(frame.notna(), None).to_dict("records")
+        for doc in docs:
+            doc["scraped_at"] = scraped_at
+        return docs
+
+    @staticmethod
+    def _upsert(doc: Dict[str, Any]) -> UpdateOne:
+        key = {field: doc[field] for field in PRICE_KEY_FIELDS}
+        return UpdateOne(key, {"$set": doc}, upsert=True)
+
+    async def _bulk_upsert(self, docs: List[Dict[str, Any]]) -> int:
+        """One unordered bulk_write of upserts; a rescrape overwrites its rows instead of duplicating them"""
+        if not docs:
+            return 0
+        result = await self.collection.bulk_write([self._upsert(doc) for doc in docs], ordered=False)
+        return result.upserted_count + result.matched_count
+
+    @staticmethod
+    def _summary_doc(docs: List[Dict[str, Any]], commodity_code: str, district_code: str, date: str,
+                     scraped_at: datetime) -> Optional[Dict[str, Any]]:
+        """
+        The price_summaries document of the documents just written, so it
+        agrees with summarizing the cached rows (one averaged row per market)
+        """
+        if not docs:
+            return None
+        return price_summary_doc(price_records(docs, date), commodity_code, district_code, date, scraped_at)
+
+    def _invalidate(self, commodity_code: str, district_code: str, date: str):
+        price_memory_cache.invalidate(commodity_code, district_code, date)
+        price_summary_memory_cache.invalidate(commodity_code, district_code, date)
+
     async def cache_price_data(self, price_df: pd.DataFrame, commodity_code: str, 
                              district_code: str, date: str) -> int:
-        """Cache price data"""
+        """Cache price data and its per-market summary"""
         try:
             # 🔥 CRITICAL FIX: Use 'is None' instead of 'not self.collection'
             if self.collection is None:
                 return 0
-                
-            cached_count = 0
-            current_time = datetime.now()
-            for _, row in price_df.iterrows():
-                price_doc = {
-                    "commodity_code": commodity_code,
-                    "commodity_name": row.get('Commodity', 'Unknown'),
-                    "district_code": district_code,
-                    "district_name": row.get('District', 'Unknown'),
-                    "market_name": row.get('Market', 'Unknown'),
-                    "date": date,
-                    "modal_price": row.get('Modal', 0.0),
-                    "min_price": row.get('Min', 0.0),
-                    "max_price": row.get('Max', 0.0),
-                    "data_source": "agmarknet",
-                    "scraped_at": current_time,
-                    "quality_score": 1.0
-                }
-                await self.collection.insert_one(price_doc)
-                cached_count += 1
+            scraped_at = datetime.now()
+            docs = self._price_docs(price_df, commodity_code, district_code, date, scraped_at)
+            cached_count = await self._bulk_upsert(docs)
+            self._invalidate(commodity_code, district_code, date)
+            if cached_count:
+                await self._save_summaries([self._summary_doc(docs, commodity_code, district_code, date, scraped_at)])
             print(f"📦 Cached {cached_count} price records")
             return cached_count
         except Exception as e:
             print(f"❌ Error caching price data: {e}")
             return 0
 
+    async def cache_price_batches(self, batches: List[Tuple[pd.DataFrame, str, str, str]]) -> int:
+        """Cache many (price_df, commodity_code, district_code, date) results with one bulk_write"""
+        try:
+            if self.collection is None:
+                return 0
+            current_time = datetime.now()
+            batch_docs = [
+                (self._price_docs(price_df, commodity_code, district_code, date, current_time),
+                 commodity_code, district_code, date)
+                for price_df, commodity_code, district_code, date in batches
+            ]
+            cached_count = await self._bulk_upsert([doc for docs, *_ in batch_docs for doc in docs])
+            for _, commodity_code, district_code, date in batch_docs:
+                self._invalidate(commodity_code, district_code, date)
+            if cached_count:
+                await self._save_summaries([
+                    self._summary_doc(docs, commodity_code, district_code, date, current_time)
+                    for docs, commodity_code, district_code, date in batch_docs
+                ])
+                print(f"📦 Bulk cached {cached_count} price records from {len(batches)} scrapes")
+            return cached_count
+        except Exception as e:
+            print(f"❌ Error bulk caching price data: {e}")
+            return 0
+
+class ScrapeLeaseService:
+    """Mongo-backed leases so only one worker across all nodes scrapes a given price key"""
+
+    INDEXES = {
+        "scrape_leases": [IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0)],
+    }
+
+    def __init__(self):
+        self.db = None
+        self.collection = None
+
+    def set_db(self, db: AsyncIOMotorDatabase):
+        """Set database instance from dependency injection"""
+        self.db = db
+        self.collection = db.scrape_leases
+
+    @staticmethod
+    def lease_key(commodity_code: str, district_code: str, date: str) -> str:
+        return f"{commodity_code}|{district_code}|{date}"
+
+    async def ensure_indexes(self, create: bool = True) -> Dict[str, Any]:
+        """Expired leases are cleaned up by Mongo; expiry itself is enforced in acquire()"""
+        return await sync_indexes(self.db, self.INDEXES, create)
+
+    async def acquire(self, commodity_code: str, district_code: str, date: str,
+                      owner_id: str, ttl_seconds: int) -> bool:
+        """Take the lease if it is free, expired, or already ours"""
+        try:
+            if self.collection is None:
+                return True  # No DB, nothing to coordinate with
+            now = datetime.now()
+            key = self.lease_key(commodity_code, district_code, date)
+            lease = ScrapeLeaseModel(
+                lease_key=key,
+                commodity_code=commodity_code,
+                district_code=district_code,
+                date=date,
+                owner_id=owner_id,
+                acquired_at=now,
+                heartbeat_at=now,
+                expires_at=now + timedelta(seconds=ttl_seconds)
+            )
+            # Matches only a lease we may take; a live lease held by someone
+            # else makes the upsert collide on _id and fail
+            await self.collection.update_one(
+                {"_id": key, "$or": [{"expires_at": {"$lt": now}}, {"owner_id": owner_id}]},
+                {"$set": lease.dict()},
+                upsert=True
+            )
+            print(f"🔒 Scrape lease acquired for {key} by {owner_id}")
+            return True
+        except DuplicateKeyError:
+            return False
+        except Exception as e:
+            print(f"❌ Error acquiring scrape lease: {e}")
+            return False
+
+    async def heartbeat(self, commodity_code: str, district_code: str, date: str,
+                        owner_id: str, ttl_seconds: int) -> bool:
+        """Extend our lease; False means it was lost to another worker"""
+        try:
+            if self.collection is None:
+                return True
+            now = datetime.now()
+            result = await self.collection.update_one(
+                {"_id": self.lease_key(commodity_code, district_code, date), "owner_id": owner_id},
+                {"$set": {"heartbeat_at": now, "expires_at": now + timedelta(seconds=ttl_seconds)}}
+            )
+            return result.matched_count > 0
+        except Exception as e:
+            print(f"❌ Error renewing scrape lease: {e}")
+            return False
+
+    async def release(self, commodity_code: str, district_code: str, date: str, owner_id: str) -> bool:
+        try:
+            if self.collection is None:
+                return False
+            result = await self.collection.delete_one(
+                {"_id": self.lease_key(commodity_code, district_code, date), "owner_id": owner_id}
+            )
+            return result.deleted_count > 0
+        except Exception as e:
+            print(f"❌ Error releasing scrape lease: {e}")
+            return False
+
+class ScrapeJobQueueService:
+    """Mongo-backed work queue of scrape jobs, consumed by standalone scraper workers"""
+
+    INDEXES = {
+        "scrape_jobs": [
+            IndexModel([("status", ASCENDING), ("enqueued_at", ASCENDING)]),
+            IndexModel([("lease_expires_at", ASCENDING)]),
+        ],
+    }
+
+    def __init__(self):
+        self.db = None
+        self.collection = None
+
+    def set_db(self, db: AsyncIOMotorDatabase):
+        """Set database instance from dependency injection"""
+        self.db = db
+        self.collection = db.scrape_jobs
+
+    @staticmethod
+    def job_id(commodity_code: str, district_code: str, date: str) -> str:
+        return f"{commodity_code}|{district_code}|{date}"
+
+    async def ensure_indexes(self, create: bool = True) -> Dict[str, Any]:
+        return await sync_indexes(self.db, self.INDEXES, create)
+
+    async def enqueue(self, commodity_code: str, district_code: str, date: str) -> Optional[str]:
+        """Queue a scrape; a job already queued or running for the same key is reused"""
+        try:
+            if self.collection is None:
+                return None
+            job_id = self.job_id(commodity_code, district_code, date)
+            now = datetime.now()
+            # Finished jobs for the key go back to the queue for a fresh scrape
+            await self.collection.update_one(
+                {"_id": job_id, "status": {"$in": ["done", "failed"]}},
+                {"$set": {"status": "queued", "attempts": 0, "owner_id": None,
+                          "lease_expires_at": None, "last_error": None,
+                          "enqueued_at": now, "updated_at": now}}
+            )
+            job = ScrapeJobModel(
+                job_id=job_id,
+                commodity_code=commodity_code,
+                district_code=district_code,
+                date=date
+            )
+            await self.collection.update_one(
+                {"_id": job_id},
+                {"$setOnInsert": job.dict()},
+                upsert=True
+            )
+            return job_id
+        except Exception as e:
+            print(f"❌ Error enqueuing scrape job: {e}")
+            return None
+
+    async def lease_next(self, owner_id: str, lease_seconds: int, max_attempts: int) -> Optional[Dict[str, Any]]:
+        """
+        Claim the oldest queued job, or one whose worker stopped renewing its lease.
+        An abandoned job that has used up max_attempts is marked failed instead of
+        being leased again, so a job that kills its worker cannot loop forever.
+        """
+        try:
+            if self.collection is None:
+                return None
+            now = datetime.now()
+            await self.collection.update_many(
+                {"status": "leased", "lease_expires_at": {"$lt": now}, "attempts": {"$gte": max_attempts}},
+                {"$set": {"status": "failed", "owner_id": None, "lease_expires_at": None,
+                          "last_error": f"Lease expired after {max_attempts} attempt(s)", "updated_at": now}}
+            )
+            return await self.collection.find_one_and_update(
+                {"$or": [
+                    {"status": "queued"},
+                    {"status": "leased", "lease_expires_at": {"$lt": now}, "attempts": {"$lt": max_attempts}}
+                ]},
+                {"$set": {"status": "leased", "owner_id": owner_id,
+                          "lease_expires_at": now + timedelta(seconds=lease_seconds),
+                          "updated_at": now},
+                 "$inc": {"attempts": 1}},
+                sort=[("enqueued_at", ASCENDING)],
+                return_document=ReturnDocument.AFTER
+            )
+        except Exception as e:
+            print(f"❌ Error leasing scrape job: {e}")
+            return None
+
+    async def extend_lease(self, job_id: str, owner_id: str, lease_seconds: int) -> bool:
+        try:
+            if self.collection is None:
+                return False
+            now = datetime.now()
+            result = await self.collection.update_one(
+                {"_id": job_id, "owner_id": owner_id, "status": "leased"},
+                {"$set": {"lease_expires_at": now + timedelta(seconds=lease_seconds), "updated_at": now}}
+            )
+            return result.matched_count > 0
+        except Exception as e:
+            print(f"❌ Error extending job lease: {e}")
+            return False
+
+    async def complete(self, job_id: str, owner_id: str, records_cached: int) -> bool:
+        try:
+            if self.collection is None:
+                return False
+            result = await self.collection.update_one(
+                {"_id": job_id, "owner_id": owner_id},
+                {"$set": {"status": "done", "records_cached": records_cached,
+                          "lease_expires_at": None, "updated_at": datetime.now()}}
+            )
+            return result.modified_count > 0
+        except Exception as e:
+            print(f"❌ Error completing scrape job: {e}")
+            return False
+
+    async def fail(self, job_id: str, owner_id: str, error: str, max_attempts: int) -> bool:
+        """Requeue the job, or mark it failed once it has used up its attempts"""
+        try:
+            if self.collection is None:
+                return False
+            job = await self.collection.find_one({"_id": job_id, "owner_id": owner_id})
+            if not job:
+                return False
+            status = "failed" if job.get("attempts", 0) >= max_attempts else "queued"
+            await self.collection.update_one(
+                {"_id": job_id, "owner_id": owner_id},
+                {"$set": {"status": status, "last_error": error, "owner_id": None,
+                          "lease_expires_at": None, "updated_at": datetime.now()}}
+            )
+            return True
+        except Exception as e:
+            print(f"❌ Error failing scrape job: {e}")
+            return False
+
+    async def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            if self.collection is None:
+                return None
+            return await self.collection.find_one({"_id": job_id})
+        except Exception as e:
+            print(f"❌ Error getting scrape job: {e}")
+            return None
+
+    async def queued_count(self) -> int:
+        """Jobs waiting for a worker; 0 if the queue cannot be read"""
+        try:
+            if self.collection is None:
+                return 0
+            return await self.collection.count_documents({"status": "queued"})
+        except Exception as e:
+            print(f"❌ Error counting queued scrape jobs: {e}")
+            return 0
+
 class AnalyticsService:
+    INDEXES = {
+        "query_analytics": [
+            # Stats count by time window, popularity filters successful queries in it
+            IndexModel([("timestamp", ASCENDING)]),
+            IndexModel([("success", ASCENDING), ("timestamp", ASCENDING)]),
+        ],
+    }
+
     def __init__(self):
         self.db = None
         self.collection = None
@@ -165,6 +748,9 @@ class AnalyticsService:
         self.db = db
         self.collection = db.query_analytics
 
+    async def ensure_indexes(self, create: bool = True) -> Dict[str, Any]:
+        return await sync_indexes(self.db, self.INDEXES, create)
+
     async def log_query(self, analytics_data: QueryAnalyticsModel) -> bool:
         """Log query analytics"""
         try:
@@ -253,3 +839,226 @@ class AnalyticsService:
         except Exception as e:
             print(f"❌ Error getting query stats: {e}")
             return {"error": str(e)}
+
+class PriceQueryJobService:
+    """Background chat price queries, stored in Mongo so any API worker can answer a poll"""
+
+    INDEXES = {
+        # Old jobs are removed by Mongo once clients have had time to collect them
+        "price_query_jobs": [IndexModel([("created_at", ASCENDING)], expireAfterSeconds=settings.price_job_ttl_seconds)],
+    }
+
+    def __init__(self):
+        self.db = None
+        self.collection = None
+
+    def set_db(self, db: AsyncIOMotorDatabase):
+        """Set database instance from dependency injection"""
+        self.db = db
+        self.collection = db.price_query_jobs
+
+    async def ensure_indexes(self, create: bool = True) -> Dict[str, Any]:
+        return await sync_indexes(self.db, self.INDEXES, create)
+
+    async def create(self, job: PriceQueryJobModel) -> bool:
+        try:
+            if self.collection is None:
+                return False
+            job_doc = job.dict()
+            job_doc["_id"] = job_doc.pop("job_id")
+            await self.collection.insert_one(job_doc)
+            return True
+        except Exception as e:
+            print(f"❌ Error creating price job: {e}")
+            return False
+
+    async def mark_running(self, job_id: str) -> bool:
+        try:
+            result = await self.collection.update_one(
+                {"_id": job_id, "status": "pending"},
+                {"$set": {"status": "running"}}
+            )
+            return result.modified_count > 0
+        except Exception as e:
+            print(f"❌ Error updating price job: {e}")
+            return False
+
+    async def finish(self, job_id: str, status: str, message: str, data_source: Optional[str] = None,
+                     markets: Optional[List[dict]] = None, error: Optional[str] = None,
+                     outcome: Optional[Dict[str, Any]] = None) -> bool:
+        try:
+            result = await self.collection.update_one(
+                {"_id": job_id},
+                {"$set": {"status": status, "message": message, "data_source": data_source,
+                          "markets": markets or [], "error": error, "result": outcome,
+                          "finished_at": datetime.now()}}
+            )
+            return result.modified_count > 0
+        except Exception as e:
+            print(f"❌ Error finishing price job: {e}")
+            return False
+
+    async def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            if self.collection is None:
+                return None
+            return await self.collection.find_one({"_id": job_id})
+        except Exception as e:
+            print(f"❌ Error reading price job: {e}")
+            return None
+
+class MarketCatalogueService:
+    """Persisted district -> AgMarkNet markets catalogue, one document per district"""
+
+    INDEXES = {
+        # _id is the lowercased district name; AgMarkNet's ddlDistrict value is the other district key
+        "market_catalogue": [IndexModel([("district_code", ASCENDING)])],
+    }
+
+    def __init__(self):
+        self.db = None
+        self.collection = None
+
+    def set_db(self, db: AsyncIOMotorDatabase):
+        """Set database instance from dependency injection"""
+        self.db = db
+        self.collection = db.market_catalogue
+
+    async def ensure_indexes(self, create: bool = True) -> Dict[str, Any]:
+        return await sync_indexes(self.db, self.INDEXES, create)
+
+    async def load_all(self) -> List[Dict[str, Any]]:
+        try:
+            if self.collection is None:
+                return []
+            return await self.collection.find({}, {"_id": 0}).to_list(length=None)
+        except Exception as e:
+            print(f"❌ Error loading market catalogue: {e}")
+            return []
+
+    async def save_all(self, entries: List[Dict[str, Any]]) -> int:
+        """Replace each district's document with its freshly crawled entry"""
+        try:
+            if self.collection is None:
+                return 0
+            saved = 0
+            for entry in entries:
+                doc = MarketCatalogueModel(**entry).dict()
+                await self.collection.replace_one({"_id": doc["district_name"].lower()}, doc, upsert=True)
+                saved += 1
+            return saved
+        except Exception as e:
+            print(f"❌ Error saving market catalogue: {e}")
+            return 0
+
+class CrawlCheckpointService:
+    """Checkpoints of batch crawls: one run document plus one document per finished unit"""
+
+    INDEXES = {
+        "crawl_units": [IndexModel([("crawl_id", ASCENDING)])],
+    }
+
+    def __init__(self):
+        self.db = None
+        self.runs = None
+        self.units = None
+
+    def set_db(self, db: AsyncIOMotorDatabase):
+        """Set database instance from dependency injection"""
+        self.db = db
+        self.runs = db.crawl_runs
+        self.units = db.crawl_units
+
+    @staticmethod
+    def unit_id(crawl_id: str, commodity: str, district: str, date: str) -> str:
+        return f"{crawl_id}|{commodity}|{district}|{date}"
+
+    async def ensure_indexes(self, create: bool = True) -> Dict[str, Any]:
+        return await sync_indexes(self.db, self.INDEXES, create)
+
+    async def start_run(self, run: CrawlRunModel) -> Optional[Dict[str, Any]]:
+        """Create the run, or reopen it (keeping its start time) when resuming; None if it cannot be stored"""
+        try:
+            if self.runs is None:
+                return None
+            now = datetime.now()
+            run_doc = run.dict()
+            run_id = run_doc.pop("crawl_id")
+            # Counters accumulate across resumed runs
+            keep = {field: run_doc.pop(field) for field in ("started_at", "records_cached")}
+            await self.runs.update_one(
+                {"_id": run_id},
+                {"$set": {**run_doc, "status": "running", "updated_at": now},
+                 "$setOnInsert": keep},
+                upsert=True
+            )
+            return await self.runs.find_one({"_id": run_id})
+        except PyMongoError as e:
+            print(f"❌ Error starting crawl run: {e}")
+            return None
+
+    async def completed_units(self, crawl_id: str) -> Optional[set]:
+        """Ids of the run's checkpointed units; None if they cannot be read"""
+        try:
+            if self.units is None:
+                return None
+            cursor = self.units.find({"crawl_id": crawl_id}, {"_id": 1})
+            return {doc["_id"] for doc in await cursor.to_list(length=None)}
+        except PyMongoError as e:
+            print(f"❌ Error reading crawl checkpoints: {e}")
+            return None
+
+    async def mark_done(self, crawl_id: str, commodity: str, district: str, date: str, rows: int) -> bool:
+        """Checkpoint one unit; False if it was already recorded or cannot be stored"""
+        try:
+            if self.units is None:
+                return False
+            await self.units.insert_one({
+                "_id": self.unit_id(crawl_id, commodity, district, date),
+                "crawl_id": crawl_id,
+                "commodity": commodity,
+                "district": district,
+                "date": date,
+                "rows": rows,
+                "finished_at": datetime.now()
+            })
+            return True
+        except DuplicateKeyError:
+            return False
+        except PyMongoError as e:
+            print(f"❌ Error checkpointing crawl unit: {e}")
+            return False
+
+    async def mark_unresolved(self, crawl_id: str, district: str):
+        """Note a unit skipped because none of its district's markets could be identified"""
+        try:
+            if self.runs is None:
+                return
+            await self.runs.update_one(
+                {"_id": crawl_id},
+                {"$addToSet": {"unresolved_districts": district},
+                 "$inc": {"unresolved_units": 1},
+                 "$set": {"updated_at": datetime.now()}}
+            )
+        except Exception as e:
+            print(f"❌ Error recording unresolved district: {e}")
+
+    async def update_progress(self, crawl_id: str, fields: Dict[str, Any], inc: Optional[Dict[str, int]] = None):
+        try:
+            if self.runs is None:
+                return
+            update = {"$set": {**fields, "updated_at": datetime.now()}}
+            if inc:
+                update["$inc"] = inc
+            await self.runs.update_one({"_id": crawl_id}, update)
+        except Exception as e:
+            print(f"❌ Error updating crawl progress: {e}")
+
+    async def get_run(self, crawl_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            if self.runs is None:
+                return None
+            return await self.runs.find_one({"_id": crawl_id})
+        except Exception as e:
+            print(f"❌ Error reading crawl run: {e}")
+            return None
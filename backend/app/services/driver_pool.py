@@ -0,0 +1,287 @@
+import atexit
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional, Dict, Any
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.chrome.options import Options
+from selenium.common.exceptions import WebDriverException
+from webdriver_manager.chrome import ChromeDriverManager
+from app.core.config import settings
+from app.services.page_readiness import wait_for_document_ready
+
+# ---- CONFIG ----
+PAGE_LOAD_TIMEOUT = 30  # seconds to wait for the search page on reset
+
+# Requests the scraper never needs: the form and the price table are plain HTML + ASP.NET script
+BLOCKED_URL_PATTERNS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.svg", "*.ico", "*.webp",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*.css",
+    "*.mp4", "*.webm", "*.mp3",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*facebook.net*", "*twitter.com*", "*addthis.com*", "*youtube.com*",
+]
+
+# Chrome subsystems a headless scraper has no use for
+DISABLED_FEATURES = "Translate,MediaRouter,OptimizationHints,AutofillServerCommunication,InterestFeedContentSuggestions"
+
+def build_chrome_options() -> Options:
+    """Headless Chrome options used by every pooled scraper driver"""
+    chrome_options = Options()
+    chrome_options.add_argument("--headless")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--window-size=1920,1080")
+    chrome_options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36")
+    chrome_options.add_argument("--disable-extensions")
+    chrome_options.add_argument("--disable-logging")
+
+    # Lightweight profile: no background services, sync, audio or first-run work
+    for flag in ("--disable-background-networking", "--disable-component-update", "--disable-default-apps",
+                 "--disable-sync", "--disable-client-side-phishing-detection", "--disable-breakpad",
+                 "--disable-notifications", "--no-first-run", "--mute-audio", "--metrics-recording-only",
+                 f"--disable-features={DISABLED_FEATURES}"):
+        chrome_options.add_argument(flag)
+    # The V8 cap only guards against runaway pages: the heap must be able to grow past the
+    # recycle threshold, or the renderer hits the cap (and GCs or crashes) before _over_memory sees it
+    heap_cap_mb = max(settings.scraper_driver_js_heap_cap_mb, 2 * settings.scraper_driver_memory_mb)
+    chrome_options.add_argument(f"--js-flags=--max-old-space-size={heap_cap_mb}")
+    # Without it performance.memory is bucketed and only refreshed every ~20 minutes
+    chrome_options.add_argument("--enable-precise-memory-info")
+
+    if settings.scraper_block_resources:
+        chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+        chrome_options.add_experimental_option("prefs", {
+            "profile.managed_default_content_settings.images": 2,
+            "profile.default_content_setting_values.notifications": 2,
+        })
+    return chrome_options
+
+def block_resources(driver: webdriver.Chrome):
+    """Drop non-essential requests at the network layer via the DevTools protocol"""
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+    except WebDriverException as e:
+        print(f"⚠️ Could not enable resource blocking: {e}")
+
+def js_heap_mb(driver: webdriver.Chrome) -> Optional[float]:
+    """Used JS heap of the driver's current page in MB, if Chrome reports it"""
+    try:
+        used = driver.execute_script("return window.performance.memory && performance.memory.usedJSHeapSize")
+        return used / (1024 * 1024) if used else None
+    except WebDriverException:
+        return None
+
+class PooledDriver:
+    """A Chrome driver plus the bookkeeping the pool needs to recycle it"""
+
+    def __init__(self, driver: webdriver.Chrome):
+        self.driver = driver
+        self.uses = 0
+        self.created_at = time.time()
+        self.needs_reset = True
+
+class DriverPool:
+    """
+    Fixed-size pool of long-lived headless Chrome drivers.
+
+    Drivers are checked out with lease(), reset to the AgMarkNet search page,
+    and returned afterwards. A driver is recycled after max_uses scrapes or
+    as soon as a scrape running on it raises.
+    """
+
+    def __init__(self, size: int = 2, max_uses: int = 25, acquire_timeout: int = 60):
+        self.size = max(1, size)
+        self.max_uses = max(1, max_uses)
+        self.acquire_timeout = acquire_timeout
+        self._idle: "queue.Queue[PooledDriver]" = queue.Queue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self._driver_path: Optional[str] = None
+        self._closed = False
+        self._alive = 0  # drivers launched and not yet quit, leased or idle
+        self._stats = {"created": 0, "leases": 0, "recycled": 0, "crashed": 0, "over_memory": 0}
+
+    # -------- driver lifecycle --------
+    def _get_driver_path(self) -> str:
+        # ChromeDriverManager hits the network; resolve the binary only once
+        with self._lock:
+            if self._driver_path is None:
+                self._driver_path = ChromeDriverManager().install()
+            return self._driver_path
+
+    def _create(self) -> PooledDriver:
+        service = Service(self._get_driver_path())
+        driver = webdriver.Chrome(service=service, options=build_chrome_options())
+        # No implicit wait: readiness is decided by explicit DOM-signal waits,
+        # and an implicit timeout would stall every "is it there yet?" probe
+        driver.implicitly_wait(0)
+        if settings.scraper_block_resources:
+            block_resources(driver)
+        with self._lock:
+            self._stats["created"] += 1
+            self._alive += 1
+        print(f"🚗 Launched pooled Chrome driver ({self._stats['created']} total)")
+        return PooledDriver(driver)
+
+    def _quit(self, pooled: PooledDriver, reason: str):
+        with self._lock:
+            self._stats[reason] += 1
+            self._alive -= 1
+        try:
+            pooled.driver.quit()
+        except Exception:
+            pass
+
+    def _is_alive(self, pooled: PooledDriver) -> bool:
+        try:
+            pooled.driver.current_url
+            return True
+        except WebDriverException:
+            return False
+
+    def _reset(self, pooled: PooledDriver):
+        """Load a clean AgMarkNet search page and dismiss the onload popup"""
+        driver = pooled.driver
+        driver.get(settings.agmarknet_search_url)
+        wait_for_document_ready(driver, PAGE_LOAD_TIMEOUT, step="driver_reset")
+
+        popups = driver.find_elements(By.CLASS_NAME, 'popup-onload')
+        if popups:
+            try:
+                popups[0].find_element(By.CLASS_NAME, 'close').click()
+                print("✅ Closed popup")
+            except WebDriverException:
+                pass
+        pooled.needs_reset = False
+
+    # -------- checkout / checkin --------
+    def _checkout(self, timeout: Optional[float] = None) -> PooledDriver:
+        if self._closed:
+            raise RuntimeError("Driver pool is closed")
+        timeout = self.acquire_timeout if timeout is None else timeout
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError(f"No scraper driver free after {timeout}s")
+        try:
+            while True:
+                try:
+                    pooled = self._idle.get_nowait()
+                except queue.Empty:
+                    pooled = self._create()
+                    break
+                if self._is_alive(pooled):
+                    break
+                print("💥 Pooled driver died while idle, replacing it")
+                self._quit(pooled, "crashed")
+            pooled.uses += 1
+            with self._lock:
+                self._stats["leases"] += 1
+            return pooled
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _over_memory(self, pooled: PooledDriver) -> bool:
+        heap_mb = js_heap_mb(pooled.driver)
+        if heap_mb is not None and heap_mb > settings.scraper_driver_memory_mb:
+            print(f"🧠 Driver JS heap at {heap_mb:.0f}MB (recycle at {settings.scraper_driver_memory_mb}MB), recycling it")
+            return True
+        return False
+
+    def _checkin(self, pooled: PooledDriver):
+        try:
+            if self._closed or pooled.uses >= self.max_uses:
+                self._quit(pooled, "recycled")
+            elif self._over_memory(pooled):
+                self._quit(pooled, "over_memory")
+            else:
+                pooled.needs_reset = True
+                self._idle.put(pooled)
+        finally:
+            self._slots.release()
+
+    def _discard(self, pooled: PooledDriver):
+        try:
+            self._quit(pooled, "crashed")
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def lease(self, timeout: Optional[float] = None):
+        """Check out a driver sitting on a fresh AgMarkNet search page"""
+        pooled = self._checkout(timeout)
+        try:
+            if pooled.needs_reset:
+                self._reset(pooled)
+            yield pooled.driver
+        except BaseException:
+            # The browser state is unknown after a failure, never reuse it
+            self._discard(pooled)
+            raise
+        else:
+            self._checkin(pooled)
+
+    # -------- pool management --------
+    def warm(self):
+        """Launch drivers until the pool holds size of them (leased ones count) and park them on the search page"""
+        warmed = 0
+        while not self._closed and self._alive < self.size:
+            if not self._slots.acquire(blocking=False):
+                break
+            try:
+                pooled = self._create()
+                self._reset(pooled)
+                self._idle.put(pooled)
+                warmed += 1
+            except Exception as e:
+                print(f"❌ Driver warm-up failed: {e}")
+                break
+            finally:
+                self._slots.release()
+        print(f"🔥 Driver pool warmed with {warmed} new driver(s)")
+
+    def close_all(self):
+        """Quit every idle driver; leased drivers are quit when returned"""
+        self._closed = True
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._quit(pooled, "recycled")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["alive"] = self._alive
+        stats.update({"size": self.size, "max_uses": self.max_uses, "idle": self._idle.qsize()})
+        return stats
+
+# Global pool, created on first use
+_driver_pool: Optional[DriverPool] = None
+_driver_pool_lock = threading.Lock()
+
+def get_driver_pool() -> DriverPool:
+    """Get the process-wide scraper driver pool"""
+    global _driver_pool
+    with _driver_pool_lock:
+        if _driver_pool is None:
+            _driver_pool = DriverPool(
+                size=settings.scraper_pool_size,
+                max_uses=settings.scraper_driver_max_uses,
+                acquire_timeout=settings.scraper_pool_acquire_timeout,
+            )
+            atexit.register(_driver_pool.close_all)
+        return _driver_pool
+
+def shutdown_driver_pool():
+    """Close the pool if it was ever created"""
+    with _driver_pool_lock:
+        if _driver_pool is not None:
+            _driver_pool.close_all()
@@ -0,0 +1,119 @@
+from datetime import datetime, time, timedelta
+from typing import Any, Dict, List, Optional
+from zoneinfo import ZoneInfo
+from app.core.config import settings
+
+# Market dates and mandi reporting times are Indian wall-clock times
+MANDI_TZ = ZoneInfo("Asia/Kolkata")
+
+def server_time(moment: datetime) -> datetime:
+    """An IST moment as the naive server-local time scraped_at is stored in"""
+    return moment.astimezone().replace(tzinfo=None)
+
+def parse_report_times(value: str) -> List[time]:
+    """"11:00,14:30" -> sorted times of day; malformed entries are skipped"""
+    times = []
+    for part in (value or "").split(","):
+        try:
+            times.append(datetime.strptime(part.strip(), "%H:%M").time())
+        except ValueError:
+            if part.strip():
+                print(f"⚠️ Ignoring malformed report time '{part.strip()}'")
+    return sorted(times)
+
+class FreshnessPolicy:
+    """
+    Decides how old cached price rows for a (commodity, market date) may be.
+
+    AgMarkNet keeps accepting uploads for a date for a while, then the date
+    never changes again. Rows scraped settle_days or more after their market
+    date are therefore final and stay fresh forever. Anything younger is
+    fresh until the next mandi reporting time passes, so today's prices are
+    re-scraped once per reporting window instead of every two hours.
+    Both the reporting times and settle_days can be overridden per commodity code.
+    """
+
+    def __init__(self, report_times: str, settle_days: int,
+                 commodity_report_times: Optional[Dict[str, str]] = None,
+                 commodity_settle_days: Optional[Dict[str, int]] = None):
+        self.report_times = parse_report_times(report_times)
+        self.settle_days = max(0, settle_days)
+        self.commodity_report_times = {str(code): parse_report_times(times)
+                                       for code, times in (commodity_report_times or {}).items()}
+        self.commodity_settle_days = {str(code): max(0, days)
+                                      for code, days in (commodity_settle_days or {}).items()}
+
+    def _report_times(self, commodity_code: str) -> List[time]:
+        return self.commodity_report_times.get(str(commodity_code)) or self.report_times
+
+    def _settle_days(self, commodity_code: str) -> int:
+        return self.commodity_settle_days.get(str(commodity_code), self.settle_days)
+
+    def last_report_time(self, commodity_code: str, now: Optional[datetime] = None) -> datetime:
+        """
+        The most recent IST reporting time that has already passed (IST midnight
+        if none are configured), as server-local time. A naive now is server-local.
+        """
+        now = now.astimezone(MANDI_TZ) if now else datetime.now(MANDI_TZ)
+        today = now.date()
+        times = self._report_times(commodity_code)
+        if not times:
+            return server_time(datetime.combine(today, time.min, tzinfo=MANDI_TZ))
+        for day in (today, today - timedelta(days=1)):
+            passed = [datetime.combine(day, t, tzinfo=MANDI_TZ) for t in times
+                      if datetime.combine(day, t, tzinfo=MANDI_TZ) <= now]
+            if passed:
+                return server_time(passed[-1])
+        return server_time(datetime.combine(today - timedelta(days=1), times[0], tzinfo=MANDI_TZ))
+
+    def final_after(self, commodity_code: str, formatted_date: str) -> Optional[datetime]:
+        """Complete rows scraped at or after this moment are final for the date; None for unparseable dates"""
+        try:
+            market_date = datetime.strptime(formatted_date, "%d-%b-%Y").date()
+        except (TypeError, ValueError):
+            return None
+        settled = market_date + timedelta(days=self._settle_days(commodity_code))
+        return server_time(datetime.combine(settled, time.min, tzinfo=MANDI_TZ))
+
+    def fresh_since(self, commodity_code: str, formatted_date: str, now: Optional[datetime] = None,
+                    complete: bool = True) -> datetime:
+        """
+        Oldest scraped_at still considered fresh. A final complete scrape
+        qualifies as soon as it exists; partial scrapes, like recent ones,
+        only while they are from the current reporting window.
+        """
+        last_report = self.last_report_time(commodity_code, now)
+        final_after = self.final_after(commodity_code, formatted_date)
+        return last_report if final_after is None or not complete else min(final_after, last_report)
+
+    def fresh_filter(self, commodity_code: str, formatted_date: str,
+                     now: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        fresh_since as a Mongo filter on documents carrying a complete flag;
+        documents written before the flag existed count as complete.
+        """
+        last_report = self.last_report_time(commodity_code, now)
+        final_after = self.final_after(commodity_code, formatted_date)
+        if final_after is None or final_after >= last_report:
+            return {"scraped_at": {"$gte": last_report}}
+        return {"$or": [
+            {"scraped_at": {"$gte": last_report}},
+            {"scraped_at": {"$gte": final_after}, "complete": {"$ne": False}},
+        ]}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "report_times": [t.strftime("%H:%M") for t in self.report_times],
+            "settle_days": self.settle_days,
+            "commodity_report_times": {code: [t.strftime("%H:%M") for t in times]
+                                       for code, times in self.commodity_report_times.items()},
+            "commodity_settle_days": self.commodity_settle_days,
+        }
+
+# Global policy consulted by every cache read
+freshness_policy = FreshnessPolicy(
+    settings.freshness_report_times,
+    settings.freshness_settle_days,
+    settings.freshness_commodity_report_times,
+    settings.freshness_commodity_settle_days,
+)
@@ -11,21 +11,41 @@ import csv
 import requests
 from bs4 import BeautifulSoup
 import pandas as pd
-from selenium import webdriver
 from selenium.webdriver.support.ui import Select
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.common.exceptions import NoSuchElementException, TimeoutException, StaleElementReferenceException
-from webdriver_manager.chrome import ChromeDriverManager
-import time
+from selenium.common.exceptions import StaleElementReferenceException
+from app.services.driver_pool import get_driver_pool
+from app.services.agmarknet_http import AgmarknetHttpClient
+from app.services.scrape_coordination import (
+    scrape_flight, scrape_executor, agmarknet_breaker, CircuitOpenError, ScrapeInFlightError
+)
+from app.services.market_catalogue import market_catalogue, match_markets_by_keyword
+from app.services.agmarknet_codes import DISTRICT_NAMES, COMMODITY_NAMES
+from app.services.price_summary import summarize_prices_per_market, TOP_K_PER_MARKET
+from app.services.price_records import price_records, parse_price, parse_market_date
+from app.services.page_readiness import (
+    wait_for_postback_complete,
+    wait_for_options_changed,
+    wait_for_grid_replaced,
+    options_signature,
+    find_element_now,
+    find_grid,
+    wait_until,
+    ScrapeBudget,
+)
+from app.core.config import settings
+import asyncio
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # ---- CONFIG ----
-TOP_K_PER_MARKET = 3  # number of latest rows per market to average
 MAX_RETRY_ATTEMPTS = 3  # maximum retry attempts for stale elements
 WAIT_TIMEOUT = 30  # explicit wait timeout in seconds
+SCRAPER_ENGINE = settings.scraper_engine.lower()  # "selenium" or "http" (with Selenium fallback)
+MARKET_PARALLELISM = settings.scraper_market_parallelism  # markets scraped at once per district
+EXTRA_DRIVER_WAIT = 5  # seconds to wait for an extra pooled driver before scraping sequentially
 
 # ---------------- Text Classifier Components ----------------
 class SentenceEncoder(nn.Module):
@@ -100,9 +120,6 @@ class TextClassifierInference:
                 }
             }
 
-# Initialize the classifier
-classifier = TextClassifierInference()
-
 # ---------------- Slot Filler ----------------
 class SlotFiller:
     """Slot filler with a pattern-matching feedback loop."""
@@ -214,16 +231,28 @@ class SlotFiller:
         elif slot == 'area':
             return value.lower() in self.up_cities
         elif slot == 'time':
+            if self._is_future(value):
+                return False
             return self.normalize_time(value) is not None or bool(re.match(r'\d{4}-\d{2}-\d{2}', value))
         return True
 
+    def _is_future(self, value: str) -> bool:
+        """AgMarkNet only publishes arrivals that have happened, so future dates can never have prices"""
+        norm = self.normalize_time(value)
+        try:
+            return norm is not None and is_future_date(norm)
+        except ValueError:
+            return False
+
     def _get_invalid_slot_message(self, slot: str, value: str) -> str:
         if slot == 'commodity':
             return f"Sorry, '{value}' is not available. Please choose a valid commodity."
         elif slot == 'area':
             return f"Sorry, '{value}' is not a UP city in our database. Please provide a valid UP city."
         elif slot == 'time':
-            return f"Sorry, I couldn't understand the date '{value}'. Please provide a valid date (e.g. today, tomorrow, 25/08/2025)."
+            if self._is_future(value):
+                return f"Sorry, {value} is in the future and market prices are only published after trading. Please choose today or an earlier date."
+            return f"Sorry, I couldn't understand the date '{value}'. Please provide a valid date (e.g. today, yesterday, 25/08/2025)."
         return f"Sorry, '{value}' is not valid for {slot}."
 
     def extract_slots(self, text: str, current_slots: Dict[str, Optional[str]]) -> Dict[str, Optional[str]]:
@@ -287,7 +316,7 @@ class SlotFiller:
         templates = {
             'commodity': "Which commodity are you interested in?",
             'area': "Which UP city are you asking about?",
-            'time': "Which date/time are you interested in? (e.g. today, tomorrow, 25/08/2025)",
+            'time': "Which date/time are you interested in? (e.g. today, yesterday, 25/08/2025)",
         }
         return templates.get(slot, f"Please provide {slot}.")
 
@@ -376,8 +405,10 @@ class SlotFiller:
 
 # ------------ Scraper Helpers ------------
 def extract_market_prices_enhanced(soup, market_name, commodity_name, date):
-    """Parse one market table into rows."""
+    """Parse one market table into price-record rows (float prices, Timestamp date)."""
     try:
+        market_date = parse_market_date(date)
+        market_name = str(market_name).strip()
         table_ids = ['cphBody_GridPriceData', 'DataGrid1', 'gvPriceData']
         table = None
         for table_id in table_ids:
@@ -397,10 +428,10 @@ def extract_market_prices_enhanced(soup, market_name, commodity_name, date):
                         market_prices.append({
                             'Market': market_name,
                             'Commodity': commodity_name,
-                            'Min Price': row_data[6] if len(row_data) > 6 else 'N/A',
-                            'Max Price': row_data[7] if len(row_data) > 7 else 'N/A',
-                            'Modal Price': row_data[8] if len(row_data) > 8 else 'N/A',
-                            'Date': date
+                            'Min Price': parse_price(row_data[6]) if len(row_data) > 6 else float('nan'),
+                            'Max Price': parse_price(row_data[7]) if len(row_data) > 7 else float('nan'),
+                            'Modal Price': parse_price(row_data[8]) if len(row_data) > 8 else float('nan'),
+                            'Date': market_date
                         })
                 except (IndexError, ValueError):
                     continue
@@ -427,37 +458,48 @@ def create_city_specific_mock_data(commodity_name, city_name):
             {'Market': f'{city_name} - Main Market', 'Commodity': commodity_name, 'Min Price': base_price-35, 'Max Price': base_price+65, 'Modal Price': base_price+15, 'Date': current_date},
             {'Market': f'{city_name} - Wholesale Market', 'Commodity': commodity_name, 'Min Price': base_price-25, 'Max Price': base_price+75, 'Modal Price': base_price+25, 'Date': current_date},
         ]
-    return pd.DataFrame(markets_data)
+    return price_records(markets_data)
+
+# Mock reasons meaning AgMarkNet really has nothing for the key, as opposed to a failed scrape
+NO_DATA_REASONS = ("future_date", "no_data")
+# Mock reasons meaning the scrape itself failed; such mock rows are never served as prices
+SCRAPE_FAILED_REASONS = ("scrape_failed", "partial")
+
+def mock_price_data(commodity_name, city_name, reason):
+    """Mock rows tagged (df.attrs["mock_reason"]) with why no live rows exist"""
+    mock_df = create_city_specific_mock_data(commodity_name, city_name)
+    mock_df.attrs["mock_reason"] = reason
+    return mock_df
+
+def mock_reason(price_df):
+    """Why price_df is mock data, or None for live rows"""
+    return price_df.attrs.get("mock_reason") if price_df is not None else None
 
 # ------------ BULLETPROOF SELENIUM HANDLING ------------
-def wait_for_page_load_complete(driver, timeout=WAIT_TIMEOUT):
-    """Wait for JavaScript page load to complete"""
-    try:
-        WebDriverWait(driver, timeout).until(
-            lambda d: d.execute_script("return document.readyState") == "complete"
-        )
-        time.sleep(2)  # Additional buffer for dynamic content
-        return True
-    except TimeoutException:
-        print("⏳ Page load timeout")
-        return False
+def wait_for_page_load_complete(driver, timeout=WAIT_TIMEOUT, step="page_load", budget=None):
+    """Wait until the page is loaded and no UpdatePanel postback is in flight"""
+    return wait_for_postback_complete(driver, timeout, step, budget)
 
-def robust_element_interaction(driver, locator, action_type="click", value=None, timeout=WAIT_TIMEOUT):
+def robust_element_interaction(driver, locator, action_type="click", value=None, timeout=None, budget=None):
     """
-    Bulletproof element interaction with comprehensive stale element handling
+    Bulletproof element interaction with comprehensive stale element handling.
+    Waits use the step's adaptive timeout; retries come out of the scrape's budget.
     """
+    budget = budget or ScrapeBudget()
+    step = f"{action_type}:{locator[1]}"
     for attempt in range(MAX_RETRY_ATTEMPTS):
+        if attempt:
+            if not budget.take_retry():
+                print(f"💸 Retry budget spent, giving up on {locator[1]}")
+                return False
+            budget.backoff(attempt - 1)
         try:
-            # Wait for element to be present and stable
-            element = WebDriverWait(driver, timeout).until(
-                EC.presence_of_element_located(locator)
-            )
-            
-            # Additional stability check
-            WebDriverWait(driver, timeout).until(
-                EC.element_to_be_clickable(locator)
-            )
-            
+            # Wait for element to be present and clickable
+            if not wait_until(driver, EC.element_to_be_clickable(locator), step,
+                              timeout or budget.timeout_for(step, WAIT_TIMEOUT), budget):
+                print(f"⏳ Element timeout on attempt {attempt + 1}")
+                continue
+
             # Re-locate element to ensure freshness
             element = driver.find_element(*locator)
             
@@ -476,66 +518,54 @@ def robust_element_interaction(driver, locator, action_type="click", value=None,
             
         except StaleElementReferenceException:
             print(f"🔄 Stale element on attempt {attempt + 1}, retrying...")
-            time.sleep(2 ** attempt)  # Exponential backoff
-            continue
-            
-        except TimeoutException:
-            print(f"⏳ Element timeout on attempt {attempt + 1}")
-            if attempt == MAX_RETRY_ATTEMPTS - 1:
-                return False
-            time.sleep(2 ** attempt)
-            continue
             
         except Exception as e:
             print(f"❌ Element interaction error on attempt {attempt + 1}: {e}")
-            if attempt == MAX_RETRY_ATTEMPTS - 1:
-                return False
-            time.sleep(2 ** attempt)
-            continue
     
     return False
 
-def bulletproof_market_selection(driver, market_index, market_name, timeout=WAIT_TIMEOUT):
+def bulletproof_market_selection(driver, market_index, market_name, budget=None):
     """
-    Ultra-robust market selection with guaranteed success or clear failure
+    Ultra-robust market selection with guaranteed success or clear failure.
+    Gives up early once the scrape's retry budget or deadline is used up.
     """
     print(f"📊 Bulletproof scraping {market_name}...")
-    
+    budget = budget or ScrapeBudget()
+
     for attempt in range(MAX_RETRY_ATTEMPTS):
+        if attempt and not budget.take_retry():
+            print(f"💸 Retry budget spent, giving up on {market_name}")
+            return False
         try:
             # Step 1: Wait for page stability
-            if not wait_for_page_load_complete(driver, timeout):
+            if not wait_for_page_load_complete(driver, budget.timeout_for("market_page_stable", WAIT_TIMEOUT),
+                                               step="market_page_stable", budget=budget):
                 print(f"⚠️ Page not stable on attempt {attempt + 1}")
                 continue
-            
+
+            # Remember the current grid so we can tell when it has been replaced
+            old_grid = find_grid(driver)
+
             # Step 2: Select market with robust interaction
-            if not robust_element_interaction(driver, (By.ID, 'ddlMarket'), "select_by_index", market_index, timeout):
+            if not robust_element_interaction(driver, (By.ID, 'ddlMarket'), "select_by_index", market_index,
+                                              budget=budget):
                 print(f"⚠️ Market selection failed on attempt {attempt + 1}")
                 continue
                 
             # Step 3: Click Go button with robust interaction
-            if not robust_element_interaction(driver, (By.ID, 'btnGo'), "click", timeout=timeout):
+            if not robust_element_interaction(driver, (By.ID, 'btnGo'), "click", budget=budget):
                 print(f"⚠️ Go button click failed on attempt {attempt + 1}")
                 continue
             
-            # Step 4: Wait for results table with multiple possible IDs
-            table_found = False
-            for table_id in ['cphBody_GridPriceData', 'DataGrid1', 'gvPriceData']:
-                try:
-                    WebDriverWait(driver, timeout).until(
-                        EC.presence_of_element_located((By.ID, table_id))
-                    )
-                    table_found = True
-                    break
-                except TimeoutException:
-                    continue
-            
-            if not table_found:
+            # Step 4: Wait for the results grid (any known table id) to replace the old one
+            if not wait_for_grid_replaced(driver, old_grid, budget.timeout_for("grid_replaced", WAIT_TIMEOUT),
+                                          budget=budget):
                 print(f"⚠️ Results table not found on attempt {attempt + 1}")
                 continue
             
             # Step 5: Final stability check
-            if not wait_for_page_load_complete(driver, timeout=10):
+            if not wait_for_page_load_complete(driver, budget.timeout_for("grid_postback", 10), step="grid_postback",
+                                               budget=budget):
                 print(f"⚠️ Final page not stable on attempt {attempt + 1}")
                 continue
                 
@@ -549,8 +579,8 @@ def bulletproof_market_selection(driver, market_index, market_name, timeout=WAIT
                 try:
                     print(f"🔄 Full page refresh and retry for {market_name}")
                     driver.refresh()
-                    wait_for_page_load_complete(driver, timeout)
-                    time.sleep(3)  # Additional recovery time
+                    wait_for_page_load_complete(driver, budget.timeout_for("refresh", WAIT_TIMEOUT), step="refresh",
+                                                budget=budget)
                 except:
                     pass
                 continue
@@ -558,192 +588,577 @@ def bulletproof_market_selection(driver, market_index, market_name, timeout=WAIT
     print(f"❌ Failed to select {market_name} after {MAX_RETRY_ATTEMPTS} attempts")
     return False
 
-# ------------- Enhanced Dynamic City-Based Scraper -------------
-def scrape_agmarknet(date_str, state, district_code, commodity_code):
+# ------------- Market selection shared by both engines -------------
+def select_city_markets(all_options, target_city, fallback=True):
     """
-    Bulletproof scraper with comprehensive stale element protection
+    Keep the dropdown options that belong to target_city; options are (key, name) pairs.
+    The market catalogue's markets for the district are combined with the keyword
+    match: the catalogue is a one-commodity snapshot, so it can miss markets that
+    only trade other commodities. Catalogue lookups go by name, never by code.
+    With neither matching, the first 3 options are used as a fallback, unless
+    fallback is False (crawls and ranges, which would cache another district's
+    prices under this one): then no options are returned.
     """
+    entry = market_catalogue.lookup(district_name=target_city)
+    wanted = {m["name"].strip().lower() for m in entry["markets"]} if entry else set()
+    keyword_markets = {name for _, name in match_markets_by_keyword(all_options, target_city)}
+    city_markets = [(key, name) for key, name in all_options
+                    if name.strip().lower() in wanted or name in keyword_markets]
+
+    print(f"🎯 Found {len(city_markets)} {target_city.title()}-related markets: {[n for _, n in city_markets]}")
+    if not city_markets and fallback:
+        print(f"⚠️ No {target_city.title()} markets found, using first 3 available markets as fallback")
+        city_markets = all_options[:3]
+    elif not city_markets:
+        print(f"⏭️ No {target_city.title()} markets identified, leaving it unresolved")
+    return city_markets
+
+# ------------- Engine: Selenium -------------
+def load_market_options(driver, formatted_date, commodity_name, budget=None):
+    """Fill commodity/state/date on a fresh search page and return the ddlMarket options."""
+    print("🌾 Selecting commodity...")
+    if not robust_element_interaction(driver, (By.ID, 'ddlCommodity'), "select_by_text", commodity_name,
+                                      budget=budget):
+        raise Exception("Failed to select commodity")
+
+    print("🏛️ Selecting state...")
+    if not robust_element_interaction(driver, (By.ID, 'ddlState'), "select_by_text", 'Uttar Pradesh',
+                                      budget=budget):
+        raise Exception("Failed to select state")
+
+    return reload_market_options(driver, formatted_date, budget)
+
+def reload_market_options(driver, formatted_date, budget=None):
+    """Change only txtDate on an already filled search page and return the reloaded ddlMarket options."""
+    budget = budget or ScrapeBudget()
+    # A market left selected by the previous scrape would make Go show its grid instead
+    dropdown = find_element_now(driver, 'ddlMarket')
+    if dropdown is not None and Select(dropdown).first_selected_option.text != '--Select--':
+        robust_element_interaction(driver, (By.ID, 'ddlMarket'), "select_by_index", 0, budget=budget)
+
+    print("📅 Setting date...")
+    if not robust_element_interaction(driver, (By.ID, "txtDate"), "clear_and_send", formatted_date, budget=budget):
+        raise Exception("Failed to set date")
+
+    # Snapshot the dropdown so the wait can tell when the postback re-rendered it
+    old_dropdown = find_element_now(driver, 'ddlMarket')
+    old_signature = options_signature(driver, 'ddlMarket')
+
+    print(f"🔄 Loading markets for {formatted_date}...")
+    if not robust_element_interaction(driver, (By.ID, 'btnGo'), "click", budget=budget):
+        raise Exception("Failed to click initial Go button")
+
+    # Wait for markets to load
+    wait_for_options_changed(driver, 'ddlMarket', old_signature, old_dropdown,
+                             timeout=budget.timeout_for("market_options", 15), budget=budget)
+
+    WebDriverWait(driver, WAIT_TIMEOUT).until(EC.presence_of_element_located((By.ID, 'ddlMarket')))
+    market_dropdown = Select(driver.find_element(By.ID, 'ddlMarket'))
+    return [(i, opt.text) for i, opt in enumerate(market_dropdown.options)
+            if opt.text.strip() and opt.text != '--Select--']
+
+def scrape_cancelled(cancel_event):
+    """True once the scrape's job has timed out or been cancelled"""
+    return cancel_event is not None and cancel_event.is_set()
+
+def report_market(on_market, market_name, market_data):
+    """Hand one market's rows to a streaming consumer; its failures never break the scrape"""
+    if on_market is None:
+        return
+    try:
+        on_market(market_name, market_data)
+    except Exception as e:
+        print(f"⚠️ Market callback failed for {market_name}: {e}")
+
+def scrape_market_batch(driver, markets, commodity_name, formatted_date, cancel_event=None, on_market=None,
+                        budget=None, no_data=None):
+    """
+    Bulletproof scrape of a list of (index, name) markets on one driver; returns {name: rows}.
+    on_market(name, rows) is called as soon as each market's rows are parsed.
+    Markets that were selected and showed no rows are added to the no_data set;
+    a market in neither the result nor no_data was not scraped.
+    Stops with the markets scraped so far once the budget's deadline passes.
+    """
+    budget = budget or ScrapeBudget()
+    results = {}
+    for market_index, market_name in markets:
+        if scrape_cancelled(cancel_event):
+            print(f"🛑 Scrape cancelled, stopping before {market_name}")
+            break
+        if budget.expired():
+            print(f"⌛ Scrape deadline reached, returning {len(results)} market(s) before {market_name}")
+            break
+        if bulletproof_market_selection(driver, market_index, market_name, budget):
+            try:
+                soup = BeautifulSoup(driver.page_source, 'html.parser')
+                market_data = extract_market_prices_enhanced(soup, market_name, commodity_name, formatted_date)
+
+                if market_data:
+                    results[market_name] = market_data
+                    print(f"✅ Found {len(market_data)} entries for {market_name}")
+                    report_market(on_market, market_name, market_data)
+                else:
+                    print(f"⚠️ No data for {market_name}")
+                    if no_data is not None:
+                        no_data.add(market_name)
+
+            except Exception as e:
+                print(f"❌ Error parsing data for {market_name}: {e}")
+        else:
+            print(f"⚠️ Skipping {market_name} due to selection failure")
+    return results
+
+def _scrape_batch_on_extra_driver(markets, commodity_name, formatted_date, cancel_event=None, on_market=None,
+                                  budget=None, no_data=None):
+    """Run one market batch on its own pooled driver; None means no driver was free."""
+    try:
+        with get_driver_pool().lease(timeout=EXTRA_DRIVER_WAIT) as driver:
+            load_market_options(driver, formatted_date, commodity_name, budget)
+            return scrape_market_batch(driver, markets, commodity_name, formatted_date, cancel_event, on_market,
+                                       budget, no_data)
+    except TimeoutError:
+        print(f"⏳ No extra driver free, batch of {len(markets)} market(s) goes back to the main driver")
+        return None
+
+def scrape_markets_selenium(formatted_date, target_city, commodity_name, cancel_event=None, on_market=None):
+    """
+    Bulletproof browser scrape of every target_city market.
+    With MARKET_PARALLELISM > 1 the markets are split into batches that run
+    on extra pooled drivers at the same time as the first batch.
+    Every batch stops between markets once cancel_event is set, and all of
+    them share one ScrapeBudget (deadline + retries) so a flaky market
+    cannot hold the whole scrape hostage.
+    Returns (rows, complete), complete being False if any market could not
+    be scraped, or None if the browser flow itself failed.
+    """
+    budget = ScrapeBudget()
+    no_data = set()
+    try:
+        # Pooled driver arrives on a fresh search page with the popup closed
+        with get_driver_pool().lease() as driver:
+            print("📡 Leased pooled driver on AgMarkNet page")
+
+            print(f"🏪 Finding all {target_city.title()} markets...")
+            all_options = load_market_options(driver, formatted_date, commodity_name, budget)
+            city_markets = select_city_markets(all_options, target_city)
+
+            workers = max(1, min(MARKET_PARALLELISM, get_driver_pool().size, len(city_markets)))
+            batches = [city_markets[i::workers] for i in range(workers)]
+            results = {}
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                extra = {executor.submit(_scrape_batch_on_extra_driver, batch, commodity_name,
+                                         formatted_date, cancel_event, on_market, budget, no_data): batch
+                         for batch in batches[1:]}
+                if extra:
+                    print(f"🧵 Scraping {len(city_markets)} markets on {workers} drivers")
+                results.update(scrape_market_batch(driver, batches[0], commodity_name, formatted_date,
+                                                   cancel_event, on_market, budget, no_data))
+                for future in as_completed(extra):
+                    try:
+                        batch_results = future.result()
+                    except Exception as e:
+                        print(f"❌ Extra driver batch failed: {e}")
+                        batch_results = None
+                    if batch_results is None:
+                        # Retry the batch on our own driver rather than lose it
+                        batch_results = scrape_market_batch(driver, extra[future], commodity_name,
+                                                            formatted_date, cancel_event, on_market, budget,
+                                                            no_data)
+                    results.update(batch_results)
+
+            # Merge back in dropdown order so the DataFrame matches a sequential scrape
+            all_market_data = []
+            for _, market_name in city_markets:
+                all_market_data.extend(results.get(market_name, []))
+            print(f"📊 Selenium engine scraped {len(results)}/{len(city_markets)} markets")
+            complete = all(name in results or name in no_data for _, name in city_markets)
+            return all_market_data, complete
+
+    except Exception as e:
+        print(f"❌ Fatal scraping error: {e}")
+        return None
+
+# ------------- Engine: HTTP form postbacks -------------
+def scrape_markets_http(formatted_date, target_city, commodity_name, cancel_event=None, on_market=None):
+    """
+    Browserless scrape that replays the SearchCmmMkt.aspx postbacks.
+    Returns (rows, complete), complete being False if any market could not be
+    fetched, or None if the form flow failed so the caller can fall back.
+    """
+    client = AgmarknetHttpClient()
+    all_market_data = []
+    try:
+        form = client.open()
+        form = client.select(form, 'ddlCommodity', commodity_name)
+        form = client.select(form, 'ddlState', 'Uttar Pradesh')
+        form = client.set_text(form, 'txtDate', formatted_date)
+        markets_form = client.post(form, {}, submit='btnGo')
+
+        all_options = markets_form.options('ddlMarket')
+        if not all_options:
+            print("⚠️ HTTP engine found no ddlMarket options")
+            return None
+        city_markets = select_city_markets(all_options, target_city)
+
+        # None: the market was not fetched; []: it was, and has no rows
+        def fetch_market(market_value, market_name):
+            if scrape_cancelled(cancel_event):
+                return None
+            try:
+                result_form = client.post(markets_form, {'ddlMarket': market_value}, submit='btnGo')
+                market_data = extract_market_prices_enhanced(result_form.soup, market_name, commodity_name, formatted_date)
+                if market_data:
+                    print(f"✅ Found {len(market_data)} entries for {market_name}")
+                    report_market(on_market, market_name, market_data)
+                else:
+                    print(f"⚠️ No data for {market_name}")
+                return market_data or []
+            except requests.RequestException as e:
+                print(f"❌ HTTP error scraping {market_name}: {e}")
+                return None
+
+        # Every market is posted from the same markets-loaded form state,
+        # so the postbacks are independent and can run side by side
+        workers = max(1, min(MARKET_PARALLELISM, len(city_markets)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            market_results = list(executor.map(lambda m: fetch_market(*m), city_markets))
+
+        successful_markets = 0
+        for market_data in market_results:
+            if market_data:
+                all_market_data.extend(market_data)
+                successful_markets += 1
+
+        print(f"📊 HTTP engine scraped {successful_markets}/{len(city_markets)} markets")
+        return all_market_data, all(market_data is not None for market_data in market_results)
+
+    except Exception as e:
+        print(f"❌ HTTP engine error: {e}")
+        return None
+    finally:
+        client.close()
+
+# ------------- Enhanced Dynamic City-Based Scraper -------------
+def normalize_scrape_date(date_str):
+    """Accept YYYY-MM-DD or DD-Mon-YYYY and return AgMarkNet's DD-Mon-YYYY"""
     try:
         if len(date_str) == 10 and '-' in date_str:
             date_obj = datetime.strptime(date_str, "%Y-%m-%d")
         else:
             date_obj = datetime.strptime(date_str, "%d-%b-%Y")
-        formatted_date = date_obj.strftime("%d-%b-%Y")
     except:
         date_obj = datetime.now() - timedelta(days=7)
-        formatted_date = date_obj.strftime("%d-%b-%Y")
+    return date_obj.strftime("%d-%b-%Y")
 
-    district_names = {
-        '7': 'agra', '33': 'lucknow', '26': 'kanpur', '38': 'meerut',
-        '18': 'ghaziabad', '3': 'aligarh', '40': 'moradabad', '58': 'saharanpur',
-        '19': 'gorakhpur', '9': 'bareilly', '37': 'mathura', '24': 'jhansi',
-        '1': 'allahabad', '68': 'varanasi', '16': 'firozabad', '15': 'faizabad'
-    }
-    target_city = district_names.get(district_code, 'unknown').lower()
+def scrape_agmarknet(date_str, state, district_code, commodity_code, cancel_event=None, on_market=None):
+    """
+    Scrape every market of a district, using the configured engine.
+    The HTTP engine falls back to Selenium when its form flow fails.
+    cancel_event (set by the scrape executor on timeout) stops the scrape
+    between markets; a cancelled scrape returns None instead of mock data.
+    on_market(name, rows) receives each market's rows as soon as they are
+    scraped; a market can be reported twice if the HTTP engine falls back.
+    Raises CircuitOpenError without touching AgMarkNet while the breaker is
+    open; a failed engine run counts against the breaker, any run that got
+    through the form (even with zero rows) closes it.
+    Mock data is tagged "no_data" only when every market was scraped and
+    none had rows; rows from a scrape where some markets failed are tagged
+    df.attrs["partial"], and "partial" mock data stands in if none had rows.
+    """
+    formatted_date = normalize_scrape_date(date_str)
+
+    target_city = (DISTRICT_NAMES.get(district_code) or market_catalogue.district_name(district_code) or 'unknown').lower()
     print(f"🔍 Bulletproof scraping ALL {target_city.title()} markets for date: {formatted_date}")
 
-    chrome_options = Options()
-    chrome_options.add_argument("--headless")
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-dev-shm-usage")
-    chrome_options.add_argument("--disable-gpu")
-    chrome_options.add_argument("--window-size=1920,1080")
-    chrome_options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36")
-    chrome_options.add_argument("--disable-extensions")
-    chrome_options.add_argument("--disable-logging")
+    commodity_name = COMMODITY_NAMES.get(commodity_code, 'Wheat')
 
-    all_market_data = []
-    commodity_names = {
-        '23': 'Wheat', '1': 'Rice', '25': 'Maize', '46': 'Potato',
-        '47': 'Onion', '48': 'Tomato', '29': 'Gram', '30': 'Arhar'
-    }
-    commodity_name = commodity_names.get(commodity_code, 'Wheat')
+    if is_future_date(formatted_date):
+        print(f"📆 {formatted_date} is in the future, skipping scrape")
+        return mock_price_data(commodity_name, target_city.title(), "future_date")
 
-    driver = None
-    try:
-        service = Service(ChromeDriverManager().install())
-        driver = webdriver.Chrome(service=service, options=chrome_options)
-        driver.implicitly_wait(5)  # Implicit wait as fallback
-        
-        initial_url = "https://agmarknet.gov.in/SearchCmmMkt.aspx"
-        driver.get(initial_url)
-        print("📡 Loaded AgMarkNet page")
-        
-        # Wait for page to be fully loaded
-        wait_for_page_load_complete(driver)
-        
+    if not agmarknet_breaker.allow():
+        raise CircuitOpenError(f"AgMarkNet circuit open, retry in {agmarknet_breaker.retry_after():.0f}s")
+
+    scraped = None
+    if SCRAPER_ENGINE == "http":
+        scraped = scrape_markets_http(formatted_date, target_city, commodity_name, cancel_event, on_market)
+        if scraped is None:
+            print("🔁 HTTP engine failed, falling back to Selenium")
+    if scraped is None and not scrape_cancelled(cancel_event):
+        scraped = scrape_markets_selenium(formatted_date, target_city, commodity_name,
+                                          cancel_event, on_market)
+
+    if scrape_cancelled(cancel_event):
+        print(f"🛑 Scrape for {target_city.title()} cancelled, discarding partial results")
+        agmarknet_breaker.release_probe()
+        return None
+
+    if scraped is None:
+        agmarknet_breaker.record_failure()
+        print(f"⚠️ No live data collected, using mock data for {target_city.title()}")
+        return mock_price_data(commodity_name, target_city.title(), "scrape_failed")
+    agmarknet_breaker.record_success()
+
+    all_market_data, complete = scraped
+    if all_market_data:
+        result_df = price_records(all_market_data)
+        if not complete:
+            result_df.attrs["partial"] = True
+        print(f"🎉 Successfully scraped {len(result_df)} total records{'' if complete else ' (some markets failed)'}")
+        return result_df
+    if not complete:
+        # Markets failed and none of the rest had rows: not evidence that AgMarkNet has nothing
+        print(f"⚠️ Some {target_city.title()} markets could not be scraped and none had rows, using mock data")
+        return mock_price_data(commodity_name, target_city.title(), "partial")
+    print(f"⚠️ AgMarkNet has no rows for {target_city.title()}, using mock data")
+    return mock_price_data(commodity_name, target_city.title(), "no_data")
+
+# ------------- Single-flight: identical queries share one scrape -------------
+def scrape_agmarknet_coalesced(date_str, state, district_code, commodity_code):
+    """scrape_agmarknet, but callers asking for the same key at the same time share one scrape"""
+    key = (commodity_code, district_code, normalize_scrape_date(date_str))
+    return scrape_flight.do(key, scrape_agmarknet, date_str, state, district_code, commodity_code)
+
+async def scrape_agmarknet_coalesced_async(date_str, state, district_code, commodity_code):
+    """
+    Async variant for route handlers. The scrape runs as a bounded job on
+    scrape_executor, so it can raise ScrapeQueueFullError or ScrapeTimeoutError.
+    """
+    key = (commodity_code, district_code, normalize_scrape_date(date_str))
+    return await scrape_flight.do_async(key, scrape_agmarknet, date_str, state, district_code, commodity_code,
+                                        executor=scrape_executor)
+
+# ------------- Date ranges: many days in one session -------------
+def parse_scrape_date(date_str):
+    """YYYY-MM-DD or DD-Mon-YYYY to a date; unlike normalize_scrape_date, bad input raises ValueError"""
+    for fmt in ("%Y-%m-%d", "%d-%b-%Y"):
         try:
-            popup = driver.find_element(By.CLASS_NAME, 'popup-onload')
-            close_button = popup.find_element(By.CLASS_NAME, 'close')
-            close_button.click()
-            print("✅ Closed popup")
-        except NoSuchElementException:
-            print("ℹ️ No popup found")
-
-        print("🌾 Selecting commodity...")
-        if not robust_element_interaction(driver, (By.ID, 'ddlCommodity'), "select_by_text", commodity_name):
-            raise Exception("Failed to select commodity")
-
-        print("🏛️ Selecting state...")
-        if not robust_element_interaction(driver, (By.ID, 'ddlState'), "select_by_text", 'Uttar Pradesh'):
-            raise Exception("Failed to select state")
-
-        print("📅 Setting date...")
-        if not robust_element_interaction(driver, (By.ID, "txtDate"), "clear_and_send", formatted_date):
-            raise Exception("Failed to set date")
-
-        print("🔄 Loading markets...")
-        if not robust_element_interaction(driver, (By.ID, 'btnGo'), "click"):
-            raise Exception("Failed to click initial Go button")
-        
-        # Wait for markets to load
-        wait_for_page_load_complete(driver, timeout=15)
-
-        print(f"🏪 Finding all {target_city.title()} markets...")
-        WebDriverWait(driver, WAIT_TIMEOUT).until(EC.presence_of_element_located((By.ID, 'ddlMarket')))
-        market_dropdown = Select(driver.find_element(By.ID, 'ddlMarket'))
-        all_options = [(i, opt.text) for i, opt in enumerate(market_dropdown.options)
-                       if opt.text.strip() and opt.text != '--Select--']
-
-        if target_city == 'agra':
-            city_keywords = ['agra', 'fatehpur sikri', 'mathura']
-        elif target_city == 'lucknow':
-            city_keywords = ['lucknow', 'banthara', 'malihabad', 'mohanlalganj']
-        elif target_city == 'kanpur':
-            city_keywords = ['kanpur', 'kakadeo', 'bilhaur', 'ghatampur']
-        elif target_city == 'meerut':
-            city_keywords = ['meerut', 'mawana', 'sardhana', 'hastinapur']
-        elif target_city == 'varanasi':
-            city_keywords = ['varanasi', 'benares', 'kashi']
-        elif target_city == 'allahabad':
-            city_keywords = ['allahabad', 'prayagraj']
-        else:
-            city_keywords = [target_city]
+            return datetime.strptime(date_str, fmt).date()
+        except (TypeError, ValueError):
+            continue
+    raise ValueError(f"Unrecognised date '{date_str}'")
 
-        city_markets = []
-        for i, name in all_options:
-            if any(k in name.lower() for k in city_keywords):
-                city_markets.append((i, name))
+def is_future_date(date_str):
+    """True for dates after today; AgMarkNet has no prices for them yet"""
+    return parse_scrape_date(date_str) > datetime.now().date()
 
-        print(f"🎯 Found {len(city_markets)} {target_city.title()}-related markets: {[n for _, n in city_markets]}")
-        if not city_markets:
-            print(f"⚠️ No {target_city.title()} markets found, using first 3 available markets as fallback")
-            city_markets = all_options[:3]
+def scrape_date_range(start_date, end_date):
+    """Every day from start_date to end_date inclusive, in AgMarkNet's DD-Mon-YYYY"""
+    start, end = parse_scrape_date(start_date), parse_scrape_date(end_date)
+    if end < start:
+        raise ValueError("end_date is before start_date")
+    return [(start + timedelta(days=i)).strftime("%d-%b-%Y") for i in range((end - start).days + 1)]
 
-        # Bulletproof market scraping
-        successful_markets = 0
-        for market_index, market_name in city_markets:
-            if bulletproof_market_selection(driver, market_index, market_name):
-                try:
-                    soup = BeautifulSoup(driver.page_source, 'html.parser')
-                    market_data = extract_market_prices_enhanced(soup, market_name, commodity_name, formatted_date)
-                    
-                    if market_data:
-                        all_market_data.extend(market_data)
-                        successful_markets += 1
-                        print(f"✅ Found {len(market_data)} entries for {market_name}")
-                    else:
-                        print(f"⚠️ No data for {market_name}")
-                        
-                except Exception as e:
-                    print(f"❌ Error parsing data for {market_name}: {e}")
-            else:
-                print(f"⚠️ Skipping {market_name} due to selection failure")
+def report_result(on_result, key, formatted_date, rows, complete=True):
+    if on_result is None:
+        return
+    try:
+        on_result(key, formatted_date, rows, complete)
+    except Exception as e:
+        print(f"⚠️ Range callback failed for {key}/{formatted_date}: {e}")
 
-        if all_market_data:
-            result_df = pd.DataFrame(all_market_data)
-            print(f"🎉 Successfully scraped {successful_markets}/{len(city_markets)} markets with {len(result_df)} total records")
-            return result_df
-        else:
-            print(f"⚠️ No live data collected, using mock data for {target_city.title()}")
-            return create_city_specific_mock_data(commodity_name, target_city.title())
+def _rows_for(markets, scraped):
+    return [row for _, name in markets for row in scraped.get(name, [])]
 
+def scrape_range_selenium(commodity_name, dates, targets, cancel_event=None, on_result=None):
+    """
+    One pooled driver for the whole range: commodity and state are chosen once,
+    then only txtDate changes between days. targets is [(key, city)]
+    where key is whatever the caller wants results reported under.
+    A city none of whose markets can be identified is skipped and reported
+    with rows None, never scraped from fallback markets. Each district-day is
+    reported as on_result(key, date, rows, complete), complete being False
+    when a market failed or the scrape was cut short; such rows must never
+    be treated as final.
+    Returns {(key, date): (rows, complete)}, or None if the browser flow failed.
+    """
+    results = {}
+    try:
+        with get_driver_pool().lease() as driver:
+            for i, formatted_date in enumerate(dates):
+                if scrape_cancelled(cancel_event):
+                    break
+                if i == 0:
+                    all_options = load_market_options(driver, formatted_date, commodity_name)
+                else:
+                    all_options = reload_market_options(driver, formatted_date)
+                for key, target_city in targets:
+                    if scrape_cancelled(cancel_event):
+                        break
+                    markets = select_city_markets(all_options, target_city, fallback=False)
+                    if not markets:
+                        report_result(on_result, key, formatted_date, None, False)
+                        continue
+                    no_data = set()
+                    scraped = scrape_market_batch(driver, markets, commodity_name, formatted_date, cancel_event,
+                                                  no_data=no_data)
+                    complete = all(name in scraped or name in no_data for _, name in markets)
+                    results[(key, formatted_date)] = (_rows_for(markets, scraped), complete)
+                    report_result(on_result, key, formatted_date, *results[(key, formatted_date)])
+        return results
     except Exception as e:
-        print(f"❌ Fatal scraping error: {e}")
-        return create_city_specific_mock_data(commodity_name, target_city.title())
+        print(f"❌ Range scraping error: {e}")
+        return results or None
+
+def scrape_range_http(commodity_name, dates, targets, cancel_event=None, on_result=None):
+    """
+    Browserless range scrape: one session, the same filled form re-posted with
+    each txtDate. Reports and returns like scrape_range_selenium; a market whose
+    postback fails leaves its district-day incomplete.
+    """
+    client = AgmarknetHttpClient()
+    results = {}
+    try:
+        form = client.open()
+        form = client.select(form, 'ddlCommodity', commodity_name)
+        form = client.select(form, 'ddlState', 'Uttar Pradesh')
+        for formatted_date in dates:
+            if scrape_cancelled(cancel_event):
+                break
+            markets_form = client.post(client.set_text(form, 'txtDate', formatted_date), {}, submit='btnGo')
+            all_options = markets_form.options('ddlMarket')
+            for key, target_city in targets:
+                if scrape_cancelled(cancel_event):
+                    break
+                markets = select_city_markets(all_options, target_city, fallback=False)
+                if not markets:
+                    report_result(on_result, key, formatted_date, None, False)
+                    continue
+                rows, complete = [], True
+                for market_value, market_name in markets:
+                    if scrape_cancelled(cancel_event):
+                        complete = False
+                        break
+                    try:
+                        result_form = client.post(markets_form, {'ddlMarket': market_value}, submit='btnGo')
+                    except requests.RequestException as e:
+                        print(f"❌ HTTP error scraping {market_name} for {formatted_date}: {e}")
+                        complete = False
+                        continue
+                    rows.extend(extract_market_prices_enhanced(result_form.soup, market_name,
+                                                               commodity_name, formatted_date) or [])
+                results[(key, formatted_date)] = (rows, complete)
+                report_result(on_result, key, formatted_date, rows, complete)
+        return results
+    except Exception as e:
+        print(f"❌ HTTP range engine error: {e}")
+        return results or None
     finally:
-        if driver:
-            driver.quit()
+        client.close()
 
-# ------------- Aggregation: one price per market -------------
-def summarize_prices_per_market(df: pd.DataFrame, top_k: int = TOP_K_PER_MARKET) -> pd.DataFrame:
+def scrape_commodity_range(commodity_name, dates, targets, cancel_event=None, on_result=None):
+    """One commodity over many days and districts with the configured engine; see scrape_range_selenium."""
+    scraped = None
+    if SCRAPER_ENGINE == "http":
+        scraped = scrape_range_http(commodity_name, dates, targets, cancel_event, on_result)
+        if scraped is None:
+            print("🔁 HTTP range engine failed, falling back to Selenium")
+    if scraped is None:
+        scraped = scrape_range_selenium(commodity_name, dates, targets, cancel_event, on_result)
+    return scraped
+
+def scrape_agmarknet_range(start_date, end_date, commodity_codes, district_codes, cancel_event=None, on_result=None):
+    """
+    Scrape every (commodity, district, day) in a date range, reusing one
+    navigated session per commodity instead of a fresh scrape per day.
+    Returns {(commodity_code, district_code, date): DataFrame}; days without
+    live rows are left out (no mock data), incomplete days are tagged
+    df.attrs["partial"]. on_result(commodity_code, district_code, date, rows,
+    complete) is called as each district-day finishes, with rows None when the
+    district's markets could not be identified.
+    """
+    dates = scrape_date_range(start_date, end_date)
+    targets = []
+    for district_code in district_codes:
+        city = DISTRICT_NAMES.get(district_code) or market_catalogue.district_name(district_code)
+        if city:
+            targets.append((district_code, city.lower()))
+        else:
+            print(f"⚠️ Unknown district code {district_code}, skipping")
+
+    results = {}
+    for commodity_code in commodity_codes:
+        if scrape_cancelled(cancel_event):
+            break
+        commodity_name = COMMODITY_NAMES.get(commodity_code)
+        if commodity_name is None:
+            print(f"⚠️ Unknown commodity code {commodity_code}, skipping")
+            continue
+        print(f"📆 Scraping {commodity_name} for {len(targets)} district(s) over {len(dates)} day(s)")
+
+        def on_commodity_result(district_code, formatted_date, rows, complete, commodity_code=commodity_code):
+            if on_result is not None:
+                on_result(commodity_code, district_code, formatted_date, rows, complete)
+
+        scraped = scrape_commodity_range(commodity_name, dates, targets, cancel_event, on_commodity_result) or {}
+        for (district_code, formatted_date), (rows, complete) in scraped.items():
+            if rows:
+                df = price_records(rows)
+                if not complete:
+                    df.attrs["partial"] = True
+                results[(commodity_code, district_code, formatted_date)] = df
+    print(f"📆 Range scrape collected {len(results)} non-empty day(s)")
+    return results
+
+# ------------- Streaming: markets as they arrive -------------
+async def stream_agmarknet_markets(date_str, state, district_code, commodity_code, outcome=None):
     """
-    Keep top_k most recent rows per Market, then average Modal/Min/Max to return one row per Market.
+    Async iterator over (market_name, rows) as each market of the district is
+    scraped, instead of waiting for the whole scrape. Runs as a bounded job on
+    scrape_executor (so it can raise ScrapeQueueFullError / ScrapeTimeoutError)
+    and leads the key's scrape_flight call, so coalesced callers arriving
+    meanwhile share its result; if the key is already in flight it raises
+    ScrapeInFlightError before yielding, and the caller should join that call.
+    Markets only present in the final frame are yielded last; mock data never
+    is. The final frame (live rows, mock data or None) is left in
+    outcome["result"] so the caller can tell a failed or empty scrape apart.
+    Closing the iterator early cancels the scrape unless other callers joined it.
     """
-    if df is None or df.empty:
-        return df
-    out = df.copy()
-    # Normalize types
-    out["Market"] = out["Market"].astype(str).str.strip()
-    out["Modal Price"] = pd.to_numeric(out.get("Modal Price", pd.NA), errors="coerce")
-    out["Min Price"]   = pd.to_numeric(out.get("Min Price", pd.NA), errors="coerce")
-    out["Max Price"]   = pd.to_numeric(out.get("Max Price", pd.NA), errors="coerce")
-    out["Date"] = pd.to_datetime(out.get("Date", pd.NaT), errors="coerce")
-
-    # Sort within market and keep top_k rows per group
-    out = out.sort_values(["Market", "Date", "Modal Price"], ascending=[True, False, False])
-    topk = out.groupby("Market", group_keys=False).head(top_k)
-
-    # Aggregate per market
-    agg = topk.groupby("Market", as_index=False).agg({
-        "Modal Price": "mean",
-        "Min Price": "mean",
-        "Max Price": "mean",
-        "Date": "max"  # most recent date used as reference
-    })
-
-    # Round for display
-    for col in ["Modal Price", "Min Price", "Max Price"]:
-        agg[col] = agg[col].round().astype("Int64")
-
-    # Rename columns for clarity
-    agg = agg.rename(columns={
-        "Modal Price": "Avg Modal",
-        "Min Price": "Avg Min",
-        "Max Price": "Avg Max",
-        "Date": "Latest Date"
-    })
-    return agg
+    loop = asyncio.get_running_loop()
+    arrived = asyncio.Queue()
+
+    def on_market(market_name, rows):
+        loop.call_soon_threadsafe(arrived.put_nowait, (market_name, rows))
+
+    key = (commodity_code, district_code, normalize_scrape_date(date_str))
+    job = scrape_flight.lead(key, scrape_executor, partial(scrape_agmarknet, on_market=on_market),
+                             date_str, state, district_code, commodity_code)
+    if job is None:
+        raise ScrapeInFlightError(f"Scrape for {key} already in flight")
+    finished = asyncio.wrap_future(job.future)
+    seen = set()
+    try:
+        while not finished.done() or not arrived.empty():
+            if arrived.empty():
+                getter = asyncio.ensure_future(arrived.get())
+                await asyncio.wait({getter, finished}, return_when=asyncio.FIRST_COMPLETED)
+                if not getter.done():
+                    getter.cancel()
+                    continue
+                market_name, rows = getter.result()
+            else:
+                market_name, rows = arrived.get_nowait()
+            if market_name not in seen:
+                seen.add(market_name)
+                yield market_name, rows
+
+        result_df = await finished
+        if outcome is not None:
+            outcome["result"] = result_df
+        if result_df is not None and not result_df.empty and mock_reason(result_df) is None:
+            for market_name, group in result_df.groupby('Market', sort=False):
+                if market_name not in seen:
+                    seen.add(market_name)
+                    yield market_name, group.to_dict('records')
+    finally:
+        if not job.future.done():
+            # Nobody awaits the result any more; retrieve it so asyncio does not warn
+            finished.add_done_callback(lambda f: f.cancelled() or f.exception())
+            if scrape_flight.followers(key):
+                print("🤝 Market stream closed early, finishing the scrape for the callers that joined it")
+            else:
+                print("🛑 Market stream closed early, cancelling scrape")
+                job.cancel()
 
 # ------------- Date formatting utility -------------
 def format_date_for_agmarknet(date_str):
@@ -760,6 +1175,8 @@ def run_chatbot():
     print("🤖 Welcome to the Agricultural Price Chatbot!")
     print("I can help you find commodity prices in Uttar Pradesh.")
     print("Type 'exit' or 'quit' to end the conversation.\n")
+    # Loaded here rather than at import so scraper workers never pay for the model
+    classifier = TextClassifierInference()
     slot_filler = SlotFiller()
     session_state = {}
     in_price_enquiry = False
@@ -805,7 +1222,7 @@ def run_chatbot():
                 continue
 
             print(f"Bot: Fetching data for {commodity} (code: {commodity_code}) in {district} (code: {district_code}) on {formatted_date}...")
-            raw_df = scrape_agmarknet(formatted_date, "UP", district_code, commodity_code)
+            raw_df = scrape_agmarknet_coalesced(formatted_date, "UP", district_code, commodity_code)
 
             if raw_df is not None and not raw_df.empty:
                 summary_df = summarize_prices_per_market(raw_df, TOP_K_PER_MARKET)
@@ -0,0 +1,230 @@
+import asyncio
+import csv
+import os
+import socket
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from app.core.config import settings
+from app.services.agmarknet_http import AgmarknetHttpClient
+from app.services.agmarknet_codes import DISTRICT_NAMES
+
+# ---- CONFIG ----
+UP_DISTRICTS_CSV = Path(__file__).resolve().parents[2] / "up_districts.csv"
+STATE_NAME = "Uttar Pradesh"
+CATALOGUE_COMMODITY = "Wheat"  # any traded commodity; only used to load the market list
+OWNER_ID = f"catalogue:{socket.gethostname()}:{os.getpid()}"
+
+# Markets whose names do not contain their district's name
+CITY_KEYWORDS = {
+    'agra': ['agra', 'fatehpur sikri', 'mathura'],
+    'lucknow': ['lucknow', 'banthara', 'malihabad', 'mohanlalganj'],
+    'kanpur': ['kanpur', 'kakadeo', 'bilhaur', 'ghatampur'],
+    'meerut': ['meerut', 'mawana', 'sardhana', 'hastinapur'],
+    'varanasi': ['varanasi', 'benares', 'kashi'],
+    'allahabad': ['allahabad', 'prayagraj'],
+}
+
+# Renamed districts: up_districts.csv name -> name AgMarkNet still uses
+DISTRICT_ALIASES = {
+    'prayagraj': 'allahabad',
+    'ayodhya': 'faizabad',
+    'amethi': 'sultanpur',
+}
+
+def normalize_district(name: str) -> str:
+    name = (name or "").strip().lower()
+    return DISTRICT_ALIASES.get(name, name)
+
+def load_up_districts(path: Path = UP_DISTRICTS_CSV) -> List[str]:
+    """District names from up_districts.csv"""
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            return [row["District Name"].strip() for row in csv.DictReader(file) if row.get("District Name")]
+    except Exception as e:
+        print(f"⚠️ Could not read {path}: {e}")
+        return []
+
+def match_markets_by_keyword(all_options: List[Tuple[Any, str]], district_name: str) -> List[Tuple[Any, str]]:
+    """Options whose market name mentions the district (or one of its known market towns)"""
+    district = normalize_district(district_name)
+    keywords = CITY_KEYWORDS.get(district, [district])
+    return [(key, name) for key, name in all_options if any(k in name.lower() for k in keywords)]
+
+class MarketCatalogue:
+    """
+    In-memory district -> AgMarkNet markets index, loaded from Mongo and
+    refreshed in the background. Scraper threads read it without touching
+    the database.
+
+    Each entry has district_name, district_code (AgMarkNet's ddlDistrict
+    value, when known), markets [{name}] and source:
+    "district_dropdown" entries come from AgMarkNet itself, "keywords"
+    entries were matched by market name. Either way the market list is a
+    snapshot of one commodity (CATALOGUE_COMMODITY) on one day, so an empty
+    or short list never means a district has no markets for other queries.
+
+    Scrapes use it only to pick a district's markets out of the ddlMarket
+    options: ASP.NET event validation only accepts a market posted back from
+    a form that rendered it, so the dropdown is always loaded first.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_name: Dict[str, Dict[str, Any]] = {}
+        self._by_code: Dict[str, Dict[str, Any]] = {}
+        self.refreshed_at: Optional[datetime] = None
+
+    def load(self, entries: List[Dict[str, Any]]):
+        by_name, by_code = {}, {}
+        refreshed_at = None
+        for entry in entries:
+            by_name[normalize_district(entry["district_name"])] = entry
+            if entry.get("district_code"):
+                by_code[str(entry["district_code"])] = entry
+            if entry.get("refreshed_at") and (refreshed_at is None or entry["refreshed_at"] > refreshed_at):
+                refreshed_at = entry["refreshed_at"]
+        with self._lock:
+            self._by_name, self._by_code = by_name, by_code
+            self.refreshed_at = refreshed_at
+        print(f"🗂️ Market catalogue loaded: {len(by_name)} districts")
+
+    def lookup(self, district_code: Optional[str] = None,
+               district_name: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Entry by normalized district name; district_code is only used without a
+        name, and must then be an AgMarkNet ddlDistrict value. The app's own
+        district codes (DISTRICT_NAMES) live in a different code space and can
+        collide with AgMarkNet's, so a name is never overridden by a code.
+        """
+        with self._lock:
+            if district_name:
+                return self._by_name.get(normalize_district(district_name))
+            return self._by_code.get(str(district_code)) if district_code else None
+
+    def district_name(self, district_code: str) -> Optional[str]:
+        entry = self.lookup(district_code=district_code)
+        return entry["district_name"] if entry else None
+
+    def district_codes(self, reserved: Iterable[str] = ()) -> Dict[str, str]:
+        """
+        Lower-case district name -> AgMarkNet district code, for every district with a code.
+        Codes the scraper already knows by name (DISTRICT_NAMES) and codes in reserved
+        (the caller's own district codes) are left out, since scrape_agmarknet would
+        resolve them to a different district.
+        """
+        reserved = set(DISTRICT_NAMES) | {str(code) for code in reserved}
+        with self._lock:
+            codes = {entry["district_name"].lower(): str(code) for code, entry in self._by_code.items()
+                     if str(code) not in reserved}
+        for old_name, agmarknet_name in DISTRICT_ALIASES.items():
+            if agmarknet_name in codes:
+                codes.setdefault(old_name, codes[agmarknet_name])
+        return codes
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "districts": len(self._by_name),
+                "markets": sum(len(e.get("markets", [])) for e in self._by_name.values()),
+                "refreshed_at": self.refreshed_at.isoformat() if self.refreshed_at else None,
+            }
+
+# Global catalogue consulted by the scraper when it picks a district's markets
+market_catalogue = MarketCatalogue()
+
+# -------- Building the catalogue from AgMarkNet --------
+def _markets(options: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+    return [{"name": name} for _, name in options]
+
+def build_market_catalogue(district_names: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Crawl SearchCmmMkt.aspx over plain HTTP and return one catalogue entry per
+    district. Uses AgMarkNet's own district dropdown when the page has one,
+    otherwise assigns the state-wide market list to the up_districts.csv
+    districts by name.
+    """
+    district_names = district_names or load_up_districts()
+    client = AgmarknetHttpClient()
+    now = datetime.now()
+    try:
+        form = client.open()
+        form = client.select(form, 'ddlCommodity', CATALOGUE_COMMODITY)
+        form = client.select(form, 'ddlState', STATE_NAME)
+        form = client.set_text(form, 'txtDate', now.strftime("%d-%b-%Y"))
+        state_form = client.post(form, {}, submit='btnGo')
+        state_markets = state_form.options('ddlMarket')
+
+        entries = {}
+        district_options = state_form.options('ddlDistrict')
+        for value, name in district_options:
+            if state_form.autopostback('ddlDistrict'):
+                district_form = client.post(state_form, {'ddlDistrict': value}, event_target='ddlDistrict')
+            else:
+                district_form = client.post(state_form, {'ddlDistrict': value}, submit='btnGo')
+            entries[normalize_district(name)] = {
+                "district_name": name.title(),
+                "district_code": value,
+                "markets": _markets(district_form.options('ddlMarket')),
+                "source": "district_dropdown",
+                "refreshed_at": now,
+            }
+
+        # Districts AgMarkNet did not list (or no district dropdown at all)
+        for name in district_names:
+            key = normalize_district(name)
+            if key in entries:
+                continue
+            matched = match_markets_by_keyword(state_markets, name)
+            entries[key] = {
+                "district_name": name,
+                "district_code": None,
+                "markets": _markets(matched),
+                "source": "keywords",
+                "refreshed_at": now,
+            }
+        print(f"🗂️ Built market catalogue: {len(district_options)} districts from AgMarkNet, "
+              f"{len(entries) - len(district_options)} by keyword")
+        return list(entries.values())
+    finally:
+        client.close()
+
+# -------- Background refresh --------
+async def refresh_market_catalogue(catalogue_service, lease_service=None, force: bool = False) -> bool:
+    """
+    Reload the catalogue from Mongo and re-crawl AgMarkNet when it is stale.
+    A scrape lease makes sure only one worker cluster-wide does the crawl;
+    the others pick its result up on their next reload.
+    """
+    market_catalogue.load(await catalogue_service.load_all())
+    max_age = timedelta(hours=settings.market_catalogue_refresh_hours)
+    if not force and market_catalogue.refreshed_at and datetime.now() - market_catalogue.refreshed_at < max_age:
+        return False
+
+    today = datetime.now().strftime("%d-%b-%Y")
+    if lease_service and not await lease_service.acquire("catalogue", "UP", today, OWNER_ID,
+                                                        settings.scrape_lease_ttl_seconds * 10):
+        return False
+    try:
+        print("🗂️ Refreshing market catalogue from AgMarkNet...")
+        entries = await asyncio.get_running_loop().run_in_executor(None, build_market_catalogue)
+        if entries:
+            await catalogue_service.save_all(entries)
+            market_catalogue.load(entries)
+        return bool(entries)
+    except Exception as e:
+        print(f"❌ Market catalogue refresh failed: {e}")
+        return False
+    finally:
+        if lease_service:
+            await lease_service.release("catalogue", "UP", today, OWNER_ID)
+
+async def run_market_catalogue_refresher(catalogue_service, lease_service=None):
+    """Keep the catalogue loaded and fresh for the lifetime of the process"""
+    while True:
+        try:
+            await refresh_market_catalogue(catalogue_service, lease_service)
+        except Exception as e:
+            print(f"❌ Market catalogue refresher error: {e}")
+        await asyncio.sleep(settings.market_catalogue_check_minutes * 60)
@@ -0,0 +1,208 @@
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Dict, Any, Optional, Callable
+from app.core.config import settings
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException, StaleElementReferenceException, WebDriverException
+
+# ---- CONFIG ----
+GRID_TABLE_IDS = ['cphBody_GridPriceData', 'DataGrid1', 'gvPriceData']
+POLL_FREQUENCY = 0.1  # seconds between DOM checks
+SAMPLE_WINDOW = 200  # wait samples kept per step
+MIN_SAMPLES = 20  # recorded waits (timed-out ones included) needed before a step's timeout adapts
+MIN_STEP_TIMEOUT = 2.0  # seconds; adaptive timeouts never go below this
+MAX_WIDENING = 16  # learned timeout grows at most this much on consecutive timeouts
+MAX_BACKOFF = 2.0  # seconds slept between retries at most
+
+# True once the document is loaded and no ASP.NET UpdatePanel / jQuery request is in flight
+POSTBACK_IDLE_JS = """
+return document.readyState === 'complete'
+    && (typeof Sys === 'undefined' || !Sys.WebForms || !Sys.WebForms.PageRequestManager
+        || !Sys.WebForms.PageRequestManager.getInstance().get_isInAsyncPostBack())
+    && (typeof jQuery === 'undefined' || jQuery.active === 0);
+"""
+
+OPTIONS_SIGNATURE_JS = """
+var el = document.getElementById(arguments[0]);
+if (!el) { return null; }
+return Array.prototype.map.call(el.options, function (o) { return o.value + '=' + o.text; }).join('|');
+"""
+
+class ReadinessRecorder:
+    """
+    Rolling record of how long each readiness step actually waited.
+
+    A timed-out wait is kept as a censored sample at the time it waited (the
+    real wait was at least that long), and every consecutive timeout doubles
+    the learned timeout, so the step recovers once AgMarkNet gets slower
+    instead of timing out forever on what it learned while it was fast.
+    Waits cut short by the scrape's deadline say nothing about the page, so
+    they are only counted, never sampled.
+    """
+
+    def __init__(self, window: int = SAMPLE_WINDOW):
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=window))
+        self._timeouts = defaultdict(int)
+        self._cut_short = defaultdict(int)
+        self._consecutive_timeouts = defaultdict(int)
+
+    def record(self, step: str, seconds: float, ok: bool, cut_short: bool = False):
+        with self._lock:
+            if cut_short:
+                self._cut_short[step] += 1
+                return
+            self._samples[step].append(seconds)
+            if ok:
+                self._consecutive_timeouts[step] = 0
+            else:
+                self._timeouts[step] += 1
+                self._consecutive_timeouts[step] += 1
+
+    def _learned_timeout(self, step: str) -> Optional[float]:
+        # Caller holds the lock
+        ordered = sorted(self._samples[step]) if step in self._samples else []
+        if len(ordered) < MIN_SAMPLES:
+            return None
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        widening = min(MAX_WIDENING, 2 ** self._consecutive_timeouts[step])
+        return round(max(MIN_STEP_TIMEOUT, p95 * settings.scraper_timeout_multiplier * widening), 2)
+
+    def adaptive_timeout(self, step: str, default: float) -> float:
+        """
+        p95 of the step's recent waits (timed-out ones included) times the
+        multiplier, doubled per consecutive timeout and capped at default;
+        default until enough samples exist.
+        """
+        with self._lock:
+            learned = self._learned_timeout(step)
+        return default if learned is None else min(default, learned)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            result = {}
+            for step in set(self._samples) | set(self._cut_short):
+                ordered = sorted(self._samples[step])
+                if not ordered:
+                    result[step] = {"count": 0, "cut_short": self._cut_short[step]}
+                    continue
+                result[step] = {
+                    "count": len(ordered),
+                    "avg_ms": round(sum(ordered) / len(ordered) * 1000),
+                    "p50_ms": round(ordered[len(ordered) // 2] * 1000),
+                    "max_ms": round(ordered[-1] * 1000),
+                    "timeouts": self._timeouts[step],
+                    "consecutive_timeouts": self._consecutive_timeouts[step],
+                    "cut_short": self._cut_short[step],
+                    "adaptive_timeout_s": self._learned_timeout(step),
+                }
+            return result
+
+# Global recorder shared by every scraper thread
+readiness_recorder = ReadinessRecorder()
+
+class ScrapeBudget:
+    """
+    Wall-clock deadline plus a retry allowance for one scrape, shared by
+    every market (and every driver thread) of that scrape. Step timeouts
+    come from the recorder but never run past the deadline.
+    """
+
+    def __init__(self, deadline_seconds: Optional[float] = None, retries: Optional[int] = None):
+        self.deadline = time.monotonic() + (deadline_seconds or settings.scrape_deadline_seconds)
+        self._lock = threading.Lock()
+        self._retries = settings.scrape_retry_budget if retries is None else retries
+
+    def remaining(self) -> float:
+        return max(0.0, self.deadline - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout_for(self, step: str, default: float) -> float:
+        return min(readiness_recorder.adaptive_timeout(step, default), self.remaining())
+
+    def take_retry(self) -> bool:
+        """Spend one retry; False once the budget or the deadline is used up"""
+        with self._lock:
+            if self._retries <= 0 or self.expired():
+                return False
+            self._retries -= 1
+            return True
+
+    def backoff(self, attempt: int):
+        time.sleep(min(0.25 * 2 ** attempt, MAX_BACKOFF, self.remaining()))
+
+def wait_until(driver, condition: Callable, step: str, timeout: float, budget: Optional[ScrapeBudget] = None) -> bool:
+    """
+    Poll condition until truthy, recording the observed wait under step.
+    A timeout that ran into budget's deadline is recorded as cut short.
+    """
+    start = time.monotonic()
+    ok = True
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=POLL_FREQUENCY,
+                      ignored_exceptions=(StaleElementReferenceException,)).until(condition)
+    except TimeoutException:
+        ok = False
+    elapsed = time.monotonic() - start
+    readiness_recorder.record(step, elapsed, ok, cut_short=not ok and budget is not None and budget.expired())
+    if not ok:
+        print(f"⏳ {step} not ready after {elapsed:.1f}s")
+    return ok
+
+# -------- DOM signals --------
+def wait_for_document_ready(driver, timeout: float, step: str = "document_ready", budget=None) -> bool:
+    return wait_until(driver, lambda d: d.execute_script("return document.readyState") == "complete", step, timeout,
+                      budget)
+
+def wait_for_postback_complete(driver, timeout: float, step: str = "postback", budget=None) -> bool:
+    """Document loaded and the UpdatePanel has finished its async postback"""
+    return wait_until(driver, lambda d: d.execute_script(POSTBACK_IDLE_JS), step, timeout, budget)
+
+def options_signature(driver, select_id: str) -> Optional[str]:
+    try:
+        return driver.execute_script(OPTIONS_SIGNATURE_JS, select_id)
+    except WebDriverException:
+        return None
+
+def find_element_now(driver, element_id: str):
+    """Look an element up without waiting on the implicit timeout"""
+    elements = driver.find_elements(By.ID, element_id)
+    return elements[0] if elements else None
+
+def _is_stale(element) -> bool:
+    try:
+        element.is_enabled()
+        return False
+    except StaleElementReferenceException:
+        return True
+
+def wait_for_options_changed(driver, select_id: str, previous_signature: Optional[str], old_element,
+                             timeout: float, step: str = "market_options", budget=None) -> bool:
+    """The dropdown was re-rendered (old element stale) or its options changed, and it has options"""
+    def changed(d):
+        signature = options_signature(d, select_id)
+        if not signature:
+            return False
+        if old_element is not None and _is_stale(old_element):
+            return True
+        return signature != previous_signature
+    return wait_until(driver, changed, step, timeout, budget)
+
+def find_grid(driver):
+    for table_id in GRID_TABLE_IDS:
+        table = find_element_now(driver, table_id)
+        if table is not None:
+            return table
+    return None
+
+def wait_for_grid_replaced(driver, old_grid, timeout: float, step: str = "grid_replaced", budget=None) -> bool:
+    """A results grid is present and, if there was one before, the old table has gone stale"""
+    def replaced(d):
+        if old_grid is not None and not _is_stale(old_grid):
+            return False
+        return find_grid(d) is not None
+    return wait_until(driver, replaced, step, timeout, budget)
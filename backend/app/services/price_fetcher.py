@@ -0,0 +1,378 @@
+import asyncio
+import os
+import socket
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from functools import partial
+from typing import Any, Dict, List, Optional, Tuple
+import pandas as pd
+from app.core.config import settings
+from app.services.database_service import PriceDataService, ScrapeLeaseService, ScrapeJobQueueService
+from app.services.price_records import price_records
+from app.services.interactivechat import (
+    scrape_agmarknet_coalesced_async, scrape_agmarknet_range, parse_scrape_date, mock_reason, NO_DATA_REASONS,
+    SCRAPE_FAILED_REASONS
+)
+from app.services.scrape_coordination import (
+    ScrapeQueueFullError, ScrapeCancelledError, CircuitOpenError,
+    scrape_executor, agmarknet_breaker
+)
+
+# Identifies this process as a lease owner across nodes
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# Keys with a background refresh waiting for the circuit to half-open, and their tasks
+_revalidating = set()
+_revalidation_tasks = set()
+
+async def _keep_lease_alive(lease_service: ScrapeLeaseService, commodity_code: str,
+                            district_code: str, date: str):
+    """Heartbeat the lease until cancelled"""
+    while True:
+        await asyncio.sleep(settings.scrape_lease_heartbeat_seconds)
+        if not await lease_service.heartbeat(commodity_code, district_code, date,
+                                             WORKER_ID, settings.scrape_lease_ttl_seconds):
+            print(f"⚠️ Lost scrape lease for {commodity_code}/{district_code}/{date}")
+            return
+
+@asynccontextmanager
+async def held_scrape_lease(lease_service: Optional[ScrapeLeaseService], formatted_date: str,
+                            district_code: str, commodity_code: str):
+    """Hold (and heartbeat) the key's scrape lease for the block; yields False if another worker has it"""
+    if not lease_service:
+        yield True
+        return
+    if not await lease_service.acquire(commodity_code, district_code, formatted_date,
+                                       WORKER_ID, settings.scrape_lease_ttl_seconds):
+        yield False
+        return
+    heartbeat = asyncio.create_task(
+        _keep_lease_alive(lease_service, commodity_code, district_code, formatted_date)
+    )
+    try:
+        yield True
+    finally:
+        heartbeat.cancel()
+        await lease_service.release(commodity_code, district_code, formatted_date, WORKER_ID)
+
+async def read_cached_prices(price_service: Optional[PriceDataService], formatted_date: str,
+                             district_code: str, commodity_code: str,
+                             max_age_hours: Optional[int] = None) -> Optional[pd.DataFrame]:
+    """Fresh cached rows for the key (per the freshness policy unless max_age_hours is given), or None"""
+    if not price_service:
+        return None
+    try:
+        return await price_service.get_cached_prices(
+            commodity_code, district_code, formatted_date, max_age_hours=max_age_hours
+        )
+    except Exception as e:
+        print(f"Cache check error: {e}")
+        return None
+
+async def read_price_summary(price_service: Optional[PriceDataService], formatted_date: str,
+                             district_code: str, commodity_code: str) -> Optional[pd.DataFrame]:
+    """The key's precomputed per-market summary while its rows are fresh, or None"""
+    if not price_service:
+        return None
+    try:
+        return await price_service.get_price_summary(commodity_code, district_code, formatted_date)
+    except Exception as e:
+        print(f"Summary read error: {e}")
+        return None
+
+async def read_cached_summary(price_service: Optional[PriceDataService], formatted_date: str,
+                              district_code: str, commodity_code: str) -> Optional[pd.DataFrame]:
+    """Fresh cached rows already summarized per market by Mongo, or None"""
+    if not price_service:
+        return None
+    try:
+        return await price_service.get_cached_summary(commodity_code, district_code, formatted_date)
+    except Exception as e:
+        print(f"Cache summary error: {e}")
+        return None
+
+async def read_stale_prices(price_service: Optional[PriceDataService], formatted_date: str,
+                            district_code: str, commodity_code: str) -> Optional[pd.DataFrame]:
+    """The most recent cached rows for the key whatever their age, or None"""
+    if not price_service:
+        return None
+    try:
+        return await price_service.get_cached_prices(
+            commodity_code, district_code, formatted_date, allow_stale=True
+        )
+    except Exception as e:
+        print(f"Stale cache read error: {e}")
+        return None
+
+# -------- Negative cache --------
+def is_future(formatted_date: str) -> bool:
+    try:
+        return parse_scrape_date(formatted_date) > datetime.now().date()
+    except ValueError:
+        return False
+
+def miss_ttl_seconds(formatted_date: str) -> int:
+    """How long "no rows" is trusted: AgMarkNet keeps uploading today's and recent arrivals for a while"""
+    try:
+        age_days = (datetime.now().date() - parse_scrape_date(formatted_date)).days
+    except ValueError:
+        age_days = 0
+    if age_days <= 0:
+        return settings.negative_cache_today_minutes * 60
+    if age_days <= settings.negative_cache_recent_days:
+        return settings.negative_cache_recent_hours * 3600
+    return int(timedelta(days=settings.negative_cache_old_days).total_seconds())
+
+async def read_known_miss(price_service: Optional[PriceDataService], formatted_date: str,
+                          district_code: str, commodity_code: str) -> Optional[str]:
+    """"future" or "no_data" when the key is known to have no rows, else None"""
+    if is_future(formatted_date):
+        return "future"
+    if price_service and await price_service.get_known_miss(commodity_code, district_code, formatted_date):
+        return "no_data"
+    return None
+
+async def store_scrape_result(price_service: Optional[PriceDataService], price_df: Optional[pd.DataFrame],
+                              formatted_date: str, district_code: str,
+                              commodity_code: str) -> Tuple[Optional[pd.DataFrame], str]:
+    """
+    Cache live rows, or remember a key AgMarkNet has no rows for. Mock rows
+    standing in for such a key are dropped (data_source "no_data"/"future").
+    A failed scrape (its mock rows, or no result at all) is never cached or
+    served: the key's stale rows are returned as "stale", else "unavailable".
+    """
+    reason = mock_reason(price_df)
+    if reason in NO_DATA_REASONS:
+        if price_service and reason != "future_date":
+            await price_service.remember_miss(commodity_code, district_code, formatted_date,
+                                              reason, miss_ttl_seconds(formatted_date))
+        return None, "future" if reason == "future_date" else "no_data"
+    if reason in SCRAPE_FAILED_REASONS or price_df is None:
+        print(f"⚠️ Scrape of {commodity_code}/{district_code}/{formatted_date} failed, serving stale cache")
+        stale_df = await read_stale_prices(price_service, formatted_date, district_code, commodity_code)
+        if stale_df is not None and not stale_df.empty:
+            return stale_df, "stale"
+        return None, "unavailable"
+    if price_service and not price_df.empty:
+        try:
+            await price_service.cache_price_data(price_df, commodity_code, district_code, formatted_date)
+        except Exception as e:
+            print(f"Cache save error: {e}")
+    return price_df, "scraped"
+
+async def _scrape_and_cache(price_service: Optional[PriceDataService], formatted_date: str,
+                            district_code: str, commodity_code: str) -> Tuple[Optional[pd.DataFrame], str]:
+    price_df = await scrape_agmarknet_coalesced_async(formatted_date, "UP", district_code, commodity_code)
+    return await store_scrape_result(price_service, price_df, formatted_date, district_code, commodity_code)
+
+async def _wait_for_queued_scrape(price_service: PriceDataService, job_queue: ScrapeJobQueueService,
+                                  read_cache, formatted_date: str, district_code: str,
+                                  commodity_code: str) -> Tuple[Optional[pd.DataFrame], str]:
+    """Enqueue the scrape for a worker and poll the cache until its rows land"""
+    job_id = await job_queue.enqueue(commodity_code, district_code, formatted_date)
+    if job_id is None:
+        return None, "queued"
+    print(f"📬 Queued scrape job {job_id}")
+
+    deadline = time.monotonic() + settings.scrape_job_wait_seconds
+    while time.monotonic() < deadline:
+        await asyncio.sleep(settings.scrape_worker_poll_seconds)
+        cached_df = await read_cache()
+        if cached_df is not None and not cached_df.empty:
+            return cached_df, "scraped"
+        job = await job_queue.get_job(job_id)
+        if job and job.get("status") in ("done", "failed"):
+            # Finished without cacheable rows; one last read covers a race with the write
+            cached_df = await read_cache()
+            if cached_df is not None and not cached_df.empty:
+                return cached_df, "scraped"
+            if job.get("status") == "done":
+                # The worker found no rows and recorded the miss
+                miss = await read_known_miss(price_service, formatted_date, district_code, commodity_code)
+                if miss:
+                    return None, miss
+            else:
+                # The worker could not reach AgMarkNet (or its circuit is open): serve what we have
+                stale_df = await read_stale_prices(price_service, formatted_date, district_code, commodity_code)
+                if stale_df is not None and not stale_df.empty:
+                    return stale_df, "stale"
+            return cached_df, "scraped"
+
+    print(f"⏳ Scrape job {job_id} still pending after {settings.scrape_job_wait_seconds}s")
+    return None, "queued"
+
+async def fetch_price_data(price_service: Optional[PriceDataService],
+                           lease_service: Optional[ScrapeLeaseService],
+                           formatted_date: str, district_code: str, commodity_code: str,
+                           max_age_hours: Optional[int] = None,
+                           job_queue: Optional[ScrapeJobQueueService] = None) -> Tuple[Optional[pd.DataFrame], str]:
+    """
+    Cached prices if fresh, otherwise a scrape that only one worker cluster-wide runs.
+
+    In "inline" mode the lease holder scrapes and writes the cache; every other
+    worker polls get_cached_prices until the result lands, taking over the lease
+    if the holder dies (lease expiry) or releases it without caching anything.
+    In "queue" mode the API only enqueues a job and reads the cache, and the
+    scrape runs on a standalone scraper worker.
+    While the AgMarkNet circuit breaker is open no scrape is attempted: the
+    newest cached rows are served whatever their age and a background
+    refresh runs once the circuit half-opens.
+    Keys known to have no rows (future dates, negative-cache hits) return
+    without scraping.
+    Returns (price_df, data_source) with data_source "cached", "scraped",
+    "queued" (the worker has not delivered yet), "busy" (every local scrape
+    slot and queue place is taken), "timeout" (the scrape timed out or was
+    cancelled), "stale" (old cached rows, AgMarkNet is down) or
+    "unavailable" (AgMarkNet is down and nothing is cached), "no_data"
+    (AgMarkNet has no rows for the key) or "future" (the date has not
+    happened yet).
+    """
+    try:
+        return await _fetch_price_data(price_service, lease_service, formatted_date, district_code,
+                                       commodity_code, max_age_hours, job_queue)
+    except ScrapeQueueFullError as e:
+        print(f"🚦 Scrape rejected, executor full: {e}")
+        return None, "busy"
+    except ScrapeCancelledError as e:
+        print(f"⏱️ Scrape did not finish: {e}")
+        return None, "timeout"
+    except CircuitOpenError as e:
+        print(f"🔴 {e}, serving stale cache")
+        schedule_revalidation(price_service, formatted_date, district_code, commodity_code)
+        stale_df = await read_stale_prices(price_service, formatted_date, district_code, commodity_code)
+        if stale_df is not None and not stale_df.empty:
+            return stale_df, "stale"
+        return None, "unavailable"
+
+async def _fetch_price_data(price_service: Optional[PriceDataService],
+                            lease_service: Optional[ScrapeLeaseService],
+                            formatted_date: str, district_code: str, commodity_code: str,
+                            max_age_hours: Optional[int],
+                            job_queue: Optional[ScrapeJobQueueService]) -> Tuple[Optional[pd.DataFrame], str]:
+    async def read_cache():
+        return await read_cached_prices(price_service, formatted_date, district_code,
+                                        commodity_code, max_age_hours)
+
+    async def read_settled() -> Optional[Tuple[Optional[pd.DataFrame], str]]:
+        """Cached rows, or the key's known miss; None if it still needs a scrape"""
+        cached_df = await read_cache()
+        if cached_df is not None and not cached_df.empty:
+            return cached_df, "cached"
+        miss = await read_known_miss(price_service, formatted_date, district_code, commodity_code)
+        return (None, miss) if miss else None
+
+    settled = await read_settled()
+    if settled:
+        return settled
+
+    if settings.scrape_mode == "queue" and job_queue and price_service:
+        return await _wait_for_queued_scrape(price_service, job_queue, read_cache,
+                                             formatted_date, district_code, commodity_code)
+
+    if agmarknet_breaker.rejecting():
+        # Fail fast instead of waiting on leases for a scrape that would be refused anyway
+        raise CircuitOpenError(f"AgMarkNet circuit open, retry in {agmarknet_breaker.retry_after():.0f}s")
+
+    if not lease_service or not price_service:
+        # Nothing shared to coordinate through, scrape in-process only
+        return await _scrape_and_cache(price_service, formatted_date, district_code, commodity_code)
+
+    deadline = time.monotonic() + settings.scrape_lease_wait_seconds
+    waited = False
+    while time.monotonic() < deadline:
+        if await lease_service.acquire(commodity_code, district_code, formatted_date,
+                                       WORKER_ID, settings.scrape_lease_ttl_seconds):
+            # Another worker may have finished between our cache read and the acquire
+            if waited:
+                settled = await read_settled()
+                if settled:
+                    await lease_service.release(commodity_code, district_code, formatted_date, WORKER_ID)
+                    return settled
+            heartbeat = asyncio.create_task(
+                _keep_lease_alive(lease_service, commodity_code, district_code, formatted_date)
+            )
+            try:
+                return await _scrape_and_cache(price_service, formatted_date, district_code, commodity_code)
+            finally:
+                heartbeat.cancel()
+                await lease_service.release(commodity_code, district_code, formatted_date, WORKER_ID)
+
+        if not waited:
+            print(f"⏳ Another worker is scraping {commodity_code}/{district_code}/{formatted_date}, waiting for its result")
+            waited = True
+        await asyncio.sleep(settings.scrape_lease_poll_seconds)
+        settled = await read_settled()
+        if settled:
+            return settled
+
+    print("⚠️ Timed out waiting for the lease holder, scraping locally")
+    return await _scrape_and_cache(price_service, formatted_date, district_code, commodity_code)
+
+async def _revalidate_when_half_open(price_service: Optional[PriceDataService], formatted_date: str,
+                                    district_code: str, commodity_code: str):
+    key = (commodity_code, district_code, formatted_date)
+    deadline = time.monotonic() + settings.stale_refresh_window_seconds
+    try:
+        while time.monotonic() < deadline:
+            await asyncio.sleep(max(agmarknet_breaker.retry_after(), settings.scrape_lease_poll_seconds))
+            try:
+                price_df, data_source = await _scrape_and_cache(price_service, formatted_date, district_code,
+                                                                commodity_code)
+            except (CircuitOpenError, ScrapeQueueFullError, ScrapeCancelledError):
+                continue  # Another key holds the probe, or the probe failed; wait for the next half-open
+            if data_source in ("stale", "unavailable"):
+                continue  # The probe scrape failed and re-opened the circuit
+            print(f"🔄 Revalidated stale prices for {key}: {0 if price_df is None else len(price_df)} rows")
+            return
+        print(f"⌛ Gave up revalidating {key} after {settings.stale_refresh_window_seconds}s")
+    except Exception as e:
+        print(f"❌ Revalidation of {key} failed: {e}")
+    finally:
+        _revalidating.discard(key)
+
+def schedule_revalidation(price_service: Optional[PriceDataService], formatted_date: str,
+                          district_code: str, commodity_code: str):
+    """Refresh a key served stale in the background once the circuit lets a scrape through"""
+    key = (commodity_code, district_code, formatted_date)
+    if key in _revalidating:
+        return
+    _revalidating.add(key)
+    task = asyncio.create_task(
+        _revalidate_when_half_open(price_service, formatted_date, district_code, commodity_code)
+    )
+    _revalidation_tasks.add(task)
+    task.add_done_callback(_revalidation_tasks.discard)
+
+async def backfill_price_range(price_service: Optional[PriceDataService], start_date: str, end_date: str,
+                               commodity_codes: List[str], district_codes: List[str]) -> Dict[str, Any]:
+    """
+    Scrape a date range for every commodity x district on the bounded scrape
+    executor and bulk-write the results. Rows already collected when the
+    range times out are still cached; rows of an incomplete district-day are
+    cached as partial, so they are never treated as final.
+    """
+    collected = []
+
+    def on_result(commodity_code, district_code, formatted_date, rows, complete):
+        if rows:
+            price_df = price_records(rows, formatted_date)
+            if not complete:
+                price_df.attrs["partial"] = True
+            collected.append((price_df, commodity_code, district_code, formatted_date))
+
+    job = scrape_executor.submit(
+        partial(scrape_agmarknet_range, on_result=on_result),
+        start_date, end_date, commodity_codes, district_codes,
+        timeout=settings.range_scrape_timeout_seconds
+    )
+    status = "done"
+    try:
+        await asyncio.wrap_future(job.future)
+    except ScrapeCancelledError as e:
+        print(f"⏱️ Range scrape stopped early: {e}")
+        status = "timeout"
+
+    batches = list(collected)
+    cached = await price_service.cache_price_batches(batches) if price_service else 0
+    return {"status": status, "scraped_days": len(batches), "records_cached": cached}
@@ -0,0 +1,513 @@
+import asyncio
+import json
+import time
+import uuid
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import pandas as pd
+from app.core.config import settings
+from app.models.price_data import PriceQueryJobModel
+from app.services.database_service import (
+    PriceDataService, PriceQueryJobService, ScrapeLeaseService, ScrapeJobQueueService, SessionService
+)
+from app.services.interactivechat import stream_agmarknet_markets
+from app.services.price_fetcher import (
+    fetch_price_data, read_cached_prices, read_cached_summary, read_price_summary, read_known_miss,
+    held_scrape_lease, store_scrape_result, backfill_price_range
+)
+from app.services.price_records import price_records
+from app.services.price_summary import summarize_prices_per_market, TOP_K_PER_MARKET
+from app.services.scrape_coordination import (
+    scrape_executor, agmarknet_breaker, ScrapeQueueFullError, ScrapeCancelledError, ScrapeInFlightError,
+    CircuitOpenError
+)
+
+# Background job tasks; asyncio only keeps weak references to running tasks
+_running_jobs = set()
+
+# -------- Response formatting shared by the inline and job paths --------
+def _price_header(commodity: str, district: str, date_str: str) -> str:
+    return f"""COLLECTED!
+
+Commodity: {commodity.title()}
+Location: {district.title()}
+Date: {date_str}
+
+"""
+
+def _first_present(row, names, default):
+    """The first of the columns that holds a value; pandas NA/NaN count as missing"""
+    for name in names:
+        value = row.get(name)
+        if value is not None and not pd.isna(value) and value != "":
+            return value
+    return default
+
+def format_market_line(row) -> str:
+    """One market of a summarize_prices_per_market frame as a chat line"""
+    # Safe column access to handle different data structures (cached vs fresh data);
+    # a market without any parseable price has <NA> averages, shown as N/A
+    market = _first_present(row, ('Market', 'market_name', 'market'), 'Unknown Market')
+    avg_modal = _first_present(row, ('Avg Modal', 'modal_price', 'Modal'), 'N/A')
+    avg_max = _first_present(row, ('Avg Max', 'max_price', 'Max'), 'N/A')
+    avg_min = _first_present(row, ('Avg Min', 'min_price', 'Min'), 'N/A')
+
+    return f"""{market}
+Modal: Rs.{avg_modal}/quintal | Max: Rs.{avg_max} | Min: Rs.{avg_min}
+
+"""
+
+def stale_note(price_df: pd.DataFrame) -> str:
+    """Warning line for rows served from an old cache while AgMarkNet is down"""
+    fetched = ""
+    if 'scraped_at' in price_df.columns:
+        scraped_at = pd.to_datetime(price_df['scraped_at']).max()
+        if pd.notna(scraped_at):
+            fetched = f" fetched {scraped_at:%d-%b-%Y %H:%M}"
+    if 'Date' in price_df.columns and price_df['Date'].notna().any():
+        fetched += f" for {price_df['Date'].max():%d-%b-%Y}"
+    return f"""AgMarkNet is not responding right now. These are the last prices we have{fetched}, they may be out of date.
+
+"""
+
+def format_price_response(commodity: str, district: str, date_str: str,
+                          price_df: Optional[pd.DataFrame],
+                          data_source: str,
+                          summary_df: Optional[pd.DataFrame] = None) -> Tuple[str, Optional[pd.DataFrame]]:
+    """
+    Chat reply for a price query plus the summarize_prices_per_market frame
+    it was built from; a precomputed summary_df skips summarizing price_df.
+    """
+    header = _price_header(commodity, district, date_str)
+
+    if summary_df is None and price_df is not None and not price_df.empty:
+        if data_source == "stale":
+            header += stale_note(price_df)
+        # Scraped and cached frames are canonical price records already; this only converts strays
+        price_df = price_records(price_df)
+        summary_df = summarize_prices_per_market(price_df, TOP_K_PER_MARKET)
+
+        if summary_df is None or summary_df.empty:
+            return header + """No summarized price data available.
+
+This could be due to:
+- Market holiday on selected date
+- No trading activity
+- Data not yet updated
+
+Try asking for:
+- A different date
+- Another commodity
+- Different location""", summary_df
+
+    if summary_df is not None and not summary_df.empty:
+        response_text = header + "Current Market Prices:\n\n"
+
+        for _, row in summary_df.iterrows():
+            response_text += format_market_line(row)
+
+        # Calculate overall average
+        try:
+            # Try different column names for modal prices
+            modal_prices = None
+            if 'Avg Modal' in summary_df.columns:
+                modal_prices = summary_df['Avg Modal'].dropna()
+            elif 'modal_price' in summary_df.columns:
+                modal_prices = summary_df['modal_price'].dropna()
+            elif 'Modal' in summary_df.columns:
+                modal_prices = summary_df['Modal'].dropna()
+
+            if modal_prices is not None and len(modal_prices) > 0:
+                overall_avg = modal_prices.mean()
+                response_text += f"""Average Across All Markets: Rs.{overall_avg:.0f}/quintal
+
+Price Summary:
+- Prices averaged from latest {TOP_K_PER_MARKET} entries per market
+- Compare different markets to find best rates
+- Data directly from AgMarkNet
+
+Anything else?"""
+            else:
+                response_text += "Anything else?"
+        except Exception as e:
+            print(f"Average calculation error: {e}")
+            response_text += "Anything else?"
+        return response_text, summary_df
+
+    if data_source == "queued":
+        return header + """Prices are still being fetched from AgMarkNet.
+Please ask again in a minute.""", None
+
+    if data_source in ("busy", "timeout"):
+        return header + """AgMarkNet is slow to respond right now, so prices could not be fetched in time.
+Please try again in a few minutes.""", None
+
+    if data_source == "future":
+        return header + """Prices for this date are not published yet, AgMarkNet only has prices after trading.
+Try asking for today or an earlier date.""", None
+
+    if data_source == "unavailable":
+        return header + """AgMarkNet is not responding right now and we have no earlier prices for this query.
+Please try again in a few minutes.""", None
+
+    return header + """No price data available for these parameters.
+
+This could be due to:
+- Market holiday on selected date
+- No trading activity
+- Data not yet updated
+
+Try asking for:
+- A different date
+- Another commodity
+- Different location""", None
+
+def summary_records(summary_df: Optional[pd.DataFrame]) -> List[Dict[str, Any]]:
+    """JSON-safe rows of a summarize_prices_per_market frame"""
+    if summary_df is None or summary_df.empty:
+        return []
+    return json.loads(summary_df.to_json(orient="records"))
+
+async def fetch_price_summary(price_service: Optional[PriceDataService],
+                              lease_service: Optional[ScrapeLeaseService],
+                              formatted_date: str, district_code: str, commodity_code: str,
+                              job_queue: Optional[ScrapeJobQueueService] = None
+                              ) -> Tuple[Optional[pd.DataFrame], Optional[pd.DataFrame], str]:
+    """
+    (price_df, summary_df, data_source): the precomputed summary if the key
+    is cached and fresh (from process memory, else one document read, never
+    raw rows), else fresh cached
+    rows summarized by a Mongo aggregation, otherwise fetch_price_data's
+    result with summary_df None.
+    """
+    for read_summary in (read_price_summary, read_cached_summary):
+        summary_df = await read_summary(price_service, formatted_date, district_code, commodity_code)
+        if summary_df is not None and not summary_df.empty:
+            return None, summary_df, "cached"
+    price_df, data_source = await fetch_price_data(
+        price_service, lease_service, formatted_date, district_code, commodity_code, job_queue=job_queue
+    )
+    return price_df, None, data_source
+
+# -------- Deferred price queries --------
+async def should_defer_price_query(requested: bool = False,
+                                   job_queue: Optional[ScrapeJobQueueService] = None) -> bool:
+    """
+    Hand the query to a background job if the client asked to, or the scrape would
+    have to wait: every local scrape slot is taken or, in queue mode (where the API
+    never scrapes itself), scrape_queue_defer_depth jobs are already waiting for a worker.
+    """
+    if requested:
+        return True
+    if settings.scrape_mode == "queue":
+        return job_queue is not None and await job_queue.queued_count() >= settings.scrape_queue_defer_depth
+    return scrape_executor.saturated()
+
+async def _run_price_job(job_id: str, job_service: PriceQueryJobService,
+                         price_service: Optional[PriceDataService],
+                         lease_service: Optional[ScrapeLeaseService],
+                         job_queue: Optional[ScrapeJobQueueService],
+                         session_service: Optional[SessionService], session_id: Optional[str],
+                         slots: Dict[str, Any], formatted_date: str,
+                         district_code: str, commodity_code: str):
+    commodity, district, date_str = slots.get("commodity"), slots.get("area"), slots.get("time")
+    await job_service.mark_running(job_id)
+    try:
+        deadline = time.monotonic() + settings.price_job_wait_seconds
+        while True:
+            price_df, summary_df, data_source = await fetch_price_summary(
+                price_service, lease_service, formatted_date, district_code, commodity_code,
+                job_queue=job_queue
+            )
+            # A background job can afford to wait for a scrape slot to free up
+            if data_source != "busy" or time.monotonic() >= deadline:
+                break
+            await asyncio.sleep(settings.price_job_retry_seconds)
+
+        response_text, summary_df = format_price_response(commodity, district, date_str, price_df, data_source,
+                                                          summary_df=summary_df)
+        await job_service.finish(job_id, "done", response_text,
+                                 data_source=data_source, markets=summary_records(summary_df))
+    except Exception as e:
+        print(f"❌ Price job {job_id} failed: {e}")
+        response_text = "Technical issue retrieving price data currently. Please try again."
+        await job_service.finish(job_id, "failed", response_text, error=str(e))
+
+    if session_service and session_id:
+        try:
+            await session_service.update_session(session_id, {
+                "$push": {"conversation_history": {
+                    "type": "price_response",
+                    "message": response_text,
+                    "slots": slots,
+                    "job_id": job_id,
+                    "timestamp": datetime.now().isoformat(),
+                }},
+                "$inc": {"completed_queries": 1}
+            })
+        except Exception as e:
+            print(f"Session final storage error: {e}")
+
+async def start_price_job(job_service: PriceQueryJobService,
+                          price_service: Optional[PriceDataService],
+                          lease_service: Optional[ScrapeLeaseService],
+                          job_queue: Optional[ScrapeJobQueueService],
+                          session_service: Optional[SessionService], session_id: Optional[str],
+                          slots: Dict[str, Any], formatted_date: str,
+                          district_code: str, commodity_code: str) -> Optional[str]:
+    """Record a pending price job and run it in the background; None if it could not be stored"""
+    job = PriceQueryJobModel(
+        job_id=uuid.uuid4().hex,
+        session_id=session_id,
+        commodity=slots.get("commodity"),
+        district=slots.get("area"),
+        date_requested=slots.get("time"),
+    )
+    if not await job_service.create(job):
+        return None
+    task = asyncio.create_task(_run_price_job(
+        job.job_id, job_service, price_service, lease_service, job_queue,
+        session_service, session_id, slots, formatted_date, district_code, commodity_code
+    ))
+    _running_jobs.add(task)
+    task.add_done_callback(_running_jobs.discard)
+    print(f"📨 Deferred price query to job {job.job_id}")
+    return job.job_id
+
+# -------- Range backfill jobs --------
+async def _run_range_job(job_id: str, job_service: PriceQueryJobService,
+                         price_service: Optional[PriceDataService], start_date: str, end_date: str,
+                         commodity_codes: List[str], district_codes: List[str]):
+    await job_service.mark_running(job_id)
+    try:
+        deadline = time.monotonic() + settings.price_job_wait_seconds
+        while True:
+            try:
+                outcome = await backfill_price_range(price_service, start_date, end_date,
+                                                     commodity_codes, district_codes)
+                break
+            except ScrapeQueueFullError:
+                # Like a price job, wait a while for a scrape slot to free up
+                if time.monotonic() >= deadline:
+                    raise
+                await asyncio.sleep(settings.price_job_retry_seconds)
+        message = (f"Cached {outcome['records_cached']} price records from "
+                   f"{outcome['scraped_days']} scraped district-day(s).")
+        if outcome["status"] != "done":
+            message += " The range timed out before every day was scraped."
+        await job_service.finish(job_id, "done", message,
+                                 data_source="scraped" if outcome["status"] == "done" else "timeout",
+                                 outcome=outcome)
+    except Exception as e:
+        print(f"❌ Range job {job_id} failed: {e}")
+        await job_service.finish(job_id, "failed", "Range scrape failed. Please try again.", error=str(e))
+
+async def start_range_job(job_service: PriceQueryJobService, price_service: Optional[PriceDataService],
+                          start_date: str, end_date: str, commodities: List[str], districts: List[str],
+                          commodity_codes: List[str], district_codes: List[str]) -> Optional[str]:
+    """Record a pending range backfill and run it in the background; None if it could not be stored"""
+    job = PriceQueryJobModel(
+        job_id=uuid.uuid4().hex,
+        commodity=", ".join(commodities),
+        district=", ".join(districts),
+        date_requested=f"{start_date}..{end_date}",
+    )
+    if not await job_service.create(job):
+        return None
+    task = asyncio.create_task(_run_range_job(
+        job.job_id, job_service, price_service, start_date, end_date, commodity_codes, district_codes
+    ))
+    _running_jobs.add(task)
+    task.add_done_callback(_running_jobs.discard)
+    print(f"📨 Range backfill {start_date}..{end_date} running as job {job.job_id}")
+    return job.job_id
+
+def public_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Job document as returned by the polling and SSE endpoints"""
+    result = {
+        "job_id": job["_id"],
+        "status": job.get("status"),
+        "commodity": job.get("commodity"),
+        "district": job.get("district"),
+        "date": job.get("date_requested"),
+        "data_source": job.get("data_source"),
+        "message": job.get("message"),
+        "markets": job.get("markets", []),
+    }
+    if job.get("result") is not None:
+        result["result"] = job["result"]
+    for field in ("created_at", "finished_at"):
+        if job.get(field):
+            result[field] = job[field].isoformat()
+    return result
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def price_job_events(job_service: PriceQueryJobService, job_id: str) -> AsyncIterator[str]:
+    """
+    Server-sent events for one job: a "status" event whenever the status
+    changes and a final "result" event with the formatted reply. Comment
+    lines keep slow mobile links and proxies from closing an idle stream.
+    """
+    deadline = time.monotonic() + settings.price_job_stream_timeout_seconds
+    last_status = None
+    while time.monotonic() < deadline:
+        job = await job_service.get_job(job_id)
+        if job is None:
+            yield _sse("error", {"job_id": job_id, "error": "Job not found"})
+            return
+        if job.get("status") in ("done", "failed"):
+            yield _sse("result", public_job(job))
+            return
+        if job.get("status") != last_status:
+            last_status = job.get("status")
+            yield _sse("status", {"job_id": job_id, "status": last_status})
+        else:
+            yield ": keep-alive\n\n"
+        await asyncio.sleep(settings.price_job_poll_seconds)
+    yield _sse("timeout", {"job_id": job_id, "status": last_status})
+
+# -------- Progressive streaming of a price query --------
+def _frame_markets(price_df: Optional[pd.DataFrame]):
+    """(market, rows) pairs of an already complete price frame"""
+    if price_df is None or price_df.empty:
+        return []
+    price_df = price_records(price_df)
+    return [(market, group) for market, group in price_df.groupby('Market', sort=False)]
+
+def _market_event(market: str, market_df: pd.DataFrame) -> Optional[str]:
+    """The "market" event for one market's rows, None if they summarize to nothing"""
+    summary_df = summarize_prices_per_market(market_df, TOP_K_PER_MARKET)
+    if summary_df is None or summary_df.empty:
+        return None
+    return _sse("market", {"market": market, "line": format_market_line(summary_df.iloc[0]),
+                           "summary": summary_records(summary_df)[0]})
+
+def _frame_events(price_df: Optional[pd.DataFrame]) -> List[str]:
+    """"market" events for every market of an already complete price frame"""
+    events = []
+    for market, group in _frame_markets(price_df):
+        event = _market_event(market, group)
+        if event:
+            events.append(event)
+    return events
+
+async def stream_price_events(commodity: str, district: str, date_str: str,
+                              price_service: Optional[PriceDataService],
+                              lease_service: Optional[ScrapeLeaseService],
+                              job_queue: Optional[ScrapeJobQueueService],
+                              formatted_date: str, district_code: str, commodity_code: str,
+                              session_service: Optional[SessionService] = None,
+                              session_id: Optional[str] = None) -> AsyncIterator[str]:
+    """
+    Server-sent events for a completed price query: "start" with the reply
+    header, one "market" event per market as soon as its rows are scraped,
+    then "done" with the full reply built from every market.
+    Cached data, queue mode, a saturated executor and an open AgMarkNet
+    circuit skip the live stream and send all markets from the complete
+    (possibly stale) result; a fresh precomputed summary is sent as is.
+    The live stream holds the key's scrape lease and leads its single-flight
+    call; when another worker or request is already scraping the key, the
+    stream waits for that scrape through fetch_price_data instead.
+    """
+    yield _sse("start", {"message": _price_header(commodity, district, date_str)})
+    data_source = "cached"
+    live = False
+    all_rows = []
+    precomputed = None
+    try:
+        precomputed = await read_price_summary(price_service, formatted_date, district_code, commodity_code)
+        if precomputed is None:
+            precomputed = await read_cached_summary(price_service, formatted_date, district_code, commodity_code)
+        price_df, miss = None, None
+        if precomputed is None:
+            price_df = await read_cached_prices(price_service, formatted_date, district_code, commodity_code)
+            if price_df is None or price_df.empty:
+                miss = await read_known_miss(price_service, formatted_date, district_code, commodity_code)
+        if miss:
+            price_df, data_source = None, miss
+        elif precomputed is None and (price_df is None or price_df.empty):
+            if settings.scrape_mode == "queue" or scrape_executor.saturated() or agmarknet_breaker.rejecting():
+                price_df, data_source = await fetch_price_data(
+                    price_service, lease_service, formatted_date, district_code, commodity_code,
+                    job_queue=job_queue
+                )
+            else:
+                price_df, data_source, live = None, "scraped", True
+
+        if precomputed is not None:
+            for (_, row), record in zip(precomputed.iterrows(), summary_records(precomputed)):
+                yield _sse("market", {"market": row["Market"], "line": format_market_line(row),
+                                      "summary": record})
+        elif price_df is not None:
+            all_rows = [price_df]
+            for event in _frame_events(price_df):
+                yield event
+        elif live:
+            in_flight = False
+            async with held_scrape_lease(lease_service, formatted_date, district_code, commodity_code) as held:
+                if held:
+                    outcome = {}
+                    try:
+                        async for market, rows in stream_agmarknet_markets(formatted_date, "UP", district_code,
+                                                                           commodity_code, outcome):
+                            market_df = price_records(rows, formatted_date)
+                            all_rows.append(market_df)
+                            event = _market_event(market, market_df)
+                            if event:
+                                yield event
+                    except ScrapeInFlightError:
+                        in_flight = True
+                    else:
+                        # Caches live rows, records a miss only for a complete scrape without rows,
+                        # and turns a failed one (mock rows) into the key's stale rows
+                        price_df, data_source = await store_scrape_result(
+                            price_service, outcome.get("result"), formatted_date, district_code, commodity_code
+                        )
+                        if data_source == "stale":
+                            for event in _frame_events(price_df):
+                                yield event
+                        all_rows = [price_df] if price_df is not None else []
+            if not held or in_flight:
+                # Another worker or request is already scraping the key: wait for and share its result
+                price_df, data_source = await fetch_price_data(price_service, lease_service, formatted_date,
+                                                               district_code, commodity_code, job_queue=job_queue)
+                all_rows = [price_df] if price_df is not None else []
+                for event in _frame_events(price_df):
+                    yield event
+    except ScrapeQueueFullError:
+        data_source = "busy"
+    except ScrapeCancelledError:
+        data_source = "timeout"
+    except CircuitOpenError:
+        # The circuit opened after the stream started; fetch_price_data knows how to serve stale data
+        price_df, data_source = await fetch_price_data(price_service, lease_service, formatted_date,
+                                                       district_code, commodity_code, job_queue=job_queue)
+        all_rows = [price_df] if price_df is not None else []
+        for event in _frame_events(price_df):
+            yield event
+    except Exception as e:
+        print(f"❌ Price stream error: {e}")
+        yield _sse("error", {"message": "Technical issue retrieving price data currently. Please try again."})
+        return
+
+    full_df = pd.concat(all_rows, ignore_index=True) if all_rows else None
+    response_text, summary_df = format_price_response(commodity, district, date_str, full_df, data_source,
+                                                      summary_df=precomputed)
+    yield _sse("done", {"message": response_text, "data_source": data_source,
+                        "markets": summary_records(summary_df)})
+
+    if session_service and session_id:
+        try:
+            await session_service.update_session(session_id, {
+                "$push": {"conversation_history": {
+                    "type": "price_response",
+                    "message": response_text,
+                    "slots": {"commodity": commodity, "area": district, "time": date_str},
+                    "timestamp": datetime.now().isoformat(),
+                }},
+                "$inc": {"completed_queries": 1}
+            })
+        except Exception as e:
+            print(f"Session final storage error: {e}")
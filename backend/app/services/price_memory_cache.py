@@ -0,0 +1,106 @@
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+import pandas as pd
+from app.core.config import settings
+from app.services.freshness_policy import freshness_policy
+
+PriceKey = Tuple[str, str, str]
+
+class PriceMemoryCache:
+    """
+    Per-process LRU of price (or summary) frames read from Mongo, keyed on
+    (commodity_code, district_code, date), so hot keys skip the Atlas round trip.
+
+    An entry expires by the same rule as the Mongo read: once its oldest row's
+    scraped_at falls before freshness_policy.fresh_since() (the stricter,
+    non-final bound if any row came from a partial scrape), Mongo would no
+    longer return it either. max_age_seconds additionally bounds how long
+    another process's rescrape can go unnoticed; writes from this process
+    invalidate the key immediately.
+    """
+
+    def __init__(self, max_entries: int, max_age_seconds: int):
+        self.max_entries = max(0, max_entries)
+        self.max_age = timedelta(seconds=max(0, max_age_seconds))
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[PriceKey, Tuple[pd.DataFrame, datetime, bool, datetime]]" = OrderedDict()
+        self._counters = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "invalidations": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.max_age.total_seconds() > 0
+
+    def get(self, commodity_code: str, district_code: str, date: str) -> Optional[pd.DataFrame]:
+        """A copy of the cached frame while it is still fresh, else None"""
+        key = (commodity_code, district_code, date)
+        now = datetime.now()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+            df, oldest_scraped_at, complete, loaded_at = entry
+            fresh_since = freshness_policy.fresh_since(commodity_code, date, now, complete)
+            if now - loaded_at > self.max_age or oldest_scraped_at < fresh_since:
+                del self._entries[key]
+                self._counters["expired"] += 1
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+        # Callers rename and add columns, never hand out the cached frame itself
+        return df.copy()
+
+    def put(self, commodity_code: str, district_code: str, date: str, df: pd.DataFrame,
+            scraped_at: Optional[datetime] = None, complete: Optional[bool] = None):
+        """
+        Cache df for the key. Row frames carry scraped_at (and complete)
+        columns; summary frames pass their rows' oldest scraped_at and
+        completeness instead.
+        """
+        if not self.enabled or df is None or df.empty:
+            return
+        if scraped_at is None:
+            if "scraped_at" not in df.columns:
+                return
+            scraped_at = pd.to_datetime(df["scraped_at"]).min()
+            if pd.isna(scraped_at):
+                return
+            scraped_at = scraped_at.to_pydatetime()
+        if complete is None:
+            # Documents written before the complete flag existed count as complete
+            complete = "complete" not in df.columns or bool(df["complete"].ne(False).all())
+        key = (commodity_code, district_code, date)
+        with self._lock:
+            self._entries[key] = (df.copy(), scraped_at, complete, datetime.now())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def invalidate(self, commodity_code: str, district_code: str, date: str):
+        with self._lock:
+            if self._entries.pop((commodity_code, district_code, date), None) is not None:
+                self._counters["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "max_age_seconds": int(self.max_age.total_seconds()),
+                **self._counters,
+                "hit_rate": round(self._counters["hits"] / lookups, 3) if lookups else None,
+            }
+
+# Global in-process tiers consulted by PriceDataService before Mongo: raw rows, and per-market summaries
+price_memory_cache = PriceMemoryCache(settings.price_memory_cache_entries, settings.price_memory_cache_max_age_seconds)
+price_summary_memory_cache = PriceMemoryCache(settings.price_memory_cache_entries,
+                                              settings.price_memory_cache_max_age_seconds)
@@ -0,0 +1,116 @@
+"""
+Canonical price record batch.
+
+Every price frame passed between the scraper, PriceDataService and the
+summarizer has the columns of PRICE_RECORD_DTYPES with exactly those dtypes:
+prices are float64 (NaN for "N/A"), parsed once when the rows are scraped,
+and Date is datetime64[ns]. price_records() converts anything else (raw row
+dicts, Mongo documents) once; on a frame that is already canonical it
+returns the frame itself, so the hot path never renames or copies.
+"""
+import math
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Union
+import pandas as pd
+
+AGMARKNET_DATE_FORMAT = "%d-%b-%Y"
+
+PRICE_RECORD_DTYPES = {
+    "Market": "object",
+    "Commodity": "object",
+    "District": "object",
+    "Min Price": "float64",
+    "Max Price": "float64",
+    "Modal Price": "float64",
+    "Date": "datetime64[ns]",
+}
+PRICE_COLUMNS = ["Min Price", "Max Price", "Modal Price"]
+
+# Names Mongo documents (and frames built before this schema) use for the same columns
+PRICE_COLUMN_ALIASES = {
+    "Market": ("market_name",),
+    "Commodity": ("commodity_name",),
+    "District": ("district_name",),
+    "Min Price": ("Min", "min_price"),
+    "Max Price": ("Max", "max_price"),
+    "Modal Price": ("Modal", "modal_price"),
+    "Date": ("market_date", "date"),
+}
+
+# Bookkeeping columns carried along when present
+PRICE_RECORD_METADATA = ("scraped_at", "complete")
+
+def parse_price(value: Any) -> float:
+    """A price cell as float: "2,450" -> 2450.0, "N/A"/blank -> NaN"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    try:
+        return float(str(value).replace(",", "").strip())
+    except (TypeError, ValueError):
+        return math.nan
+
+def parse_market_date(value: Union[str, datetime, None]) -> Optional[pd.Timestamp]:
+    """AgMarkNet's DD-Mon-YYYY date (or a datetime) as a Timestamp, None if unparseable"""
+    if isinstance(value, datetime):
+        return pd.Timestamp(value)
+    try:
+        return pd.Timestamp(datetime.strptime(str(value), AGMARKNET_DATE_FORMAT))
+    except ValueError:
+        return None
+
+def is_price_records(df: Optional[pd.DataFrame]) -> bool:
+    """True if df already has every canonical column with its canonical dtype"""
+    return df is not None and all(
+        column in df.columns and df[column].dtype == dtype for column, dtype in PRICE_RECORD_DTYPES.items()
+    )
+
+def _source_column(df: pd.DataFrame, column: str) -> Optional[pd.Series]:
+    """The column under its canonical name, gaps filled from its aliases (older documents lack market_date)"""
+    values = None
+    for name in (column,) + PRICE_COLUMN_ALIASES[column]:
+        if name in df.columns:
+            values = df[name] if values is None else values.where(values.notna(), df[name])
+    return values
+
+def _dates(values: Optional[pd.Series], index: pd.Index, date: Optional[str]) -> pd.Series:
+    if values is None:
+        values = pd.Series(date, index=index, dtype=object)
+    elif date is not None:
+        values = values.where(values.notna(), date)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.astype("datetime64[ns]")
+    parsed = pd.to_datetime(values, format=AGMARKNET_DATE_FORMAT, errors="coerce")
+    # Mixed input (datetimes from Mongo next to strings) misses the format; parse those cells one by one
+    unparsed = parsed.isna() & values.notna()
+    if unparsed.any():
+        parsed[unparsed] = pd.to_datetime(values[unparsed].map(parse_market_date))
+    return parsed.astype("datetime64[ns]")
+
+def price_records(data: Union[pd.DataFrame, List[Dict[str, Any]], None],
+                  date: Optional[str] = None) -> pd.DataFrame:
+    """
+    The canonical frame for scraped rows, cached documents or an existing
+    frame. date (DD-Mon-YYYY) fills rows without one. Canonical frames are
+    returned unchanged.
+    """
+    df = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data or [])
+    if is_price_records(df) and (date is None or not df["Date"].isna().any()):
+        return df
+    columns = {}
+    for column, dtype in PRICE_RECORD_DTYPES.items():
+        values = _source_column(df, column)
+        if column == "Date":
+            columns[column] = _dates(values, df.index, date)
+        elif column in PRICE_COLUMNS:
+            columns[column] = (pd.Series(float("nan"), index=df.index) if values is None
+                               else pd.to_numeric(values.map(parse_price) if values.dtype == object else values,
+                                                  errors="coerce").astype("float64"))
+        else:
+            columns[column] = (pd.Series("Unknown", index=df.index, dtype=object) if values is None
+                               else values.fillna("Unknown").astype(str).str.strip().astype(object))
+    for column in PRICE_RECORD_METADATA:
+        if column in df.columns:
+            columns[column] = df[column]
+    records = pd.DataFrame(columns, index=df.index).reset_index(drop=True)
+    records.attrs.update(df.attrs)
+    return records
@@ -0,0 +1,212 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from app.core.config import settings
+from app.models.price_data import PriceSummaryModel
+from app.services.price_records import price_records, is_price_records
+
+TOP_K_PER_MARKET = 3  # number of latest rows per market to average
+SUMMARIZE_ENGINE = settings.summarize_engine.lower()  # "numpy" or "pandas" (the reference implementation)
+
+SUMMARY_COLUMNS = ["Market", "Avg Modal", "Avg Min", "Avg Max", "Latest Date"]
+SUMMARY_PRICE_COLUMNS = ["Avg Modal", "Avg Min", "Avg Max"]
+
+# ------------- Aggregation: one price per market -------------
+def summarize_prices_per_market(df: pd.DataFrame, top_k: int = TOP_K_PER_MARKET,
+                                engine: Optional[str] = None) -> pd.DataFrame:
+    """
+    Keep top_k most recent rows per Market, then average Modal/Min/Max to return one row per Market.
+    Both engines return identical frames; engine defaults to settings.summarize_engine.
+    """
+    if df is None or df.empty:
+        return df
+    if (engine or SUMMARIZE_ENGINE) == "numpy":
+        return summarize_prices_numpy(df, top_k)
+    return summarize_prices_pandas(df, top_k)
+
+def summarize_prices_pandas(df: pd.DataFrame, top_k: int = TOP_K_PER_MARKET) -> pd.DataFrame:
+    """Reference engine: sort, groupby().head(top_k), groupby().agg"""
+    if df is None or df.empty:
+        return df
+    out = df.copy()
+    # Normalize types
+    out["Market"] = out["Market"].astype(str).str.strip()
+    out["Modal Price"] = pd.to_numeric(out.get("Modal Price", pd.NA), errors="coerce")
+    out["Min Price"]   = pd.to_numeric(out.get("Min Price", pd.NA), errors="coerce")
+    out["Max Price"]   = pd.to_numeric(out.get("Max Price", pd.NA), errors="coerce")
+    out["Date"] = pd.to_datetime(out.get("Date", pd.NaT), errors="coerce")
+
+    # Sort within market and keep top_k rows per group
+    out = out.sort_values(["Market", "Date", "Modal Price"], ascending=[True, False, False])
+    topk = out.groupby("Market", group_keys=False).head(top_k)
+
+    # Aggregate per market
+    agg = topk.groupby("Market", as_index=False).agg({
+        "Modal Price": "mean",
+        "Min Price": "mean",
+        "Max Price": "mean",
+        "Date": "max"  # most recent date used as reference
+    })
+
+    # Round for display
+    for col in ["Modal Price", "Min Price", "Max Price"]:
+        agg[col] = agg[col].round().astype("Int64")
+
+    # Rename columns for clarity
+    agg = agg.rename(columns={
+        "Modal Price": "Avg Modal",
+        "Min Price": "Avg Min",
+        "Max Price": "Avg Max",
+        "Date": "Latest Date"
+    })
+    return agg
+
+def _per_distinct(values: pd.Series, convert) -> np.ndarray:
+    """
+    convert applied once per distinct value and spread back over the rows.
+    Raw scraped columns repeat a few hundred prices, dates and market names,
+    so parsing the distinct values instead of every cell is what lets the
+    array engine beat the reference on unparsed frames too.
+    """
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    return np.asarray(convert(pd.Series(uniques, dtype=values.dtype)))[codes]
+
+def _numeric_column(df: pd.DataFrame, name: str) -> np.ndarray:
+    if name not in df.columns:
+        return np.full(len(df), np.nan)
+    if df[name].dtype == "float64":
+        return df[name].to_numpy()
+    if df[name].dtype == object:
+        return _per_distinct(df[name], lambda u: pd.to_numeric(u, errors="coerce").to_numpy(
+            dtype="float64", na_value=np.nan))
+    return pd.to_numeric(df[name], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+
+def _market_codes(markets: pd.Series) -> Tuple[np.ndarray, pd.Index]:
+    """Sorted factorization of the stripped market names, stripping each distinct name once"""
+    codes, uniques = pd.factorize(markets, use_na_sentinel=False)
+    stripped = pd.Series(uniques, dtype=object).astype(str).str.strip()
+    stripped_codes, names = pd.factorize(stripped, sort=True)
+    return stripped_codes[codes], names
+
+def _grouped_mean(values: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """NaN-skipping mean of each run starting at starts; NaN for runs without a value"""
+    present = ~np.isnan(values)
+    totals = np.add.reduceat(np.where(present, values, 0.0), starts)
+    counts = np.add.reduceat(present.astype("int64"), starts)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, totals / np.maximum(counts, 1), np.nan)
+
+def summarize_prices_numpy(df: pd.DataFrame, top_k: int = TOP_K_PER_MARKET) -> pd.DataFrame:
+    """
+    Array engine: factorized market codes, one lexsort, a rank-within-market
+    mask for the top_k rows and np.*.reduceat for the per-market reductions.
+    Parses and orders exactly like summarize_prices_pandas (NaN/NaT last,
+    ties in input order), so the two return equal frames.
+    """
+    if df is None or df.empty:
+        return df
+    if top_k <= 0:
+        # No rows kept per market (head() semantics for negative top_k): leave it to the reference
+        return summarize_prices_pandas(df, top_k)
+    # Canonical price records are already typed and stripped: no parsing at all
+    canonical = is_price_records(df)
+    if canonical:
+        dates = df["Date"]
+    elif "Date" in df.columns and df["Date"].dtype == object:
+        # Same first value, so to_datetime infers the same format as on the whole column
+        dates = pd.Series(_per_distinct(df["Date"], lambda u: pd.to_datetime(u, errors="coerce")),
+                          index=df.index)
+    else:
+        dates = pd.to_datetime(df["Date"], errors="coerce") if "Date" in df.columns else None
+    if dates is not None and dates.dtype != "datetime64[ns]":
+        # tz-aware or non-ns dates: keep the reference engine's semantics
+        return summarize_prices_pandas(df, top_k)
+    codes, markets = pd.factorize(df["Market"], sort=True) if canonical else _market_codes(df["Market"])
+    modal = _numeric_column(df, "Modal Price")
+    low = _numeric_column(df, "Min Price")
+    high = _numeric_column(df, "Max Price")
+    nat = np.iinfo("int64").min
+    date_ns = dates.to_numpy().view("int64") if dates is not None else np.full(len(df), nat)
+
+    # Market ascending, Date descending, Modal descending; missing values sort last
+    order = np.lexsort((
+        np.where(np.isnan(modal), np.inf, -modal),
+        np.where(date_ns == nat, np.iinfo("int64").max, -date_ns),
+        codes,
+    ))
+    codes = codes[order]
+    boundaries = np.flatnonzero(np.diff(codes)) + 1
+    group_starts = np.concatenate(([0], boundaries))
+    rank = np.arange(len(codes)) - np.repeat(group_starts, np.diff(np.append(group_starts, len(codes))))
+    keep = order[rank < top_k]
+
+    # Each market keeps at least one row, so its first kept row starts a run
+    kept_codes = codes[rank < top_k]
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(kept_codes)) + 1))
+    agg = pd.DataFrame({
+        "Market": np.asarray(markets, dtype=object),
+        "Avg Modal": pd.array(np.round(_grouped_mean(modal[keep], starts)), dtype="Int64"),
+        "Avg Min": pd.array(np.round(_grouped_mean(low[keep], starts)), dtype="Int64"),
+        "Avg Max": pd.array(np.round(_grouped_mean(high[keep], starts)), dtype="Int64"),
+        # NaT is int64 min, so max() only returns it for markets without any date
+        "Latest Date": np.maximum.reduceat(date_ns[keep], starts).view("datetime64[ns]"),
+    })
+    return agg
+
+# ------------- Precomputed summaries (price_summaries collection) -------------
+def _plain(value: Any) -> Any:
+    """BSON-safe scalar: pandas NA/NaT become None, numpy scalars plain Python ones"""
+    if pd.isna(value):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    return value.item() if isinstance(value, np.generic) else value
+
+def summary_markets(summary_df: Optional[pd.DataFrame]) -> Tuple[List[Dict[str, Any]], Optional[float]]:
+    """(per-market rows, overall average modal price) of a summarize_prices_per_market frame"""
+    if summary_df is None or summary_df.empty:
+        return [], None
+    markets = [{column: _plain(row[column]) for column in SUMMARY_COLUMNS}
+               for row in summary_df[SUMMARY_COLUMNS].to_dict("records")]
+    modal = summary_df["Avg Modal"].dropna()
+    overall_avg = round(float(modal.mean()), 2) if len(modal) else None
+    return markets, overall_avg
+
+def summary_frame(markets: List[Dict[str, Any]]) -> pd.DataFrame:
+    """A stored summary back as the frame summarize_prices_per_market would have returned"""
+    frame = pd.DataFrame(markets, columns=SUMMARY_COLUMNS)
+    for column in SUMMARY_PRICE_COLUMNS:
+        frame[column] = pd.to_numeric(frame[column]).astype("Int64")
+    frame["Latest Date"] = pd.to_datetime(frame["Latest Date"])
+    return frame
+
+def price_summary_doc(price_df: pd.DataFrame, commodity_code: str, district_code: str, date: str,
+                      scraped_at: datetime, top_k: int = TOP_K_PER_MARKET) -> Optional[Dict[str, Any]]:
+    """
+    The price_summaries document for one cache write, None if the frame has
+    no rows. price_df is a partial scrape (attrs["partial"]) or the cached
+    documents themselves, whose complete column says the same.
+    """
+    if price_df is None or price_df.empty:
+        return None
+    markets, overall_avg = summary_markets(summarize_prices_per_market(price_records(price_df, date), top_k))
+    if not markets:
+        return None
+    complete = not price_df.attrs.get("partial", False)
+    if "complete" in price_df.columns:
+        complete = complete and bool(price_df["complete"].ne(False).all())
+    doc = PriceSummaryModel(
+        summary_key=f"{commodity_code}|{district_code}|{date}",
+        commodity_code=commodity_code,
+        district_code=district_code,
+        date=date,
+        top_k=top_k,
+        markets=markets,
+        market_count=len(markets),
+        overall_avg=overall_avg,
+        scraped_at=scraped_at,
+        complete=complete
+    ).dict()
+    doc["_id"] = doc.pop("summary_key")
+    return doc
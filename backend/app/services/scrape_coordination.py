@@ -0,0 +1,353 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+from app.core.config import settings
+
+class ScrapeQueueFullError(RuntimeError):
+    """Every scrape slot is busy and the wait queue is at its depth limit"""
+
+class ScrapeCancelledError(RuntimeError):
+    """A scrape job was cancelled before it produced a result"""
+
+class ScrapeTimeoutError(ScrapeCancelledError):
+    """A scrape job ran past its per-job timeout and was cancelled"""
+
+class ScrapeInFlightError(RuntimeError):
+    """A scrape for the key is already running in this process; join it instead of starting another"""
+
+class CircuitOpenError(RuntimeError):
+    """AgMarkNet has been failing and the circuit breaker is not letting scrapes through"""
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker around AgMarkNet scraping.
+
+    closed: scrapes run normally. After failure_threshold failures in a row
+    it opens and every scrape is refused at once. After reset_seconds it
+    half-opens and lets a single probe scrape through; the probe's outcome
+    closes or re-opens the circuit.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 3, reset_seconds: float = 60):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._stats = {"opened": 0, "rejected": 0}
+
+    def _current_state(self) -> str:
+        # Caller holds the lock
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+            self._state = self.HALF_OPEN
+            self._probing = False
+        return self._state
+
+    def _open(self):
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._probing = False
+        self._stats["opened"] += 1
+        print(f"🔴 {self.name} circuit open after {self._failures} failure(s), "
+              f"retrying in {self.reset_seconds}s")
+
+    def allow(self) -> bool:
+        """May a scrape run now? In half-open state only the first caller gets to probe."""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                print(f"🟡 {self.name} circuit half-open, sending a probe scrape")
+                return True
+            self._stats["rejected"] += 1
+            return False
+
+    def rejecting(self) -> bool:
+        """True while a scrape would be refused, without claiming the half-open probe"""
+        with self._lock:
+            state = self._current_state()
+            return state == self.OPEN or (state == self.HALF_OPEN and self._probing)
+
+    def retry_after(self) -> float:
+        """Seconds until an open circuit half-opens (0 when it is not open)"""
+        with self._lock:
+            if self._current_state() != self.OPEN:
+                return 0.0
+            return max(0.0, self.reset_seconds - (time.monotonic() - self._opened_at))
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                print(f"🟢 {self.name} circuit closed, scraping works again")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            state = self._current_state()
+            if state == self.HALF_OPEN or (state == self.CLOSED and self._failures >= self.failure_threshold):
+                self._open()
+
+    def release_probe(self):
+        """A probe ended without telling us anything (e.g. cancelled); let the next caller probe"""
+        with self._lock:
+            self._probing = False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                "state": self._current_state(),
+                "consecutive_failures": self._failures,
+                "failure_threshold": self.failure_threshold,
+                "reset_seconds": self.reset_seconds,
+            })
+        return stats
+
+class ScrapeJob:
+    """One submitted scrape: its result future plus a cooperative cancel flag"""
+
+    def __init__(self):
+        self.future: Future = Future()
+        self.future.set_running_or_notify_cancel()
+        self.cancel_event = threading.Event()
+
+    def _settle(self, result: Any = None, error: Optional[BaseException] = None) -> bool:
+        try:
+            if error is not None:
+                self.future.set_exception(error)
+            else:
+                self.future.set_result(result)
+            return True
+        except InvalidStateError:
+            return False  # Already timed out / cancelled
+
+    def cancel(self, error: Optional[BaseException] = None):
+        """Ask the scrape to stop at its next checkpoint and fail everyone waiting on it"""
+        self.cancel_event.set()
+        self._settle(error=error or ScrapeCancelledError("Scrape cancelled"))
+
+class ScrapeExecutor:
+    """
+    Bounded thread pool that keeps blocking scrapes off the asyncio event loop.
+
+    At most max_workers scrapes run at once and at most max_queue more may
+    wait; beyond that submit() raises ScrapeQueueFullError. Each job gets a
+    timeout after which waiters see ScrapeTimeoutError and the scrape is
+    told to stop via its cancel_event.
+    """
+
+    def __init__(self, max_workers: int = 4, max_queue: int = 8, timeout: float = 120):
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="scrape")
+        self._lock = threading.Lock()
+        self._jobs = set()
+        self._running = 0
+        self._stats = {"submitted": 0, "rejected": 0, "timed_out": 0, "cancelled": 0}
+
+    def _execute(self, job: ScrapeJob, fn: Callable, args: tuple):
+        try:
+            if job.cancel_event.is_set():
+                return  # Cancelled while still queued
+            with self._lock:
+                self._running += 1
+            try:
+                result = fn(*args, cancel_event=job.cancel_event)
+            except BaseException as e:
+                job._settle(error=e)
+            else:
+                job._settle(result)
+            finally:
+                with self._lock:
+                    self._running -= 1
+        finally:
+            with self._lock:
+                self._jobs.discard(job)
+
+    def _time_out(self, job: ScrapeJob):
+        if not job.future.done():
+            with self._lock:
+                self._stats["timed_out"] += 1
+            print(f"⏱️ Scrape job exceeded {self.timeout}s, cancelling")
+            job.cancel(ScrapeTimeoutError(f"Scrape exceeded {self.timeout}s"))
+
+    def submit(self, fn: Callable, *args, timeout: Optional[float] = None) -> ScrapeJob:
+        """Queue fn(*args, cancel_event=...) or raise ScrapeQueueFullError"""
+        with self._lock:
+            if len(self._jobs) >= self.max_workers + self.max_queue:
+                self._stats["rejected"] += 1
+                raise ScrapeQueueFullError(
+                    f"{len(self._jobs)} scrapes running or queued (limit {self.max_workers + self.max_queue})"
+                )
+            job = ScrapeJob()
+            self._jobs.add(job)
+            self._stats["submitted"] += 1
+        timer = threading.Timer(timeout or self.timeout, self._time_out, args=(job,))
+        timer.daemon = True
+        timer.start()
+        job.future.add_done_callback(lambda _: timer.cancel())
+        self._executor.submit(self._execute, job, fn, args)
+        return job
+
+    def saturated(self) -> bool:
+        """Every worker is busy, so a new scrape would have to queue"""
+        with self._lock:
+            return len(self._jobs) >= self.max_workers
+
+    def cancel_all(self):
+        """Stop every queued and running scrape, e.g. on shutdown"""
+        with self._lock:
+            jobs = list(self._jobs)
+            self._stats["cancelled"] += len(jobs)
+        for job in jobs:
+            job.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "running": self._running,
+                "queued": len(self._jobs) - self._running,
+            })
+        return stats
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key onto one execution.
+
+    The first caller for a key runs the function; everyone who arrives while
+    it is still running waits for and shares the same result (or exception).
+    Works for plain threads (do) and asyncio handlers (do_async) alike.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+        self._followers: Dict[Hashable, int] = {}
+        self._stats = {"executions": 0, "coalesced": 0}
+
+    def _join(self, key: Hashable) -> Tuple[Future, bool]:
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self._stats["coalesced"] += 1
+                self._followers[key] = self._followers.get(key, 0) + 1
+                return future, False
+            future = Future()
+            # Mark running so a cancelled waiter can never cancel the shared result
+            future.set_running_or_notify_cancel()
+            self._calls[key] = future
+            self._stats["executions"] += 1
+            return future, True
+
+    def _forget(self, key: Hashable):
+        with self._lock:
+            self._calls.pop(key, None)
+            self._followers.pop(key, None)
+
+    def _settle(self, key: Hashable, future: Future, done: Future):
+        self._forget(key)
+        error = done.exception()
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(done.result())
+
+    def _run(self, key: Hashable, future: Future, fn: Callable, args: tuple):
+        try:
+            result = fn(*args)
+        except BaseException as e:
+            self._forget(key)
+            future.set_exception(e)
+        else:
+            self._forget(key)
+            future.set_result(result)
+
+    def do(self, key: Hashable, fn: Callable, *args) -> Any:
+        future, leader = self._join(key)
+        if leader:
+            self._run(key, future, fn, args)
+        else:
+            print(f"🤝 Joining in-flight call for {key}")
+        return future.result()
+
+    async def do_async(self, key: Hashable, fn: Callable, *args,
+                       executor: Optional[ScrapeExecutor] = None) -> Any:
+        """Await the shared call; with an executor the leader's call runs there as a bounded job"""
+        future, leader = self._join(key)
+        if leader and executor is None:
+            asyncio.get_running_loop().run_in_executor(None, self._run, key, future, fn, args)
+        elif leader:
+            self._submit(key, future, executor, fn, args)
+        else:
+            print(f"🤝 Joining in-flight call for {key}")
+        return await asyncio.wrap_future(future)
+
+    def _submit(self, key: Hashable, future: Future, executor: ScrapeExecutor, fn: Callable,
+                args: tuple) -> ScrapeJob:
+        try:
+            job = executor.submit(fn, *args)
+        except Exception as e:
+            self._forget(key)
+            future.set_exception(e)
+            raise
+        job.future.add_done_callback(lambda done: self._settle(key, future, done))
+        return job
+
+    def lead(self, key: Hashable, executor: ScrapeExecutor, fn: Callable, *args) -> Optional[ScrapeJob]:
+        """
+        Start fn on executor as the key's shared call and return its job, or None
+        if a call for the key is already in flight. Callers that join the key
+        meanwhile (do / do_async) share this job's result.
+        """
+        with self._lock:
+            if key in self._calls:
+                return None
+            future = Future()
+            future.set_running_or_notify_cancel()
+            self._calls[key] = future
+            self._stats["executions"] += 1
+        return self._submit(key, future, executor, fn, args)
+
+    def followers(self, key: Hashable) -> int:
+        """Callers that joined the key's in-flight call besides its leader"""
+        with self._lock:
+            return self._followers.get(key, 0)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._calls)
+        return stats
+
+# Global single-flight group for AgMarkNet scrapes, keyed on (commodity_code, district_code, date)
+scrape_flight = SingleFlight()
+
+# Global breaker every AgMarkNet district scrape passes through
+agmarknet_breaker = CircuitBreaker(
+    "AgMarkNet",
+    failure_threshold=settings.circuit_failure_threshold,
+    reset_seconds=settings.circuit_reset_seconds,
+)
+
+# Global bounded executor every async scrape runs on
+scrape_executor = ScrapeExecutor(
+    max_workers=settings.scrape_executor_workers,
+    max_queue=settings.scrape_executor_max_queue,
+    timeout=settings.scrape_job_timeout_seconds,
+)
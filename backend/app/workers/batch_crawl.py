@@ -0,0 +1,209 @@
+"""
+Resumable batch crawl.
+
+Scrapes every commodity in commodity_mappings.csv for every district in
+up_districts.csv over a date range and caches the rows through
+PriceDataService. Each finished (commodity, district, date) unit is
+checkpointed in Mongo, so after a crash or deploy the same crawl id picks up
+where it stopped instead of re-hitting AgMarkNet:
+
+    python -m app.workers.batch_crawl                      # nightly-<today>, today's prices
+    python -m app.workers.batch_crawl --crawl-id backfill-aug \
+        --start-date 2025-08-01 --end-date 2025-08-07 --commodities Wheat,Potato
+"""
+import argparse
+import asyncio
+import csv
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional, Tuple
+from app.core.config import settings
+from app.core.db import connect_to_mongo, close_mongo_connection, get_database
+from app.models.price_data import CrawlRunModel
+from app.services.database_service import PriceDataService, CrawlCheckpointService, MarketCatalogueService
+from app.services.driver_pool import shutdown_driver_pool
+from app.services.agmarknet_codes import COMMODITY_NAMES, DISTRICT_NAMES
+from app.services.interactivechat import scrape_commodity_range, scrape_date_range
+from app.services.market_catalogue import market_catalogue, normalize_district, UP_DISTRICTS_CSV
+from app.services.price_records import price_records
+
+COMMODITY_CSV = Path(__file__).resolve().parents[2] / "commodity_mappings.csv"
+
+# Codes the chat flow caches under, so crawled rows serve chat queries too
+AGMARKNET_COMMODITY_CODES = {name.lower(): code for code, name in COMMODITY_NAMES.items()}
+AGMARKNET_DISTRICT_CODES = {name: code for code, name in DISTRICT_NAMES.items()}
+
+def _load_pairs(path: Path, name_col: str, code_col: str) -> List[Tuple[str, str]]:
+    with open(path, 'r', encoding='utf-8') as file:
+        return [(row[name_col].strip(), row[code_col].strip()) for row in csv.DictReader(file) if row.get(name_col)]
+
+def load_commodities(path: Path = COMMODITY_CSV) -> List[Tuple[str, str]]:
+    """(name, code) pairs from commodity_mappings.csv"""
+    return _load_pairs(path, "Name", "Code")
+
+def load_districts(path: Path = UP_DISTRICTS_CSV) -> List[Tuple[str, str]]:
+    """(name, code) pairs from up_districts.csv; the CSV code is only a last-resort cache key"""
+    return _load_pairs(path, "District Name", "District Code")
+
+def district_code_for(name: str) -> Optional[str]:
+    """AgMarkNet code of a district, from the scraper's table or the market catalogue"""
+    code = AGMARKNET_DISTRICT_CODES.get(normalize_district(name))
+    if code is None:
+        entry = market_catalogue.lookup(district_name=name)
+        code = entry.get("district_code") if entry else None
+        # An AgMarkNet code equal to one of the scraper's own codes would cache under another district
+        if code in DISTRICT_NAMES:
+            code = None
+    return code
+
+class CrawlProgress:
+    """Completed/total units and the throughput of this run"""
+
+    def __init__(self, total: int, already_done: int):
+        self.total = total
+        self.done = already_done
+        self.done_this_run = 0
+        self.records = 0
+        self.started = time.monotonic()
+
+    def record(self, rows: int):
+        self.done += 1
+        self.done_this_run += 1
+        self.records += rows
+
+    def units_per_minute(self) -> float:
+        minutes = (time.monotonic() - self.started) / 60
+        return round(self.done_this_run / minutes, 2) if minutes > 0 else 0.0
+
+    def summary(self) -> str:
+        rate = self.units_per_minute()
+        remaining = self.total - self.done
+        eta = f"{remaining / rate:.0f} min" if rate else "unknown"
+        return (f"📈 {self.done}/{self.total} units ({self.done / max(self.total, 1):.1%}), "
+                f"{self.records} rows, {rate} units/min, ETA {eta}")
+
+async def crawl(crawl_id: str, dates: List[str], commodities: List[Tuple[str, str]], districts: List[Tuple[str, str]],
+                checkpoints: CrawlCheckpointService, price_service: PriceDataService):
+    total = len(commodities) * len(districts) * len(dates)
+    run = await checkpoints.start_run(CrawlRunModel(crawl_id=crawl_id, start_date=dates[0], end_date=dates[-1],
+                                                    total_units=total))
+    done = await checkpoints.completed_units(crawl_id) if run else None
+    if done is None:
+        # Without checkpoints a resume would redo (or a later run skip) work, so do not start blind
+        print(f"❌ Crawl {crawl_id}: checkpoints unavailable, not starting")
+        return
+    await checkpoints.update_progress(crawl_id, {"completed_units": len(done)})
+    progress = CrawlProgress(total, len(done))
+    print(f"🕸️ Crawl {crawl_id}: {total} units, {len(done)} already done")
+
+    loop = asyncio.get_running_loop()
+    cancel_event = threading.Event()
+    csv_district_codes = dict(districts)
+
+    async def record_unit(commodity_name, commodity_code, district_name, formatted_date, rows, complete):
+        if rows is None:
+            # No market of the district could be identified: not done, retried by the next run
+            await checkpoints.mark_unresolved(crawl_id, district_name)
+            return
+        district_code = district_code_for(district_name) or csv_district_codes[district_name]
+        cached = 0
+        if rows:
+            price_df = price_records(rows, formatted_date)
+            if not complete:
+                price_df.attrs["partial"] = True
+            cached = await price_service.cache_price_batches(
+                [(price_df, commodity_code, district_code, formatted_date)]
+            )
+        if not complete:
+            # Some market failed or the scrape was cut short: keep the rows, but retry the unit next run
+            print(f"⚠️ {commodity_name}/{district_name}/{formatted_date} incomplete, left for the next run")
+            return
+        if await checkpoints.mark_done(crawl_id, commodity_name, district_name, formatted_date, len(rows)):
+            progress.record(cached)
+            await checkpoints.update_progress(crawl_id, {"units_per_minute": progress.units_per_minute()},
+                                              inc={"completed_units": 1, "records_cached": cached})
+            if progress.done_this_run % settings.crawl_progress_every == 0:
+                print(progress.summary())
+
+    status = "interrupted"
+    try:
+        for commodity_name, csv_code in commodities:
+            commodity_code = AGMARKNET_COMMODITY_CODES.get(commodity_name.lower(), csv_code)
+            pending = {
+                (district_name, formatted_date)
+                for district_name, _ in districts
+                for formatted_date in dates
+                if checkpoints.unit_id(crawl_id, commodity_name, district_name, formatted_date) not in done
+            }
+            if not pending:
+                continue
+            pending_districts = {name for name, _ in pending}
+            pending_dates = [d for d in dates if d in {date for _, date in pending}]
+            targets = [(name, name.lower()) for name, _ in districts if name in pending_districts]
+            print(f"🌾 {commodity_name}: {len(pending)} pending unit(s) over {len(pending_dates)} day(s)")
+
+            def on_result(district_name, formatted_date, rows, complete,
+                          commodity_name=commodity_name, commodity_code=commodity_code):
+                # Runs on the scraper thread; block it until the checkpoint is written
+                if (district_name, formatted_date) not in pending:
+                    return
+                asyncio.run_coroutine_threadsafe(
+                    record_unit(commodity_name, commodity_code, district_name, formatted_date, rows, complete), loop
+                ).result()
+
+            await loop.run_in_executor(None, scrape_commodity_range, commodity_name, pending_dates,
+                                       targets, cancel_event, on_result)
+
+        # Units whose scrape failed, was incomplete or whose district was unresolved stay unchecked
+        # and are retried by the next run
+        status = "done" if progress.done >= total else "incomplete"
+    finally:
+        cancel_event.set()
+        await checkpoints.update_progress(crawl_id, {"status": status,
+                                                     "units_per_minute": progress.units_per_minute()})
+        print(progress.summary())
+        print(f"🏁 Crawl {crawl_id} stopped with status {status}")
+
+def _pick(items: List[Tuple[str, str]], names: Optional[str]) -> List[Tuple[str, str]]:
+    if not names:
+        return items
+    wanted = {n.strip().lower() for n in names.split(",") if n.strip()}
+    return [item for item in items if item[0].lower() in wanted]
+
+async def main(args):
+    today = datetime.now().strftime("%Y-%m-%d")
+    dates = scrape_date_range(args.start_date or today, args.end_date or args.start_date or today)
+    crawl_id = args.crawl_id or f"nightly-{today}"
+    commodities = _pick(load_commodities(), args.commodities)
+    districts = _pick(load_districts(), args.districts)
+
+    await connect_to_mongo()
+    db = get_database()
+    checkpoints = CrawlCheckpointService()
+    checkpoints.set_db(db)
+    await checkpoints.ensure_indexes()
+    price_service = PriceDataService()
+    price_service.set_db(db)
+    catalogue_service = MarketCatalogueService()
+    catalogue_service.set_db(db)
+    market_catalogue.load(await catalogue_service.load_all())
+
+    try:
+        await crawl(crawl_id, dates, commodities, districts, checkpoints, price_service)
+    finally:
+        shutdown_driver_pool()
+        await close_mongo_connection()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resumable AgMarkNet batch crawl")
+    parser.add_argument("--crawl-id", help="Checkpoint name; rerun with the same id to resume")
+    parser.add_argument("--start-date", help="YYYY-MM-DD, defaults to today")
+    parser.add_argument("--end-date", help="YYYY-MM-DD, defaults to --start-date")
+    parser.add_argument("--commodities", help="Comma-separated names from commodity_mappings.csv")
+    parser.add_argument("--districts", help="Comma-separated names from up_districts.csv")
+    try:
+        asyncio.run(main(parser.parse_args()))
+    except KeyboardInterrupt:
+        print("👋 Crawl stopped, rerun with the same --crawl-id to resume")
@@ -0,0 +1,99 @@
+"""
+Standalone scraper worker.
+
+Leases scrape jobs from the Mongo-backed queue, runs scrape_agmarknet and
+writes the rows (or the key's negative-cache entry) through PriceDataService. Run one or more
+per scraping node (API hosts do not need Chrome in "queue" mode):
+
+    python -m app.workers.scrape_worker
+"""
+import asyncio
+import os
+import socket
+from app.core.config import settings
+from app.core.db import connect_to_mongo, close_mongo_connection, get_database
+from app.services.database_service import PriceDataService, ScrapeJobQueueService, ScrapeLeaseService, MarketCatalogueService
+from app.services.market_catalogue import run_market_catalogue_refresher
+from app.services.driver_pool import get_driver_pool, shutdown_driver_pool
+from app.services.interactivechat import scrape_agmarknet_coalesced_async
+from app.services.price_fetcher import store_scrape_result
+from app.services.scrape_coordination import scrape_executor
+
+WORKER_ID = f"scraper:{socket.gethostname()}:{os.getpid()}"
+
+async def _keep_job_leased(job_queue: ScrapeJobQueueService, job_id: str, owner_id: str):
+    """Extend the job lease while the scrape runs so no other worker steals it"""
+    while True:
+        await asyncio.sleep(settings.scrape_job_lease_seconds / 3)
+        if not await job_queue.extend_lease(job_id, owner_id, settings.scrape_job_lease_seconds):
+            print(f"⚠️ Lost lease on job {job_id}")
+            return
+
+async def run_job(job: dict, owner_id: str, job_queue: ScrapeJobQueueService, price_service: PriceDataService):
+    job_id = job["_id"]
+    print(f"🛠️ {owner_id} running job {job_id} (attempt {job.get('attempts', 1)})")
+    heartbeat = asyncio.create_task(_keep_job_leased(job_queue, job_id, owner_id))
+    try:
+        price_df = await scrape_agmarknet_coalesced_async(
+            job["date"], "UP", job["district_code"], job["commodity_code"]
+        )
+        # Caches live rows, or records the key in the negative cache when AgMarkNet has none
+        price_df, data_source = await store_scrape_result(
+            price_service, price_df, job["date"], job["district_code"], job["commodity_code"]
+        )
+        if data_source in ("stale", "unavailable"):
+            # Requeued (up to its attempts); waiting API requests serve stale rows meanwhile
+            raise RuntimeError("AgMarkNet scrape failed")
+        cached = len(price_df) if data_source == "scraped" else 0
+        await job_queue.complete(job_id, owner_id, cached)
+        print(f"✅ Job {job_id} done, {cached} rows cached")
+    except Exception as e:
+        print(f"❌ Job {job_id} failed: {e}")
+        await job_queue.fail(job_id, owner_id, str(e), settings.scrape_job_max_attempts)
+    finally:
+        heartbeat.cancel()
+
+async def consume(slot: int, job_queue: ScrapeJobQueueService, price_service: PriceDataService):
+    """One consumer loop; a worker process runs scrape_worker_concurrency of them"""
+    owner_id = f"{WORKER_ID}:{slot}"
+    while True:
+        job = await job_queue.lease_next(owner_id, settings.scrape_job_lease_seconds,
+                                         settings.scrape_job_max_attempts)
+        if job is None:
+            await asyncio.sleep(settings.scrape_worker_poll_seconds)
+            continue
+        await run_job(job, owner_id, job_queue, price_service)
+
+async def main():
+    print(f"🚀 Starting scraper worker {WORKER_ID}...")
+    await connect_to_mongo()
+    db = get_database()
+    job_queue = ScrapeJobQueueService()
+    job_queue.set_db(db)
+    await job_queue.ensure_indexes()
+    price_service = PriceDataService()
+    price_service.set_db(db)
+    await price_service.ensure_indexes()
+    catalogue_service = MarketCatalogueService()
+    catalogue_service.set_db(db)
+    lease_service = ScrapeLeaseService()
+    lease_service.set_db(db)
+    catalogue_refresher = asyncio.create_task(run_market_catalogue_refresher(catalogue_service, lease_service))
+
+    await asyncio.get_running_loop().run_in_executor(None, get_driver_pool().warm)
+    try:
+        await asyncio.gather(*[
+            consume(slot, job_queue, price_service)
+            for slot in range(settings.scrape_worker_concurrency)
+        ])
+    finally:
+        catalogue_refresher.cancel()
+        scrape_executor.cancel_all()
+        shutdown_driver_pool()
+        await close_mongo_connection()
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("👋 Scraper worker stopped")
@@ -0,0 +1,98 @@
+# agmarknet_stub.py
+# Minimal local stand-in for AgMarkNet's SearchCmmMkt.aspx, replaying the
+# recorded responses in tests/fixtures/agmarknet. Used by the tests, and
+# by hand to run the HTTP engine without touching the real site:
+#
+#     cd backend && python tests/agmarknet_stub.py --port 8765
+#     AGMARKNET_BASE_URL=http://127.0.0.1:8765 SCRAPER_ENGINE=http uvicorn app.main:app
+import argparse
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List
+from urllib.parse import parse_qs
+
+FIXTURES = Path(__file__).parent / "fixtures" / "agmarknet"
+SEARCH_PATH = "/SearchCmmMkt.aspx"
+
+def fixture(name: str) -> str:
+    return (FIXTURES / name).read_text(encoding="utf-8")
+
+def issued_viewstates() -> set:
+    """Every __VIEWSTATE a recorded page hands out; posts must carry one of them back"""
+    pattern = re.compile(r'name="__VIEWSTATE" id="__VIEWSTATE" value="([^"]*)"')
+    return {match for path in FIXTURES.glob("*.html") for match in pattern.findall(path.read_text(encoding="utf-8"))}
+
+class AgmarknetStubHandler(BaseHTTPRequestHandler):
+    """GET serves the search page; POST answers the postbacks the scraper sends"""
+
+    def _send(self, status: int, body: str):
+        payload = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path.split("?")[0] != SEARCH_PATH:
+            return self._send(404, "Not Found")
+        self._send(200, fixture("search_page.html"))
+
+    def do_POST(self):
+        if self.path.split("?")[0] != SEARCH_PATH:
+            return self._send(404, "Not Found")
+        length = int(self.headers.get("Content-Length") or 0)
+        data = {k: v[0] for k, v in parse_qs(self.rfile.read(length).decode("utf-8"), keep_blank_values=True).items()}
+        self.server.posts.append(data)
+
+        # ASP.NET rejects a postback whose view state it never issued
+        if data.get("__VIEWSTATE") not in self.server.viewstates:
+            return self._send(500, "Validation of viewstate MAC failed.")
+        if data.get("__EVENTTARGET") == "ddlState":
+            return self._send(200, fixture("state_selected.html"))
+        if "btnGo" in data:
+            market = data.get("ddlMarket", "0")
+            if market in self.server.fail_markets:
+                return self._send(500, "Server Error")
+            if market not in ("", "0") and (FIXTURES / f"market_{market}.html").exists():
+                return self._send(200, fixture(f"market_{market}.html"))
+            return self._send(200, fixture("markets_loaded.html"))
+        self._send(200, fixture("search_page.html"))
+
+    def log_message(self, format, *args):
+        pass
+
+class AgmarknetStubServer(ThreadingHTTPServer):
+    """
+    Stand-in server on a local port; posts holds every form it received.
+    Markets whose ddlMarket value is in fail_markets answer 500.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port: int = 0):
+        super().__init__(("127.0.0.1", port), AgmarknetStubHandler)
+        self.posts: List[Dict[str, str]] = []
+        self.viewstates = issued_viewstates()
+        self.fail_markets: set = set()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self) -> "AgmarknetStubServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve recorded AgMarkNet responses locally")
+    parser.add_argument("--port", type=int, default=8765)
+    server = AgmarknetStubServer(parser.parse_args().port)
+    print(f"🧪 AgMarkNet stand-in serving {FIXTURES} at {server.base_url}{SEARCH_PATH}")
+    server.serve_forever()
@@ -0,0 +1,24 @@
+import os
+import sys
+from pathlib import Path
+import pytest
+
+# Settings() requires these; the tests never talk to Gemini or Mongo
+os.environ.setdefault("GEMINI_API_KEY", "test")
+os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from agmarknet_stub import AgmarknetStubServer
+
+@pytest.fixture
+def agmarknet_stub():
+    server = AgmarknetStubServer().start()
+    yield server
+    server.stop()
+
+@pytest.fixture
+def mongo_db():
+    # Services run their real queries against an in-memory Mongo
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    return mongomock_motor.AsyncMongoMockClient()["digikisan_test"]
@@ -0,0 +1,120 @@
+import math
+from contextlib import closing
+import pandas as pd
+import pytest
+import requests
+from bs4 import BeautifulSoup
+from agmarknet_stub import fixture
+from app.core.config import settings
+from app.services.agmarknet_http import AgmarknetForm, AgmarknetHttpClient
+
+@pytest.fixture
+def scraper():
+    # The scraper module loads the chat model's torch/transformers at import
+    return pytest.importorskip("app.services.interactivechat")
+
+# ------------- Form parsing on recorded pages -------------
+def test_fields_are_what_a_browser_posts():
+    fields = AgmarknetForm(fixture("search_page.html")).fields()
+    assert fields["__VIEWSTATE"] == "vs-search"
+    assert fields["__EVENTVALIDATION"] == "ev-search"
+    # Selected option wins, else the first one
+    assert fields["ddlArrivalPrice"] == "1"
+    assert fields["ddlCommodity"] == "0"
+    assert fields["txtDate"] == ""
+    # Buttons and unchecked boxes are never posted
+    assert "btnGo" not in fields and "btnReset" not in fields and "chkAll" not in fields
+
+def test_options_skip_the_placeholder():
+    form = AgmarknetForm(fixture("markets_loaded.html"))
+    assert form.options("ddlMarket") == [("101", "Achnera"), ("102", "Agra"), ("103", "Fatehabad"), ("201", "Lucknow")]
+    assert form.indexed_options("ddlMarket")[0] == (0, "0", "--Select--")
+    assert form.options("ddlMissing") == []
+
+def test_option_value_matches_text_case_insensitively():
+    form = AgmarknetForm(fixture("search_page.html"))
+    assert form.option_value("ddlCommodity", "wheat") == "23"
+    assert form.option_value("ddlState", "Uttar Pradesh") == "UP"
+    assert form.option_value("ddlCommodity", "Barley") is None
+
+def test_autopostback_reads_the_onchange_handler():
+    form = AgmarknetForm(fixture("search_page.html"))
+    assert form.autopostback("ddlState")
+    assert not form.autopostback("ddlCommodity")
+
+# ------------- Client against the local stand-in server -------------
+def test_client_replays_the_search_flow(agmarknet_stub):
+    client = AgmarknetHttpClient(search_url=f"{agmarknet_stub.base_url}/SearchCmmMkt.aspx", timeout=5)
+    try:
+        form = client.open()
+        form = client.select(form, "ddlCommodity", "Wheat")
+        assert agmarknet_stub.posts == []  # no autopostback: only marked selected
+        form = client.select(form, "ddlState", "Uttar Pradesh")
+        form = client.set_text(form, "txtDate", "15-Oct-2026")
+        markets_form = client.post(form, {}, submit="btnGo")
+        result_form = client.post(markets_form, {"ddlMarket": "102"}, submit="btnGo")
+    finally:
+        client.close()
+
+    state_post, go_post, market_post = agmarknet_stub.posts
+    assert state_post["__EVENTTARGET"] == "ddlState"
+    assert state_post["__VIEWSTATE"] == "vs-search"
+    assert state_post["ddlCommodity"] == "23" and state_post["ddlState"] == "UP"
+    # Each postback carries the previous response's view state forward
+    assert go_post["__VIEWSTATE"] == "vs-state" and go_post["__EVENTVALIDATION"] == "ev-state"
+    assert go_post["txtDate"] == "15-Oct-2026" and go_post["btnGo"] == "Go"
+    assert market_post["__VIEWSTATE"] == "vs-markets" and market_post["ddlMarket"] == "102"
+
+    assert [name for _, name in markets_form.options("ddlMarket")] == ["Achnera", "Agra", "Fatehabad", "Lucknow"]
+    rows = result_form.soup.find("table", {"id": "cphBody_GridPriceData"}).find_all("tr")
+    assert len(rows) == 4
+
+def test_market_without_prices_has_no_grid(agmarknet_stub):
+    markets_form = AgmarknetForm(fixture("markets_loaded.html"))
+    with closing(AgmarknetHttpClient(search_url=f"{agmarknet_stub.base_url}/SearchCmmMkt.aspx", timeout=5)) as client:
+        result_form = client.post(markets_form, {"ddlMarket": "103"}, submit="btnGo")
+    assert result_form.soup.find("table", {"id": "cphBody_GridPriceData"}) is None
+
+def test_select_unknown_option_raises(agmarknet_stub):
+    with closing(AgmarknetHttpClient(search_url=f"{agmarknet_stub.base_url}/SearchCmmMkt.aspx", timeout=5)) as client:
+        with pytest.raises(ValueError):
+            client.select(client.open(), "ddlCommodity", "Barley")
+        with pytest.raises(ValueError):
+            client.set_text(client.open(), "txtMissing", "x")
+
+def test_rejected_postback_raises(agmarknet_stub):
+    form = AgmarknetForm(fixture("search_page.html").replace("vs-search", "forged"))
+    with closing(AgmarknetHttpClient(search_url=f"{agmarknet_stub.base_url}/SearchCmmMkt.aspx", timeout=5)) as client:
+        with pytest.raises(requests.HTTPError):
+            client.post(form, {}, submit="btnGo")
+
+# ------------- Parsing the recorded price grid -------------
+def test_extract_parses_market_prices_and_date(scraper):
+    soup = BeautifulSoup(fixture("market_102.html"), "html.parser")
+    rows = scraper.extract_market_prices_enhanced(soup, " Agra ", "Wheat", "15-Oct-2026")
+    assert [(r["Market"], r["Commodity"], r["Date"]) for r in rows] == [("Agra", "Wheat", pd.Timestamp("2026-10-15"))] * 3
+    assert [(r["Min Price"], r["Max Price"], r["Modal Price"]) for r in rows[:2]] == [(2410.0, 2490.0, 2450.0),
+                                                                                      (2500.0, 2620.0, 2560.0)]
+    # "N/A" cells are NaN, not a parse failure
+    assert math.isnan(rows[2]["Min Price"]) and rows[2]["Modal Price"] == 2380.0
+
+def test_extract_without_a_grid_returns_none(scraper):
+    soup = BeautifulSoup(fixture("market_103.html"), "html.parser")
+    assert scraper.extract_market_prices_enhanced(soup, "Fatehabad", "Wheat", "15-Oct-2026") is None
+
+# ------------- HTTP engine end to end against the stand-in -------------
+def test_http_engine_scrapes_the_district_markets(scraper, agmarknet_stub, monkeypatch):
+    monkeypatch.setattr(settings, "agmarknet_base_url", agmarknet_stub.base_url)
+    reported = []
+    rows, complete = scraper.scrape_markets_http("15-Oct-2026", "agra", "Wheat",
+                                                 on_market=lambda name, data: reported.append((name, len(data))))
+    assert complete
+    assert reported == [("Agra", 3)]
+    records = scraper.price_records(rows)
+    assert list(records["Modal Price"]) == [2450.0, 2560.0, 2380.0]
+    assert set(records["Date"]) == {pd.Timestamp("2026-10-15")}
+
+def test_http_engine_flags_a_failed_market_incomplete(scraper, agmarknet_stub, monkeypatch):
+    monkeypatch.setattr(settings, "agmarknet_base_url", agmarknet_stub.base_url)
+    agmarknet_stub.fail_markets.add("102")
+    assert scraper.scrape_markets_http("15-Oct-2026", "agra", "Wheat") == ([], False)
@@ -0,0 +1,93 @@
+import asyncio
+import pytest
+
+# The crawl drives the range engines, which live next to the chat model (torch/transformers)
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from app.services.database_service import CrawlCheckpointService
+from app.workers import batch_crawl
+
+DATES = ["14-Oct-2026", "15-Oct-2026"]
+DISTRICTS = [("Agra", "101"), ("Lucknow", "102")]
+ROW = {"Market": "Agra", "Commodity": "Wheat", "Min Price": "2,400", "Max Price": "2,500", "Modal Price": "2,450"}
+
+class MemoryCheckpoints:
+    """CrawlCheckpointService kept in dicts"""
+
+    unit_id = staticmethod(CrawlCheckpointService.unit_id)
+
+    def __init__(self, available=True):
+        self.available = available
+        self.runs = {}
+        self.units = {}
+        self.unresolved = []
+
+    async def start_run(self, run):
+        if not self.available:
+            return None
+        return self.runs.setdefault(run.crawl_id, run.dict())
+
+    async def completed_units(self, crawl_id):
+        return {unit_id for unit_id, unit in self.units.items() if unit["crawl_id"] == crawl_id}
+
+    async def mark_done(self, crawl_id, commodity, district, date, rows):
+        unit_id = self.unit_id(crawl_id, commodity, district, date)
+        if unit_id in self.units:
+            return False
+        self.units[unit_id] = {"crawl_id": crawl_id, "rows": rows}
+        return True
+
+    async def mark_unresolved(self, crawl_id, district):
+        self.unresolved.append(district)
+
+    async def update_progress(self, crawl_id, fields, inc=None):
+        self.runs[crawl_id].update(fields)
+
+class MemoryPrices:
+    def __init__(self):
+        self.batches = []
+
+    async def cache_price_batches(self, batches):
+        self.batches.extend(batches)
+        return sum(len(df) for df, *_ in batches)
+
+def fake_range(outcomes, scraped):
+    """scrape_commodity_range stand-in reporting outcomes[(district, date)] as (rows, complete)"""
+    def scrape(commodity_name, dates, targets, cancel_event, on_result):
+        for district_name, _ in targets:
+            for date in dates:
+                scraped.append((district_name, date))
+                rows, complete = outcomes.get((district_name, date), ([ROW], True))
+                on_result(district_name, date, rows, complete)
+    return scrape
+
+def run_crawl(checkpoints, prices):
+    asyncio.run(batch_crawl.crawl("nightly", DATES, [("Wheat", "23")], DISTRICTS, checkpoints, prices))
+
+def test_crawl_resumes_only_the_units_left_unfinished(monkeypatch):
+    checkpoints, prices, scraped = MemoryCheckpoints(), MemoryPrices(), []
+    monkeypatch.setattr(batch_crawl, "scrape_commodity_range", fake_range({
+        ("Agra", "15-Oct-2026"): ([ROW], False),
+        ("Lucknow", "14-Oct-2026"): (None, False),
+    }, scraped))
+    run_crawl(checkpoints, prices)
+    assert len(checkpoints.units) == 2 and checkpoints.runs["nightly"]["status"] == "incomplete"
+    assert checkpoints.unresolved == ["Lucknow"]
+    # Partial rows are still cached, flagged so they never count as final
+    partial = [df for df, _, district_code, date in prices.batches if (district_code, date) == ("7", "15-Oct-2026")]
+    assert partial[0].attrs["partial"]
+
+    prices.batches.clear()
+    monkeypatch.setattr(batch_crawl, "scrape_commodity_range", fake_range({}, scraped))
+    run_crawl(checkpoints, prices)
+    # Checkpointed units are neither re-cached nor re-recorded
+    assert sorted((code, date) for _, _, code, date in prices.batches) == [("33", "14-Oct-2026"),
+                                                                           ("7", "15-Oct-2026")]
+    assert len(checkpoints.units) == 4 and checkpoints.runs["nightly"]["status"] == "done"
+
+def test_crawl_does_not_start_without_checkpoints(monkeypatch):
+    scraped = []
+    monkeypatch.setattr(batch_crawl, "scrape_commodity_range", fake_range({}, scraped))
+    run_crawl(MemoryCheckpoints(available=False), MemoryPrices())
+    assert scraped == []
@@ -0,0 +1,119 @@
+import pytest
+from selenium.common.exceptions import WebDriverException
+from app.core.config import settings
+from app.services import driver_pool
+from app.services.driver_pool import DriverPool
+
+class FakeDriver:
+    """webdriver.Chrome stand-in reporting a settable JS heap"""
+
+    def __init__(self, service=None, options=None):
+        self.heap_bytes = 0
+        self.dead = False
+        self.quit_called = False
+        self.pages = []
+
+    @property
+    def current_url(self):
+        if self.dead:
+            raise WebDriverException("chrome not reachable")
+        return self.pages[-1] if self.pages else "about:blank"
+
+    def implicitly_wait(self, seconds):
+        pass
+
+    def execute_cdp_cmd(self, cmd, params):
+        return {}
+
+    def execute_script(self, script, *args):
+        return self.heap_bytes
+
+    def get(self, url):
+        self.pages.append(url)
+
+    def find_elements(self, by, value):
+        return []
+
+    def quit(self):
+        self.quit_called = True
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(driver_pool.webdriver, "Chrome", FakeDriver)
+    monkeypatch.setattr(driver_pool, "Service", lambda path: None)
+    monkeypatch.setattr(driver_pool, "wait_for_document_ready", lambda driver, timeout, step: True)
+    pool = DriverPool(size=2, max_uses=2, acquire_timeout=0.1)
+    pool._driver_path = "chromedriver"
+    yield pool
+    pool.close_all()
+
+def test_driver_is_reused_then_recycled_after_max_uses(pool):
+    with pool.lease() as first:
+        pass
+    with pool.lease() as second:
+        pass
+    assert second is first and first.quit_called
+    with pool.lease() as third:
+        pass
+    assert third is not first
+    assert (pool.stats()["created"], pool.stats()["recycled"]) == (2, 1)
+
+def test_every_lease_starts_on_a_fresh_search_page(pool):
+    with pool.lease() as driver:
+        driver.get("results")
+    with pool.lease() as driver:
+        assert driver.current_url == settings.agmarknet_search_url
+
+def test_failed_scrape_discards_its_driver(pool):
+    with pytest.raises(RuntimeError):
+        with pool.lease() as broken:
+            raise RuntimeError("stale grid")
+    assert broken.quit_called and pool.stats()["crashed"] == 1
+    with pool.lease() as driver:
+        assert driver is not broken
+
+def test_driver_over_the_memory_limit_is_recycled(pool, monkeypatch):
+    monkeypatch.setattr(settings, "scraper_driver_memory_mb", 100)
+    with pool.lease() as heavy:
+        heavy.heap_bytes = 101 * 1024 * 1024
+    assert heavy.quit_called and pool.stats()["over_memory"] == 1
+
+def test_driver_that_died_while_idle_is_replaced(pool):
+    with pool.lease() as driver:
+        pass
+    driver.dead = True
+    with pool.lease() as replacement:
+        assert replacement is not driver
+    assert pool.stats()["crashed"] == 1
+
+def test_lease_times_out_when_every_driver_is_busy(pool):
+    with pool.lease(), pool.lease():
+        with pytest.raises(TimeoutError):
+            with pool.lease():
+                pass
+
+def test_warm_counts_leased_drivers(pool):
+    with pool.lease():
+        pool.warm()
+        assert pool.stats()["alive"] == 2
+    assert pool.stats()["created"] == 2 and pool.stats()["idle"] == 2
+
+def test_chrome_options_keep_the_heap_cap_above_the_recycle_threshold(monkeypatch):
+    monkeypatch.setattr(settings, "scraper_driver_js_heap_cap_mb", 256)
+    monkeypatch.setattr(settings, "scraper_driver_memory_mb", 400)
+    monkeypatch.setattr(settings, "scraper_block_resources", True)
+    options = driver_pool.build_chrome_options()
+    assert "--js-flags=--max-old-space-size=800" in options.arguments
+    assert "--blink-settings=imagesEnabled=false" in options.arguments
+    assert options.experimental_options["prefs"]["profile.managed_default_content_settings.images"] == 2
+
+def test_resources_are_blocked_through_devtools():
+    commands = []
+
+    class RecordingDriver(FakeDriver):
+        def execute_cdp_cmd(self, cmd, params):
+            commands.append((cmd, params))
+
+    driver_pool.block_resources(RecordingDriver())
+    assert commands == [("Network.enable", {}),
+                        ("Network.setBlockedURLs", {"urls": driver_pool.BLOCKED_URL_PATTERNS})]
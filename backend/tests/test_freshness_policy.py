@@ -0,0 +1,51 @@
+from datetime import datetime, timezone
+from app.services.freshness_policy import MANDI_TZ, FreshnessPolicy, parse_report_times, server_time
+
+def ist(*args) -> datetime:
+    return datetime(*args, tzinfo=MANDI_TZ)
+
+def policy(**overrides) -> FreshnessPolicy:
+    return FreshnessPolicy("11:00,14:30", 3, **overrides)
+
+def test_parse_report_times_sorts_and_skips_malformed():
+    assert [t.strftime("%H:%M") for t in parse_report_times("14:30, 25:99,11:00,")] == ["11:00", "14:30"]
+
+def test_last_report_time_is_the_latest_passed_ist_report():
+    assert policy().last_report_time("1", ist(2026, 10, 15, 12, 0)) == server_time(ist(2026, 10, 15, 11, 0))
+    assert policy().last_report_time("1", ist(2026, 10, 15, 15, 0)) == server_time(ist(2026, 10, 15, 14, 30))
+    # Before the first report of the day, yesterday's last report still rules
+    assert policy().last_report_time("1", ist(2026, 10, 15, 9, 0)) == server_time(ist(2026, 10, 14, 14, 30))
+
+def test_last_report_time_reads_other_timezones_as_ist():
+    # 06:00 UTC is 11:30 in India, after the 11:00 report
+    now = datetime(2026, 10, 15, 6, 0, tzinfo=timezone.utc)
+    assert policy().last_report_time("1", now) == server_time(ist(2026, 10, 15, 11, 0))
+
+def test_without_report_times_the_window_starts_at_ist_midnight():
+    assert FreshnessPolicy("", 3).last_report_time("1", ist(2026, 10, 15, 0, 30)) == server_time(ist(2026, 10, 15))
+
+def test_final_after_is_settle_days_past_the_market_date():
+    assert policy().final_after("1", "12-Oct-2026") == server_time(ist(2026, 10, 15))
+    assert policy(commodity_settle_days={"1": 0}).final_after("1", "12-Oct-2026") == server_time(ist(2026, 10, 12))
+    assert policy().final_after("1", "not a date") is None
+
+def test_settled_complete_rows_stay_fresh_but_partial_ones_do_not():
+    now = ist(2026, 10, 20, 12, 0)
+    assert policy().fresh_since("1", "12-Oct-2026", now) == server_time(ist(2026, 10, 15))
+    assert policy().fresh_since("1", "12-Oct-2026", now, complete=False) == server_time(ist(2026, 10, 20, 11, 0))
+    # A market date still within its settle window is refreshed every reporting window
+    assert policy().fresh_since("1", "19-Oct-2026", now) == server_time(ist(2026, 10, 20, 11, 0))
+
+def test_commodity_report_times_override_the_default():
+    custom = policy(commodity_report_times={"7": "09:00"})
+    assert custom.last_report_time("7", ist(2026, 10, 15, 12, 0)) == server_time(ist(2026, 10, 15, 9, 0))
+    assert custom.last_report_time("1", ist(2026, 10, 15, 12, 0)) == server_time(ist(2026, 10, 15, 11, 0))
+
+def test_fresh_filter_only_accepts_settled_rows_when_complete():
+    now = ist(2026, 10, 20, 12, 0)
+    last_report = server_time(ist(2026, 10, 20, 11, 0))
+    assert policy().fresh_filter("1", "19-Oct-2026", now) == {"scraped_at": {"$gte": last_report}}
+    assert policy().fresh_filter("1", "12-Oct-2026", now) == {"$or": [
+        {"scraped_at": {"$gte": last_report}},
+        {"scraped_at": {"$gte": server_time(ist(2026, 10, 15))}, "complete": {"$ne": False}},
+    ]}
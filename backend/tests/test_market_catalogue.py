@@ -0,0 +1,44 @@
+from app.services.agmarknet_codes import DISTRICT_NAMES
+from app.services.market_catalogue import MarketCatalogue, match_markets_by_keyword
+
+def catalogue(*entries):
+    cat = MarketCatalogue()
+    cat.load([{"district_name": name, "district_code": code, "markets": [{"name": m} for m in markets]}
+              for name, code, markets in entries])
+    return cat
+
+def test_district_codes_never_reuse_a_code_the_scraper_resolves_by_name():
+    # AgMarkNet gives Kushinagar 15, which the scraper reads as Faizabad
+    assert DISTRICT_NAMES["15"] == "faizabad"
+    cat = catalogue(("Kushinagar", "15", []), ("Hardoi", "99", []), ("Basti", "7", []))
+    codes = cat.district_codes(reserved=["1", "33"])
+    assert "kushinagar" not in codes
+    assert "basti" not in codes
+    assert codes["hardoi"] == "99"
+
+def test_district_codes_skip_callers_reserved_codes():
+    cat = catalogue(("Hardoi", "99", []))
+    assert cat.district_codes(reserved=["99"]) == {}
+
+def test_lookup_prefers_the_name_over_a_colliding_code():
+    cat = catalogue(("Kushinagar", "15", ["Padrauna"]), ("Faizabad", None, ["Faizabad"]))
+    assert cat.lookup(district_code="15", district_name="faizabad")["district_name"] == "Faizabad"
+    assert cat.lookup(district_code="15")["district_name"] == "Kushinagar"
+    # Renamed districts resolve to the name AgMarkNet still uses
+    assert cat.lookup(district_name="Ayodhya")["district_name"] == "Faizabad"
+
+def test_keyword_match_knows_market_towns():
+    options = [("1", "Agra"), ("2", "Fatehpur Sikri"), ("3", "Lucknow")]
+    assert match_markets_by_keyword(options, "agra") == [("1", "Agra"), ("2", "Fatehpur Sikri")]
+
+def test_build_stores_market_names_per_district(agmarknet_stub, monkeypatch):
+    from app.core.config import settings
+    from app.services.market_catalogue import build_market_catalogue
+    monkeypatch.setattr(settings, "agmarknet_base_url", agmarknet_stub.base_url)
+    entries = {e["district_name"]: e for e in build_market_catalogue(["Agra", "Kanpur"])}
+    assert entries["Agra"]["district_code"] == "1"
+    assert entries["Agra"]["source"] == "district_dropdown"
+    assert entries["Agra"]["markets"][0] == {"name": "Achnera"}
+    # Not in AgMarkNet's district dropdown: matched by keyword, no code
+    assert entries["Kanpur"]["district_code"] is None
+    assert entries["Kanpur"]["source"] == "keywords"
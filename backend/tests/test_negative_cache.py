@@ -0,0 +1,71 @@
+import asyncio
+from datetime import datetime, timedelta
+import pandas as pd
+import pytest
+from app.core.config import settings
+from app.services.database_service import PriceDataService
+
+@pytest.fixture
+def fetcher():
+    # price_fetcher imports the scraper module, which loads torch/transformers
+    return pytest.importorskip("app.services.price_fetcher")
+
+def days_ago(days: int) -> str:
+    return (datetime.now() - timedelta(days=days)).strftime("%d-%b-%Y")
+
+def test_miss_ttl_grows_with_the_age_of_the_date(fetcher, monkeypatch):
+    monkeypatch.setattr(settings, "negative_cache_today_minutes", 30)
+    monkeypatch.setattr(settings, "negative_cache_recent_hours", 6)
+    monkeypatch.setattr(settings, "negative_cache_recent_days", 3)
+    monkeypatch.setattr(settings, "negative_cache_old_days", 7)
+    assert fetcher.miss_ttl_seconds(days_ago(0)) == 30 * 60
+    assert fetcher.miss_ttl_seconds(days_ago(1)) == 6 * 3600
+    assert fetcher.miss_ttl_seconds(days_ago(3)) == 6 * 3600
+    assert fetcher.miss_ttl_seconds(days_ago(4)) == 7 * 86400
+    # Unparseable dates get the shortest tier
+    assert fetcher.miss_ttl_seconds("someday") == 30 * 60
+
+def test_future_dates_are_known_misses_without_a_lookup(fetcher):
+    assert fetcher.is_future(days_ago(-1)) and not fetcher.is_future(days_ago(0))
+    assert asyncio.run(fetcher.read_known_miss(None, days_ago(-1), "1", "23")) == "future"
+    assert asyncio.run(fetcher.read_known_miss(None, days_ago(1), "1", "23")) is None
+
+class RecordingPrices:
+    def __init__(self):
+        self.misses = []
+
+    async def remember_miss(self, commodity_code, district_code, date, reason, ttl_seconds):
+        self.misses.append((commodity_code, district_code, date, reason, ttl_seconds))
+        return True
+
+def mock_rows(reason: str) -> pd.DataFrame:
+    df = pd.DataFrame({"Market": ["Mock"], "Modal Price": [1.0]})
+    df.attrs["mock_reason"] = reason
+    return df
+
+def test_no_data_scrape_is_remembered_and_not_served(fetcher):
+    prices = RecordingPrices()
+    date = days_ago(10)
+    result = asyncio.run(fetcher.store_scrape_result(prices, mock_rows("no_data"), date, "1", "23"))
+    assert result == (None, "no_data")
+    assert prices.misses == [("23", "1", date, "no_data", fetcher.miss_ttl_seconds(date))]
+
+def test_future_date_mock_is_not_remembered(fetcher):
+    prices = RecordingPrices()
+    assert asyncio.run(fetcher.store_scrape_result(prices, mock_rows("future_date"), days_ago(-1), "1", "23")) \
+        == (None, "future")
+    assert prices.misses == []
+
+def test_expired_misses_are_ignored(mongo_db):
+    prices = PriceDataService()
+    prices.set_db(mongo_db)
+
+    async def run():
+        await prices.remember_miss("23", "1", "14-Oct-2026", "no_data", 60)
+        await prices.remember_miss("23", "1", "15-Oct-2026", "no_data", 60)
+        await mongo_db.price_misses.update_one({"_id": "23|1|14-Oct-2026"},
+                                               {"$set": {"expires_at": datetime.now() - timedelta(seconds=1)}})
+        return (await prices.get_known_miss("23", "1", "14-Oct-2026"),
+                (await prices.get_known_miss("23", "1", "15-Oct-2026"))["reason"])
+
+    assert asyncio.run(run()) == (None, "no_data")
@@ -0,0 +1,60 @@
+from selenium.common.exceptions import TimeoutException
+from app.services import page_readiness
+from app.services.page_readiness import MIN_SAMPLES, ReadinessRecorder, ScrapeBudget, wait_until
+
+def test_timeout_stays_default_until_enough_samples():
+    recorder = ReadinessRecorder()
+    for _ in range(MIN_SAMPLES - 1):
+        recorder.record("grid", 0.5, True)
+    assert recorder.adaptive_timeout("grid", 30) == 30
+    recorder.record("grid", 0.5, True)
+    assert recorder.adaptive_timeout("grid", 30) < 30
+
+def test_consecutive_timeouts_widen_and_success_resets():
+    recorder = ReadinessRecorder()
+    for _ in range(MIN_SAMPLES):
+        recorder.record("grid", 2.0, True)
+    learned = recorder.adaptive_timeout("grid", 1000)
+    recorder.record("grid", learned, False)
+    assert recorder.adaptive_timeout("grid", 1000) >= 2 * learned
+    recorder.record("grid", 2.0, True)
+    assert recorder.adaptive_timeout("grid", 1000) == learned
+
+def test_cut_short_waits_are_counted_but_not_learned():
+    recorder = ReadinessRecorder()
+    for _ in range(MIN_SAMPLES):
+        recorder.record("grid", 2.0, True)
+    learned = recorder.adaptive_timeout("grid", 1000)
+    for _ in range(5):
+        recorder.record("grid", 0.1, False, cut_short=True)
+    stats = recorder.stats()["grid"]
+    assert (stats["count"], stats["timeouts"], stats["consecutive_timeouts"], stats["cut_short"]) == (MIN_SAMPLES, 0, 0, 5)
+    assert recorder.adaptive_timeout("grid", 1000) == learned
+
+def test_only_cut_short_steps_still_show_in_stats():
+    recorder = ReadinessRecorder()
+    recorder.record("refresh", 0.1, False, cut_short=True)
+    assert recorder.stats() == {"refresh": {"count": 0, "cut_short": 1}}
+
+class NeverReady:
+    """WebDriverWait stand-in whose condition never holds"""
+
+    def __init__(self, driver, timeout, **kwargs):
+        pass
+
+    def until(self, condition):
+        raise TimeoutException()
+
+def test_wait_past_the_deadline_is_recorded_as_cut_short(monkeypatch):
+    recorder = ReadinessRecorder()
+    monkeypatch.setattr(page_readiness, "readiness_recorder", recorder)
+    monkeypatch.setattr(page_readiness, "WebDriverWait", NeverReady)
+    assert not wait_until(None, None, "grid", 0, ScrapeBudget(deadline_seconds=1e-9))
+    assert not wait_until(None, None, "grid", 0, ScrapeBudget(deadline_seconds=60))
+    stats = recorder.stats()["grid"]
+    assert (stats["cut_short"], stats["timeouts"]) == (1, 1)
+
+def test_budget_caps_step_timeout_and_spends_retries():
+    budget = ScrapeBudget(deadline_seconds=60, retries=1)
+    assert budget.timeout_for("unseen-step", 600) <= 60
+    assert budget.take_retry() and not budget.take_retry()
@@ -0,0 +1,156 @@
+import asyncio
+from datetime import datetime, timedelta
+import pandas as pd
+import pytest
+from app.core.config import settings
+from app.services.database_service import PriceDataService
+from app.services.price_memory_cache import price_memory_cache, price_summary_memory_cache
+from app.services.price_records import price_records
+
+DATE = "15-Oct-2026"
+
+@pytest.fixture
+def prices(mongo_db):
+    price_memory_cache.clear()
+    price_summary_memory_cache.clear()
+    service = PriceDataService()
+    service.set_db(mongo_db)
+    yield service
+    price_memory_cache.clear()
+    price_summary_memory_cache.clear()
+
+def scraped(*rows) -> pd.DataFrame:
+    return price_records([{"Market": market, "Commodity": "Wheat", "District": "Agra", "Min Price": low,
+                           "Max Price": high, "Modal Price": modal, "Date": DATE}
+                          for market, low, high, modal in rows])
+
+# ------------- Price documents and bulk upserts -------------
+def test_price_docs_average_repeated_markets_and_store_null_prices():
+    df = scraped(("Agra", 2400.0, 2500.0, 2450.0), ("Agra", 2420.0, 2520.0, 2470.0), ("Achnera", None, 2400.0, 2380.0))
+    df.attrs["partial"] = True
+    docs = PriceDataService._price_docs(df, "1", "1", DATE, datetime(2026, 10, 15, 18))
+    by_market = {doc["market_name"]: doc for doc in docs}
+    assert by_market["Agra"]["modal_price"] == 2460.0 and by_market["Agra"]["min_price"] == 2410.0
+    assert by_market["Achnera"]["min_price"] is None
+    assert {doc["complete"] for doc in docs} == {False}
+
+def test_rescrape_overwrites_instead_of_duplicating(prices, mongo_db):
+    async def run():
+        await prices.cache_price_data(scraped(("Agra", 2400.0, 2500.0, 2450.0)), "1", "1", DATE)
+        await prices.cache_price_data(scraped(("Agra", 2410.0, 2510.0, 2460.0)), "1", "1", DATE)
+        return await mongo_db.price_data.find({}).to_list(length=None)
+
+    docs = asyncio.run(run())
+    assert [(doc["market_name"], doc["modal_price"]) for doc in docs] == [("Agra", 2460.0)]
+
+def test_duplicate_key_errors_are_told_apart():
+    assert PriceDataService._is_duplicate_key_error("E11000 duplicate key error collection: price_data")
+    assert not PriceDataService._is_duplicate_key_error("Index build failed: operation exceeded time limit")
+    assert not PriceDataService._is_duplicate_key_error(None)
+
+def test_duplicates_are_merged_into_the_newest_document(prices, mongo_db):
+    now = datetime.now()
+    key = {"commodity_code": "1", "district_code": "1", "market_name": "Agra", "date": DATE}
+
+    async def run():
+        await mongo_db.price_data.insert_many([
+            {**key, "modal_price": 2400.0, "min_price": 2300.0, "max_price": 2500.0,
+             "market_date": datetime(2026, 10, 14), "scraped_at": now - timedelta(hours=2)},
+            {**key, "modal_price": 2500.0, "min_price": 2400.0, "max_price": 2600.0,
+             "market_date": datetime(2026, 10, 15), "scraped_at": now, "complete": False},
+            {**key, "market_name": "Achnera", "modal_price": 2300.0, "min_price": 2200.0, "max_price": 2350.0,
+             "scraped_at": now},
+        ])
+        removed = await prices._drop_duplicate_prices()
+        return removed, await mongo_db.price_data.find({"market_name": "Agra"}).to_list(length=None)
+
+    removed, docs = asyncio.run(run())
+    assert removed == 1 and len(docs) == 1
+    merged = docs[0]
+    # The newest document is the one kept (Mongo stores milliseconds)
+    assert abs(merged["scraped_at"] - now) < timedelta(milliseconds=1)
+    assert (merged["modal_price"], merged["min_price"], merged["max_price"]) == (2450.0, 2350.0, 2550.0)
+    assert merged["market_date"] == datetime(2026, 10, 15) and merged["complete"] is False
+
+# ------------- Summaries stored at write time -------------
+def test_cache_write_stores_the_summary_reads_serve(prices, mongo_db):
+    async def run():
+        await prices.cache_price_data(scraped(("Agra", 2400.0, 2500.0, 2450.0), ("Achnera", 2300.0, 2350.0, 2320.0)),
+                                      "1", "1", DATE)
+        price_summary_memory_cache.clear()
+        from_mongo = await prices.get_price_summary("1", "1", DATE)
+        await mongo_db.price_summaries.delete_many({})
+        return from_mongo, await prices.get_price_summary("1", "1", DATE)
+
+    from_mongo, from_memory = asyncio.run(run())
+    assert from_mongo["Market"].tolist() == ["Achnera", "Agra"]
+    assert from_mongo["Avg Modal"].tolist() == [2320.0, 2450.0]
+    pd.testing.assert_frame_equal(from_memory, from_mongo)
+
+def test_rescrape_invalidates_the_memory_summary(prices):
+    async def run():
+        await prices.cache_price_data(scraped(("Agra", 2400.0, 2500.0, 2450.0)), "1", "1", DATE)
+        await prices.get_price_summary("1", "1", DATE)
+        await prices.cache_price_data(scraped(("Agra", 2500.0, 2600.0, 2550.0)), "1", "1", DATE)
+        return await prices.get_price_summary("1", "1", DATE)
+
+    assert asyncio.run(run())["Avg Modal"].tolist() == [2550.0]
+
+def test_batch_write_summarizes_every_key(prices, mongo_db):
+    async def run():
+        cached = await prices.cache_price_batches([
+            (scraped(("Agra", 2400.0, 2500.0, 2450.0)), "1", "1", DATE),
+            (scraped(("Lucknow", 2500.0, 2600.0, 2550.0)), "1", "17", DATE),
+        ])
+        return cached, sorted(doc["_id"] for doc in await mongo_db.price_summaries.find({}).to_list(length=None))
+
+    assert asyncio.run(run()) == (2, [f"1|17|{DATE}", f"1|1|{DATE}"])
+
+# ------------- Server-side summary aggregation -------------
+class AggregatedPrices:
+    """price_data stand-in returning canned $group output (mongomock lacks $round)"""
+
+    def __init__(self, markets):
+        self.markets = markets
+        self.pipelines = []
+
+    def aggregate(self, pipeline):
+        self.pipelines.append(pipeline)
+        markets = self.markets
+
+        class Cursor:
+            async def to_list(self, length=None):
+                return markets
+
+        return Cursor()
+
+def test_summary_pipeline_groups_one_price_key_per_market():
+    query = {"commodity_code": "1", "district_code": "1", "date": DATE}
+    pipeline = PriceDataService._summary_pipeline(query)
+    assert pipeline[0] == {"$match": query}
+    assert pipeline[2]["$group"]["_id"] == "$market_name"
+    assert [next(iter(stage)) for stage in pipeline] == ["$match", "$project", "$group", "$sort", "$project"]
+
+def test_cached_summary_is_read_from_the_aggregation_and_kept_in_memory(monkeypatch):
+    monkeypatch.setattr(settings, "summary_pipeline_enabled", True)
+    price_summary_memory_cache.clear()
+    now = datetime.now()
+    service = PriceDataService()
+    service.collection = AggregatedPrices([
+        {"Market": "Achnera", "Avg Modal": 2320.0, "Avg Min": None, "Avg Max": 2350.0,
+         "Latest Date": datetime(2026, 10, 15), "scraped_at": now - timedelta(minutes=5), "complete": True},
+        {"Market": "Agra", "Avg Modal": 2450.0, "Avg Min": 2400.0, "Avg Max": 2500.0,
+         "Latest Date": datetime(2026, 10, 15), "scraped_at": now, "complete": True},
+    ])
+    summary = asyncio.run(service.get_cached_summary("1", "1", DATE))
+    assert summary["Market"].tolist() == ["Achnera", "Agra"]
+    assert service.collection.pipelines[0][0]["$match"]["date"] == DATE
+    pd.testing.assert_frame_equal(price_summary_memory_cache.get("1", "1", DATE), summary)
+    price_summary_memory_cache.clear()
+
+def test_cached_summary_is_off_unless_enabled(monkeypatch):
+    monkeypatch.setattr(settings, "summary_pipeline_enabled", False)
+    service = PriceDataService()
+    service.collection = AggregatedPrices([])
+    assert asyncio.run(service.get_cached_summary("1", "1", DATE)) is None
+    assert service.collection.pipelines == []
@@ -0,0 +1,166 @@
+import asyncio
+import pytest
+
+# price_jobs streams through the scraper module, which needs torch/transformers
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from app.core.config import settings
+from app.models.price_data import PriceQueryJobModel
+from app.services import price_jobs
+from app.services.scrape_coordination import ScrapeQueueFullError
+
+class MemoryJobs:
+    """PriceQueryJobService kept in a dict"""
+
+    def __init__(self):
+        self.jobs = {}
+
+    async def create(self, job: PriceQueryJobModel) -> bool:
+        doc = job.dict()
+        doc["_id"] = doc.pop("job_id")
+        self.jobs[doc["_id"]] = doc
+        return True
+
+    async def mark_running(self, job_id):
+        self.jobs[job_id]["status"] = "running"
+        return True
+
+    async def finish(self, job_id, status, message, data_source=None, markets=None, error=None, outcome=None):
+        self.jobs[job_id].update(status=status, message=message, data_source=data_source,
+                                 markets=markets or [], error=error, result=outcome)
+        return True
+
+    async def get_job(self, job_id):
+        return self.jobs.get(job_id)
+
+# ------------- Chat price jobs -------------
+class QueueDepth:
+    def __init__(self, depth):
+        self.depth = depth
+
+    async def queued_count(self):
+        return self.depth
+
+def test_query_is_deferred_when_asked_or_the_queue_is_deep(monkeypatch):
+    monkeypatch.setattr(settings, "scrape_mode", "queue")
+    monkeypatch.setattr(settings, "scrape_queue_defer_depth", 3)
+    assert asyncio.run(price_jobs.should_defer_price_query(True))
+    assert not asyncio.run(price_jobs.should_defer_price_query(False, QueueDepth(2)))
+    assert asyncio.run(price_jobs.should_defer_price_query(False, QueueDepth(3)))
+    assert not asyncio.run(price_jobs.should_defer_price_query(False, None))
+
+def test_local_scrapes_defer_only_when_every_slot_is_busy(monkeypatch):
+    monkeypatch.setattr(settings, "scrape_mode", "inline")
+    monkeypatch.setattr(price_jobs.scrape_executor, "saturated", lambda: False)
+    assert not asyncio.run(price_jobs.should_defer_price_query(False, QueueDepth(100)))
+    monkeypatch.setattr(price_jobs.scrape_executor, "saturated", lambda: True)
+    assert asyncio.run(price_jobs.should_defer_price_query(False))
+
+def test_price_job_retries_busy_scrapes_and_stores_the_reply(monkeypatch):
+    import pandas as pd
+    summary = pd.DataFrame({"Market": ["Agra"], "Avg Modal": [2450.0], "Avg Max": [2490.0], "Avg Min": [2410.0]})
+    sources = iter(["busy", "cached"])
+
+    async def fetch(*args, **kwargs):
+        source = next(sources)
+        return None, (summary if source == "cached" else None), source
+
+    monkeypatch.setattr(price_jobs, "fetch_price_summary", fetch)
+    monkeypatch.setattr(settings, "price_job_retry_seconds", 0)
+    jobs = MemoryJobs()
+    slots = {"commodity": "wheat", "area": "agra", "time": "today"}
+
+    async def run():
+        job_id = await price_jobs.start_price_job(jobs, None, None, None, None, None, slots, "15-Oct-2026", "1", "1")
+        await asyncio.gather(*price_jobs._running_jobs)
+        return job_id
+
+    job = price_jobs.public_job(jobs.jobs[asyncio.run(run())])
+    assert job["status"] == "done" and job["data_source"] == "cached"
+    assert job["markets"] == [{"Market": "Agra", "Avg Modal": 2450.0, "Avg Max": 2490.0, "Avg Min": 2410.0}]
+    assert "Agra\nModal: Rs.2450.0/quintal" in job["message"]
+
+# ------------- Range backfill jobs -------------
+def test_range_job_waits_for_a_scrape_slot(monkeypatch):
+    calls = []
+
+    async def backfill(price_service, start_date, end_date, commodity_codes, district_codes):
+        calls.append((start_date, end_date, commodity_codes, district_codes))
+        if len(calls) == 1:
+            raise ScrapeQueueFullError("busy")
+        return {"status": "done", "scraped_days": 2, "records_cached": 7}
+
+    monkeypatch.setattr(price_jobs, "backfill_price_range", backfill)
+    monkeypatch.setattr(settings, "price_job_retry_seconds", 0)
+    jobs = MemoryJobs()
+
+    async def run():
+        job_id = await price_jobs.start_range_job(jobs, None, "2025-08-01", "2025-08-02", ["Wheat"], ["Agra"],
+                                                  ["23"], ["7"])
+        await asyncio.gather(*price_jobs._running_jobs)
+        return job_id
+
+    job = price_jobs.public_job(jobs.jobs[asyncio.run(run())])
+    assert len(calls) == 2
+    assert job["status"] == "done" and job["data_source"] == "scraped"
+    assert job["result"]["records_cached"] == 7
+    assert job["date"] == "2025-08-01..2025-08-02"
+
+def test_range_job_reports_a_timed_out_range(monkeypatch):
+    async def backfill(*args):
+        return {"status": "timeout", "scraped_days": 1, "records_cached": 3}
+
+    monkeypatch.setattr(price_jobs, "backfill_price_range", backfill)
+    jobs = MemoryJobs()
+    job_id = "j1"
+    asyncio.run(jobs.create(PriceQueryJobModel(job_id=job_id)))
+    asyncio.run(price_jobs._run_range_job(job_id, jobs, None, "2025-08-01", "2025-08-02", ["23"], ["7"]))
+    assert jobs.jobs[job_id]["data_source"] == "timeout"
+    assert "timed out" in jobs.jobs[job_id]["message"]
+
+# ------------- Reply formatting -------------
+def test_market_line_shows_na_for_markets_without_prices():
+    import pandas as pd
+    from app.services.price_summary import summarize_prices_per_market
+    rows = pd.DataFrame({"Market": ["Agra", "Achnera"], "Commodity": "Wheat", "District": "Agra",
+                         "Min Price": [2400.0, float("nan")], "Max Price": [2600.0, float("nan")],
+                         "Modal Price": [2500.0, float("nan")],
+                         "Date": pd.to_datetime(["2025-08-20", "2025-08-20"])})
+    summary = summarize_prices_per_market(rows)
+    lines = [price_jobs.format_market_line(row) for _, row in summary.iterrows()]
+    assert lines[0].startswith("Achnera\nModal: Rs.N/A/quintal | Max: Rs.N/A | Min: Rs.N/A")
+    assert "Modal: Rs.2500/quintal | Max: Rs.2600 | Min: Rs.2400" in lines[1]
+    event = price_jobs._market_event("Achnera", rows[rows["Market"] == "Achnera"])
+    assert event.startswith("event: market\n") and "N/A" in event
+
+def test_market_line_falls_back_to_document_columns():
+    line = price_jobs.format_market_line({"market_name": "Agra", "modal_price": 2500, "max_price": None})
+    assert line.startswith("Agra\nModal: Rs.2500/quintal | Max: Rs.N/A")
+
+# ------------- Progressive streaming -------------
+def _events(stream) -> list:
+    async def collect():
+        return [event async for event in stream]
+    return [event.split("\n", 1)[0][len("event: "):] for event in asyncio.run(collect())]
+
+def test_stream_sends_stale_markets_when_the_circuit_opens(monkeypatch):
+    import pandas as pd
+    from app.services.scrape_coordination import CircuitOpenError
+
+    async def circuit_open(*args, **kwargs):
+        raise CircuitOpenError("AgMarkNet is down")
+        yield
+
+    stale = pd.DataFrame({"Market": ["Agra", "Achnera"], "Commodity": "Wheat", "District": "Agra",
+                          "Min Price": [2400.0, 2300.0], "Max Price": [2600.0, 2500.0],
+                          "Modal Price": [2500.0, 2400.0], "Date": pd.to_datetime(["2025-08-19"] * 2)})
+
+    async def fetch_stale(*args, **kwargs):
+        return stale, "stale"
+
+    monkeypatch.setattr(price_jobs, "stream_agmarknet_markets", circuit_open)
+    monkeypatch.setattr(price_jobs, "fetch_price_data", fetch_stale)
+    events = _events(price_jobs.stream_price_events("wheat", "agra", "today", None, None, None,
+                                                    "20-Aug-2025", "7", "23"))
+    assert events == ["start", "market", "market", "done"]
@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta
+import pandas as pd
+from app.services import price_memory_cache as cache_module
+from app.services.price_memory_cache import PriceMemoryCache
+
+DATE = "15-Oct-2026"
+
+class FixedPolicy:
+    """freshness_policy stand-in: rows scraped at or after `since` are fresh"""
+
+    def __init__(self, since, partial_since=None):
+        self.since = since
+        self.partial_since = partial_since or since
+
+    def fresh_since(self, commodity_code, formatted_date, now=None, complete=True):
+        return self.since if complete else self.partial_since
+
+def rows(scraped_at, complete=None):
+    df = pd.DataFrame({"Market": ["Agra"], "Modal Price": [2450.0], "scraped_at": [scraped_at]})
+    if complete is not None:
+        df["complete"] = complete
+    return df
+
+def test_hit_returns_a_copy_and_lru_evicts_the_coldest(monkeypatch):
+    now = datetime.now()
+    monkeypatch.setattr(cache_module, "freshness_policy", FixedPolicy(now - timedelta(hours=1)))
+    cache = PriceMemoryCache(max_entries=2, max_age_seconds=600)
+    for district in ("1", "2"):
+        cache.put("1", district, DATE, rows(now))
+    cache.get("1", "1", DATE)["Market"] = "changed"
+    assert cache.get("1", "1", DATE)["Market"].tolist() == ["Agra"]
+    cache.put("1", "3", DATE, rows(now))
+    assert cache.get("1", "2", DATE) is None
+    assert cache.get("1", "1", DATE) is not None
+    assert cache.stats()["evictions"] == 1
+
+def test_entries_expire_with_the_freshness_policy(monkeypatch):
+    now = datetime.now()
+    policy = FixedPolicy(now - timedelta(hours=1))
+    monkeypatch.setattr(cache_module, "freshness_policy", policy)
+    cache = PriceMemoryCache(max_entries=10, max_age_seconds=600)
+    cache.put("1", "1", DATE, rows(now - timedelta(minutes=30)))
+    assert cache.get("1", "1", DATE) is not None
+    # A new reporting window passed: Mongo would no longer return these rows either
+    policy.since = now
+    assert cache.get("1", "1", DATE) is None
+    assert cache.stats()["expired"] == 1
+
+def test_partial_rows_use_the_stricter_bound(monkeypatch):
+    now = datetime.now()
+    monkeypatch.setattr(cache_module, "freshness_policy",
+                        FixedPolicy(now - timedelta(days=5), partial_since=now - timedelta(hours=1)))
+    cache = PriceMemoryCache(max_entries=10, max_age_seconds=600)
+    cache.put("1", "1", DATE, rows(now - timedelta(days=2), complete=True))
+    cache.put("1", "2", DATE, rows(now - timedelta(days=2), complete=False))
+    assert cache.get("1", "1", DATE) is not None
+    assert cache.get("1", "2", DATE) is None
+
+def test_max_age_bounds_entries_the_policy_still_accepts(monkeypatch):
+    now = datetime.now()
+    monkeypatch.setattr(cache_module, "freshness_policy", FixedPolicy(now - timedelta(days=1)))
+    cache = PriceMemoryCache(max_entries=10, max_age_seconds=60)
+    cache.put("1", "1", DATE, rows(now))
+    key = ("1", "1", DATE)
+    df, scraped_at, complete, loaded_at = cache._entries[key]
+    cache._entries[key] = (df, scraped_at, complete, loaded_at - timedelta(seconds=61))
+    assert cache.get("1", "1", DATE) is None
+
+def test_summary_frames_pass_their_scrape_time(monkeypatch):
+    now = datetime.now()
+    monkeypatch.setattr(cache_module, "freshness_policy", FixedPolicy(now - timedelta(hours=1)))
+    cache = PriceMemoryCache(max_entries=10, max_age_seconds=600)
+    summary = pd.DataFrame({"Market": ["Agra"], "Avg Modal": [2450.0]})
+    cache.put("1", "1", DATE, summary)
+    assert cache.get("1", "1", DATE) is None
+    cache.put("1", "1", DATE, summary, scraped_at=now, complete=True)
+    assert cache.get("1", "1", DATE)["Avg Modal"].tolist() == [2450.0]
+    cache.invalidate("1", "1", DATE)
+    assert cache.get("1", "1", DATE) is None
+
+def test_disabled_cache_stores_nothing():
+    cache = PriceMemoryCache(max_entries=0, max_age_seconds=600)
+    cache.put("1", "1", DATE, rows(datetime.now()))
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,55 @@
+import math
+from datetime import datetime
+import pandas as pd
+from app.services.price_records import PRICE_RECORD_DTYPES, is_price_records, parse_price, parse_market_date, price_records
+
+def test_parse_price_handles_commas_numbers_and_na():
+    assert parse_price("2,450") == 2450.0
+    assert parse_price(2380) == 2380.0
+    assert math.isnan(parse_price("N/A")) and math.isnan(parse_price(None)) and math.isnan(parse_price(""))
+
+def test_parse_market_date():
+    assert parse_market_date("15-Oct-2026") == pd.Timestamp("2026-10-15")
+    assert parse_market_date(datetime(2026, 10, 15, 9)) == pd.Timestamp("2026-10-15 09:00")
+    assert parse_market_date("2026/10/15") is None
+
+def test_scraped_rows_become_canonical_records():
+    records = price_records([
+        {"Market": " Agra ", "Commodity": "Wheat", "Min Price": "2,410", "Max Price": "2,490",
+         "Modal Price": "2,450", "Date": "15-Oct-2026"},
+        {"Market": "Agra", "Commodity": "Wheat", "Min Price": "N/A", "Max Price": "2,400", "Modal Price": "2,380"},
+    ], "14-Oct-2026")
+    assert is_price_records(records)
+    assert records["Market"].tolist() == ["Agra", "Agra"]
+    assert records["District"].tolist() == ["Unknown", "Unknown"]
+    assert records["Modal Price"].tolist() == [2450.0, 2380.0]
+    assert math.isnan(records.loc[1, "Min Price"])
+    # The date argument only fills rows without one
+    assert records["Date"].tolist() == [pd.Timestamp("2026-10-15"), pd.Timestamp("2026-10-14")]
+
+def test_mongo_documents_map_aliases_and_keep_metadata():
+    scraped_at = datetime(2026, 10, 15, 18, 0)
+    records = price_records([
+        {"market_name": "Agra", "commodity_name": "Wheat", "district_name": "Agra", "min_price": 2410.0,
+         "max_price": 2490.0, "modal_price": 2450.0, "market_date": datetime(2026, 10, 15),
+         "scraped_at": scraped_at, "complete": False},
+        # Documents from before market_date fall back to the AgMarkNet date string
+        {"market_name": "Achnera", "commodity_name": "Wheat", "district_name": "Agra", "min_price": 2300.0,
+         "max_price": 2350.0, "modal_price": 2320.0, "date": "15-Oct-2026",
+         "scraped_at": scraped_at, "complete": True},
+    ])
+    assert records[list(PRICE_RECORD_DTYPES)].dtypes.astype(str).tolist() == list(PRICE_RECORD_DTYPES.values())
+    assert records["Market"].tolist() == ["Agra", "Achnera"]
+    assert records["Date"].tolist() == [pd.Timestamp("2026-10-15")] * 2
+    assert records["complete"].tolist() == [False, True]
+    assert records["scraped_at"].tolist() == [scraped_at] * 2
+
+def test_canonical_frame_is_returned_as_is_with_attrs():
+    records = price_records([{"Market": "Agra", "Modal Price": "2,450", "Date": "15-Oct-2026"}])
+    records.attrs["partial"] = True
+    assert price_records(records) is records
+    converted = price_records(records.rename(columns={"Modal Price": "modal_price"}))
+    assert converted is not records and converted.attrs["partial"]
+
+def test_empty_input_gives_an_empty_canonical_frame():
+    assert is_price_records(price_records(None)) and price_records([]).empty
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+from benchmark_summarize import synthetic_prices
+from app.services.price_records import price_records
+from app.services.price_summary import (
+    summarize_prices_pandas, summarize_prices_numpy, price_summary_doc, summary_frame
+)
+
+# ------------- Both engines agree -------------
+@pytest.mark.parametrize("rows", [1, 7, 250, 5_000])
+@pytest.mark.parametrize("canonical", [False, True])
+def test_engines_return_identical_frames(rows, canonical):
+    df = synthetic_prices(rows, seed=rows)
+    if canonical:
+        df = price_records(df)
+    assert_frame_equal(summarize_prices_pandas(df), summarize_prices_numpy(df))
+
+@pytest.mark.parametrize("top_k", [0, -1, 1, 50])
+def test_engines_agree_on_any_top_k(top_k):
+    df = synthetic_prices(300)
+    assert_frame_equal(summarize_prices_pandas(df, top_k), summarize_prices_numpy(df, top_k))
+
+def test_markets_without_prices_or_names_summarize_to_na():
+    df = pd.DataFrame({"Market": [" Agra", "Agra ", np.nan, "Achnera"],
+                       "Modal Price": ["2,500", "N/A", "100", "N/A"],
+                       "Min Price": ["2400", "2300", "90", ""],
+                       "Max Price": [2600, 2700, 110, np.nan],
+                       "Date": ["20-Aug-2025", "19-Aug-2025", "N/A", "20-Aug-2025"]})
+    expected = summarize_prices_pandas(df)
+    assert_frame_equal(expected, summarize_prices_numpy(df))
+    achnera = expected.set_index("Market").loc["Achnera"]
+    assert pd.isna(achnera["Avg Modal"]) and pd.isna(achnera["Avg Min"])
+    assert list(expected["Market"]) == ["Achnera", "Agra", "nan"]
+
+# ------------- Stored summaries -------------
+def test_summary_doc_round_trips_to_the_summary_frame():
+    records = price_records(synthetic_prices(120))
+    doc = price_summary_doc(records, "23", "7", "20-Aug-2025", pd.Timestamp("2025-08-20 12:00").to_pydatetime())
+    assert doc["_id"] == "23|7|20-Aug-2025" and doc["complete"]
+    assert doc["market_count"] == len(doc["markets"])
+    # Rows without a date are summarized as of the key's date
+    assert_frame_equal(summary_frame(doc["markets"]), summarize_prices_numpy(price_records(records, "20-Aug-2025")))
+
+def test_summary_doc_of_a_partial_scrape_is_incomplete():
+    records = price_records(synthetic_prices(20))
+    records.attrs["partial"] = True
+    assert not price_summary_doc(records, "23", "7", "20-Aug-2025", pd.Timestamp.now().to_pydatetime())["complete"]
@@ -0,0 +1,34 @@
+import pytest
+
+# The range engines live next to the chat model, which needs torch/transformers
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from app.core.config import settings
+from app.services.interactivechat import scrape_range_http
+
+@pytest.fixture
+def reports(agmarknet_stub, monkeypatch):
+    monkeypatch.setattr(settings, "agmarknet_base_url", agmarknet_stub.base_url)
+    collected = []
+    return agmarknet_stub, collected, lambda key, date, rows, complete: collected.append((key, date, rows, complete))
+
+def test_range_reports_complete_district_days(reports):
+    _, collected, on_result = reports
+    results = scrape_range_http("Wheat", ["20-Aug-2025"], [("agra", "agra")], on_result=on_result)
+    rows, complete = results[("agra", "20-Aug-2025")]
+    assert complete and len(rows) == 3
+    assert collected == [("agra", "20-Aug-2025", rows, True)]
+
+def test_range_reports_failed_markets_as_incomplete(reports):
+    stub, collected, on_result = reports
+    stub.fail_markets.add("102")
+    results = scrape_range_http("Wheat", ["20-Aug-2025"], [("agra", "agra")], on_result=on_result)
+    assert results[("agra", "20-Aug-2025")] == ([], False)
+    assert collected[0][3] is False
+
+def test_range_never_scrapes_fallback_markets(reports):
+    _, collected, on_result = reports
+    results = scrape_range_http("Wheat", ["20-Aug-2025"], [("x", "nowhere")], on_result=on_result)
+    assert results == {}
+    assert collected == [("x", "20-Aug-2025", None, False)]
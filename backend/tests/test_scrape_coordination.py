@@ -0,0 +1,164 @@
+import asyncio
+import threading
+import pytest
+from app.services.scrape_coordination import (
+    SingleFlight, ScrapeExecutor, CircuitBreaker, ScrapeQueueFullError, ScrapeCancelledError, ScrapeTimeoutError
+)
+from app.services import scrape_coordination
+
+# ------------- SingleFlight -------------
+def test_concurrent_callers_share_one_execution():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def scrape(key):
+        calls.append(key)
+        started.set()
+        release.wait(5)
+        return f"rows for {key}"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("k", scrape, "k")))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flight.do("k", scrape, "k"))) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    while flight.followers("k") < 3:
+        threading.Event().wait(0.01)
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join(5)
+    assert calls == ["k"]
+    assert results == ["rows for k"] * 4
+    assert flight.stats() == {"executions": 1, "coalesced": 3, "in_flight": 0}
+
+def test_leader_error_reaches_followers_and_key_is_freed():
+    flight = SingleFlight()
+
+    async def run():
+        gate = asyncio.Event()
+        loop = asyncio.get_running_loop()
+
+        def failing():
+            asyncio.run_coroutine_threadsafe(gate.wait(), loop).result(5)
+            raise RuntimeError("AgMarkNet down")
+
+        tasks = [asyncio.create_task(flight.do_async("k", failing)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        gate.set()
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    errors = asyncio.run(run())
+    assert [str(e) for e in errors] == ["AgMarkNet down"] * 2
+    assert flight.do("k", lambda: "retried") == "retried"
+    assert flight.stats()["executions"] == 2
+
+def test_lead_refuses_a_key_already_in_flight():
+    flight = SingleFlight()
+    executor = ScrapeExecutor(max_workers=1, max_queue=0, timeout=5)
+    release = threading.Event()
+    job = flight.lead("k", executor, lambda cancel_event: release.wait(5) and "done")
+    assert job is not None
+    assert flight.lead("k", executor, lambda cancel_event: "second") is None
+    release.set()
+    assert job.future.result(5) == "done"
+
+# ------------- ScrapeExecutor -------------
+def blocking_scrape(release):
+    def scrape(cancel_event):
+        release.wait(5)
+        return "rows"
+    return scrape
+
+def test_submit_beyond_workers_and_queue_is_rejected():
+    executor = ScrapeExecutor(max_workers=1, max_queue=1, timeout=5)
+    release = threading.Event()
+    jobs = [executor.submit(blocking_scrape(release)) for _ in range(2)]
+    assert executor.saturated()
+    with pytest.raises(ScrapeQueueFullError):
+        executor.submit(blocking_scrape(release))
+    release.set()
+    assert [job.future.result(5) for job in jobs] == ["rows", "rows"]
+    assert executor.stats()["rejected"] == 1
+    # Finished jobs free their slots
+    assert executor.submit(lambda cancel_event: "again").future.result(5) == "again"
+
+def test_job_past_its_timeout_fails_and_is_told_to_stop():
+    executor = ScrapeExecutor(max_workers=1, max_queue=0, timeout=5)
+    stopped = threading.Event()
+
+    def slow_scrape(cancel_event):
+        if cancel_event.wait(5):
+            stopped.set()
+
+    job = executor.submit(slow_scrape, timeout=0.05)
+    with pytest.raises(ScrapeTimeoutError):
+        job.future.result(5)
+    assert stopped.wait(5)
+    assert executor.stats()["timed_out"] == 1
+
+def test_job_cancelled_while_queued_never_runs():
+    executor = ScrapeExecutor(max_workers=1, max_queue=1, timeout=5)
+    release = threading.Event()
+    ran = []
+    running = executor.submit(blocking_scrape(release))
+    queued = executor.submit(lambda cancel_event: ran.append(True))
+    queued.cancel()
+    release.set()
+    assert running.future.result(5) == "rows"
+    with pytest.raises(ScrapeCancelledError):
+        queued.future.result(5)
+    executor._executor.shutdown(wait=True)
+    assert ran == []
+
+# ------------- CircuitBreaker -------------
+class Clock:
+    """time.monotonic stand-in the breaker reads its reset window from"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = Clock()
+    monkeypatch.setattr(scrape_coordination, "time", fake)
+    return fake
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_seconds=60)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert not breaker.allow() and breaker.rejecting()
+    assert breaker.retry_after() == 60
+    assert breaker.stats()["state"] == "open"
+
+def test_half_open_lets_one_probe_through(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_seconds=60)
+    breaker.record_failure()
+    clock.now += 60
+    assert not breaker.rejecting()
+    assert breaker.allow()
+    assert not breaker.allow() and breaker.rejecting()
+    breaker.release_probe()
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.stats()["state"] == "closed" and breaker.allow()
+
+def test_failed_probe_reopens_the_circuit(clock):
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_seconds=60)
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now += 61
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.stats()["state"] == "open"
+    assert breaker.stats()["opened"] == 2
+    assert not breaker.allow()
@@ -0,0 +1,88 @@
+import asyncio
+from datetime import datetime, timedelta
+from app.services.database_service import ScrapeJobQueueService
+
+def job_queue(mongo_db) -> ScrapeJobQueueService:
+    service = ScrapeJobQueueService()
+    service.set_db(mongo_db)
+    return service
+
+async def expire_lease(mongo_db, job_id):
+    await mongo_db.scrape_jobs.update_one({"_id": job_id},
+                                          {"$set": {"lease_expires_at": datetime.now() - timedelta(seconds=1)}})
+
+def test_enqueue_reuses_the_pending_job_for_a_key(mongo_db):
+    queue = job_queue(mongo_db)
+
+    async def run():
+        ids = [await queue.enqueue("23", "1", "15-Oct-2026") for _ in range(2)]
+        return ids, await queue.queued_count()
+
+    assert asyncio.run(run()) == (["23|1|15-Oct-2026"] * 2, 1)
+
+def test_jobs_are_leased_oldest_first_and_only_once(mongo_db):
+    queue = job_queue(mongo_db)
+
+    async def run():
+        first = await queue.enqueue("23", "1", "14-Oct-2026")
+        second = await queue.enqueue("23", "1", "15-Oct-2026")
+        leased = [(await queue.lease_next(worker, 60, 3) or {}).get("_id") for worker in ("w1", "w2", "w3")]
+        return leased == [first, second, None]
+
+    assert asyncio.run(run())
+
+def test_abandoned_job_is_retried_until_its_attempts_run_out(mongo_db):
+    queue = job_queue(mongo_db)
+
+    async def run():
+        job_id = await queue.enqueue("23", "1", "15-Oct-2026")
+        owners = []
+        for worker in ("w1", "w2", "w3"):
+            job = await queue.lease_next(worker, 60, 2)
+            owners.append(job["owner_id"] if job else None)
+            await expire_lease(mongo_db, job_id)
+        return owners, await queue.get_job(job_id)
+
+    owners, job = asyncio.run(run())
+    assert owners == ["w1", "w2", None]
+    assert job["status"] == "failed" and "2 attempt" in job["last_error"]
+
+def test_failed_job_requeues_then_fails_and_only_its_owner_finishes_it(mongo_db):
+    queue = job_queue(mongo_db)
+
+    async def run():
+        job_id = await queue.enqueue("23", "1", "15-Oct-2026")
+        await queue.lease_next("w1", 60, 2)
+        assert not await queue.fail(job_id, "w2", "not mine", 2)
+        assert not await queue.extend_lease(job_id, "w2", 60)
+        assert await queue.fail(job_id, "w1", "timeout", 2)
+        requeued = (await queue.get_job(job_id))["status"]
+        await queue.lease_next("w1", 60, 2)
+        await queue.fail(job_id, "w1", "timeout", 2)
+        return requeued, (await queue.get_job(job_id))["status"]
+
+    assert asyncio.run(run()) == ("queued", "failed")
+
+def test_finished_job_goes_back_to_the_queue_on_enqueue(mongo_db):
+    queue = job_queue(mongo_db)
+
+    async def run():
+        job_id = await queue.enqueue("23", "1", "15-Oct-2026")
+        await queue.lease_next("w1", 60, 3)
+        assert await queue.complete(job_id, "w1", 12)
+        done = await queue.get_job(job_id)
+        await queue.enqueue("23", "1", "15-Oct-2026")
+        return done, await queue.get_job(job_id)
+
+    done, requeued = asyncio.run(run())
+    assert (done["status"], done["records_cached"]) == ("done", 12)
+    assert (requeued["status"], requeued["attempts"]) == ("queued", 0)
+
+def test_queue_without_a_database_does_nothing():
+    queue = ScrapeJobQueueService()
+
+    async def run():
+        return (await queue.enqueue("23", "1", "15-Oct-2026"), await queue.extend_lease("x", "w1", 60),
+                await queue.complete("x", "w1", 0), await queue.fail("x", "w1", "e", 3))
+
+    assert asyncio.run(run()) == (None, False, False, False)
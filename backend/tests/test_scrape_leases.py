@@ -0,0 +1,45 @@
+import asyncio
+from datetime import datetime, timedelta
+from app.services.database_service import ScrapeLeaseService
+
+KEY = ("23", "1", "15-Oct-2026")
+
+def leases(mongo_db) -> ScrapeLeaseService:
+    service = ScrapeLeaseService()
+    service.set_db(mongo_db)
+    return service
+
+def test_live_lease_blocks_other_workers(mongo_db):
+    service = leases(mongo_db)
+
+    async def run():
+        return [await service.acquire(*KEY, "node-a", 60),
+                await service.acquire(*KEY, "node-b", 60),
+                await service.acquire(*KEY, "node-a", 60)]
+
+    assert asyncio.run(run()) == [True, False, True]
+
+def test_expired_lease_can_be_taken_over(mongo_db):
+    service = leases(mongo_db)
+
+    async def run():
+        await service.acquire(*KEY, "node-a", 60)
+        await mongo_db.scrape_leases.update_one({}, {"$set": {"expires_at": datetime.now() - timedelta(seconds=1)}})
+        taken = await service.acquire(*KEY, "node-b", 60)
+        # The old owner finds out on its next heartbeat
+        return taken, await service.heartbeat(*KEY, "node-a", 60), await service.heartbeat(*KEY, "node-b", 60)
+
+    assert asyncio.run(run()) == (True, False, True)
+
+def test_only_the_owner_releases(mongo_db):
+    service = leases(mongo_db)
+
+    async def run():
+        await service.acquire(*KEY, "node-a", 60)
+        released = [await service.release(*KEY, "node-b"), await service.release(*KEY, "node-a")]
+        return released, await service.acquire(*KEY, "node-b", 60)
+
+    assert asyncio.run(run()) == ([False, True], True)
+
+def test_without_a_database_scrapes_are_not_coordinated():
+    assert asyncio.run(ScrapeLeaseService().acquire(*KEY, "node-a", 60))